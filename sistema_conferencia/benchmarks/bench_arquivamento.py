@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Benchmark do arquivamento das bipagens antigas em arquivos mensais
+
+Uso:
+    python benchmarks/bench_arquivamento.py [rastreios] [--dias N] [--retencao N]
+
+Gera `rastreios` (padrão 1.000.000, metade bipada) com as bipagens espalhadas pelos
+últimos `dias` dias (padrão 60) e mede, antes e depois do arquivamento com retenção de
+`retencao` dias (padrão 1), as operações que percorrem a tabela viva: recálculo do
+dashboard, estatísticas, listagem de bipadas, exportação e carga do índice. Mede também
+o próprio arquivamento e a exportação de 7 dias lendo os arquivos com ATTACH, e confere
+que nenhuma bipagem se perdeu (tabela viva + arquivos = total gerado).
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.comum import criar_app, medir
+from benchmarks.gerador import carregar_cenario
+from src import config
+from src.models.rastreio import db, MercadoriaConferida
+from src.services.arquivo import arquivar_bipagens, arquivos_existentes
+from src.services.indice import indice_rastreios
+from src.services.resumo import fechar_dias_pendentes
+
+REPETICOES = 3
+
+
+def medir_operacoes(app, cliente, hoje):
+    semana = {'transportadora': 'CORREIOS', 'de': (hoje - timedelta(days=7)).isoformat(), 'ate': hoje.isoformat()}
+
+    def carregar_indice():
+        with app.app_context():
+            indice_rastreios.carregar()
+
+    def contar_linhas(corpo):
+        resposta = cliente.post('/api/exportar/excel', json=corpo)
+        return resposta.data.count(b'\n')
+
+    with app.app_context():
+        linhas_vivas = db.session.query(MercadoriaConferida).count()
+    return {
+        'linhas_vivas': linhas_vivas,
+        'dashboard_ms': medir(lambda: cliente.post('/api/dashboard/atualizar'), REPETICOES),
+        'estatisticas_ms': medir(lambda: cliente.get('/api/estatisticas'), REPETICOES),
+        'bipadas_ms': medir(lambda: cliente.get('/api/mercadorias/bipadas?limit=100'), REPETICOES),
+        'exportar_ms': medir(lambda: cliente.post('/api/exportar/excel', json={'transportadora': 'CORREIOS'}).data, REPETICOES),
+        'indice_ms': medir(carregar_indice, REPETICOES),
+        'exportar_7d_ms': medir(lambda: cliente.post('/api/exportar/excel', json=semana).data, REPETICOES),
+        'exportar_7d_linhas': contar_linhas(semana)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('rastreios', nargs='?', type=int, default=1_000_000)
+    parser.add_argument('--dias', type=int, default=60)
+    parser.add_argument('--retencao', type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        config.ARQUIVO_PASTA = os.path.join(pasta, 'arquivo')
+        app = criar_app(os.path.join(pasta, 'bench.db'))
+        cliente = app.test_client()
+        hoje = date.today()
+
+        with app.app_context():
+            resumo = carregar_cenario(args.rastreios, dias=args.dias, hoje=hoje)
+            fechar_dias_pendentes()
+        antes = medir_operacoes(app, cliente, hoje)
+
+        with app.app_context():
+            inicio = time.perf_counter()
+            resultado = arquivar_bipagens(hoje, args.retencao)
+            duracao = time.perf_counter() - inicio
+        depois = medir_operacoes(app, cliente, hoje)
+
+        arquivadas = 0
+        for _, caminho in arquivos_existentes():
+            with sqlite3.connect(caminho) as conexao:
+                arquivadas += conexao.execute('SELECT COUNT(*) FROM mercadorias_conferidas').fetchone()[0]
+        mb_arquivos = sum(os.path.getsize(caminho) for _, caminho in arquivos_existentes()) / 1024 / 1024
+
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+
+    print(f"{args.rastreios:,} rastreios, {resumo['bipagens']:,} bipagens em {args.dias} dias, retenção de {args.retencao} dia(s)")
+    print(f"Arquivamento: {resultado['linhas']:,} bipagens em {len(resultado['meses'])} arquivo(s) mensal(is) "
+          f"({mb_arquivos:.1f} MB) em {duracao:.2f} s "
+          f"({resultado['linhas'] / duracao if duracao else 0:,.0f} linhas/s)")
+    print()
+    print(f"{'operação':<34} {'antes':>12} {'depois':>12} {'ganho':>8}")
+    rotulos = [
+        ('linhas_vivas', 'linhas em mercadorias_conferidas'),
+        ('dashboard_ms', 'recálculo do dashboard (ms)'),
+        ('estatisticas_ms', '/api/estatisticas (ms)'),
+        ('bipadas_ms', 'bipadas, 1ª página (ms)'),
+        ('exportar_ms', 'exportação sem período (ms)'),
+        ('indice_ms', 'carga do índice (ms)'),
+        ('exportar_7d_ms', 'exportação de 7 dias (ms)'),
+    ]
+    for chave, rotulo in rotulos:
+        ganho = antes[chave] / depois[chave] if depois[chave] else 0
+        print(f"{rotulo:<34} {antes[chave]:>12,.1f} {depois[chave]:>12,.1f} {ganho:>7.1f}x")
+
+    total_ok = depois['linhas_vivas'] + arquivadas == resumo['bipagens']
+    exportacao_ok = antes['exportar_7d_linhas'] == depois['exportar_7d_linhas']
+    print()
+    print(f"Conferência: tabela viva + arquivos = {depois['linhas_vivas'] + arquivadas:,} de {resumo['bipagens']:,} "
+          f"({'ok' if total_ok else 'DIVERGENTE'}); exportação de 7 dias com ATTACH "
+          f"{'igual' if exportacao_ok else 'DIFERENTE'} ({depois['exportar_7d_linhas']:,} linhas)")
+
+
+if __name__ == '__main__':
+    main()
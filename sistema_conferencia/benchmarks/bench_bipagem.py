@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Benchmark da latência de /api/mercadorias/bipar conforme o tamanho da base
+
+Uso:
+    python benchmarks/bench_bipagem.py [tamanho ...]
+
+Para cada tamanho (padrão 10.000, 100.000 e 1.000.000 rastreios esperados, com metade
+já bipada) mede a latência de bipagens novas sem os índices do caminho de bipagem
+(esquema original) e com eles. Com os índices a latência deve ficar estável.
+"""
+
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.comum import criar_app, popular_base, gerar_codigos
+from src.models.rastreio import db
+
+AMOSTRAS = 200
+
+INDICES = {
+    'ix_mercadorias_conferidas_codigo_rastreio': 'mercadorias_conferidas (codigo_rastreio)',
+    'ix_mercadorias_conferidas_data_bipagem': 'mercadorias_conferidas (data_bipagem)',
+    'ix_rastreios_esperados_status_codigo': 'rastreios_esperados (status, codigo_rastreio)',
+}
+
+
+def medir_bipagens(cliente, codigos):
+    """Retorna (p50, p95) em milissegundos da bipagem de cada código"""
+    tempos = []
+    for codigo in codigos:
+        inicio = time.perf_counter()
+        resposta = cliente.post('/api/mercadorias/bipar', json={'codigo_rastreio': codigo})
+        tempos.append((time.perf_counter() - inicio) * 1000)
+        assert resposta.json.get('status') == 'encontrado', resposta.json
+    tempos.sort()
+    return statistics.median(tempos), tempos[int(len(tempos) * 0.95) - 1]
+
+
+def main():
+    tamanhos = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+
+    print(f"{'esperados':>10} {'sem índices p50/p95 (ms)':>26} {'com índices p50/p95 (ms)':>26}")
+    for tamanho in tamanhos:
+        with tempfile.TemporaryDirectory() as pasta:
+            app = criar_app(os.path.join(pasta, 'bench.db'))
+            cliente = app.test_client()
+            pendentes = gerar_codigos(2 * AMOSTRAS, inicio=tamanho // 2)
+
+            with app.app_context():
+                popular_base(tamanho, tamanho // 2)
+                for nome in INDICES:
+                    db.session.execute(db.text(f"DROP INDEX {nome}"))
+                db.session.commit()
+
+            sem_indices = medir_bipagens(cliente, pendentes[:AMOSTRAS])
+
+            with app.app_context():
+                for nome, definicao in INDICES.items():
+                    db.session.execute(db.text(f"CREATE INDEX {nome} ON {definicao}"))
+                db.session.commit()
+
+            com_indices = medir_bipagens(cliente, pendentes[AMOSTRAS:])
+
+            with app.app_context():
+                db.session.remove()
+                db.engine.dispose()
+
+            print(f"{tamanho:>10} {sem_indices[0]:>12.2f} / {sem_indices[1]:>9.2f} "
+                  f"{com_indices[0]:>14.2f} / {com_indices[1]:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Teste de concorrência: várias estações bipando ao mesmo tempo no mesmo banco
+
+Uso:
+    python benchmarks/bench_concorrencia.py [estacoes] [operacoes_por_estacao] [bipadas_na_base]
+
+Cada estação é um processo separado (como workers de um servidor) que alterna
+bipagens, mudanças de status e leituras de estatísticas/listas, enquanto outro
+processo gera relatórios (exportação CSV em streaming) sem parar. O teste roda duas
+vezes: com o SQLite padrão (rollback journal, sem PRAGMAs) e com os ajustes de
+src/config.py (WAL, busy_timeout etc.), e conta as respostas com erro.
+"""
+
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.comum import criar_app, popular_base, gerar_codigos
+from src.models.rastreio import db
+
+
+def estacao(caminho_db, ajustar_sqlite, primeiro_codigo, operacoes, inicio_evento, fila):
+    app = criar_app(caminho_db, ajustar_sqlite=ajustar_sqlite)
+    cliente = app.test_client()
+    codigos = gerar_codigos(operacoes, inicio=primeiro_codigo)
+    erros = []
+
+    inicio_evento.wait()
+    inicio = time.perf_counter()
+    for i, codigo in enumerate(codigos):
+        requisicoes = [('post', '/api/mercadorias/bipar', {'codigo_rastreio': codigo})]
+        if i % 10 == 0:
+            requisicoes.append(('post', '/api/rastreios/status', {'codigo_rastreio': codigo, 'status': 'coleta'}))
+        if i % 5 == 0:
+            requisicoes.append(('get', '/api/estatisticas', None))
+            requisicoes.append(('get', '/api/mercadorias/conferidas?limit=100', None))
+
+        for metodo, url, corpo in requisicoes:
+            resposta = getattr(cliente, metodo)(url, json=corpo)
+            if resposta.status_code >= 500:
+                erros.append(resposta.json.get('erro', str(resposta.status_code)))
+
+    fila.put((len(codigos), erros, time.perf_counter() - inicio))
+
+
+def relatorios(caminho_db, ajustar_sqlite, inicio_evento, parar_evento, fila):
+    """Exporta o CSV repetidamente - no rollback journal a leitura longa bloqueia as escritas"""
+    app = criar_app(caminho_db, ajustar_sqlite=ajustar_sqlite)
+    cliente = app.test_client()
+    exportacoes = 0
+
+    inicio_evento.wait()
+    while not parar_evento.is_set():
+        resposta = cliente.post('/api/exportar/excel', json={'transportadora': 'J&T'})
+        for _ in resposta.response:
+            pass
+        exportacoes += 1
+
+    fila.put(exportacoes)
+
+
+def rodar(ajustar_sqlite, estacoes, operacoes, bipadas_na_base):
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho_db = os.path.join(pasta, 'bench.db')
+        app = criar_app(caminho_db, ajustar_sqlite=ajustar_sqlite)
+        with app.app_context():
+            # Os códigos das estações ficam depois das bipadas pré-carregadas
+            popular_base(bipadas_na_base + estacoes * operacoes, bipadas_na_base)
+            db.session.remove()
+            db.engine.dispose()
+        # Criar o cache do dashboard do dia antes das estações começarem
+        app.test_client().get('/api/dashboard')
+
+        inicio_evento = multiprocessing.Event()
+        parar_evento = multiprocessing.Event()
+        fila = multiprocessing.Queue()
+        fila_relatorios = multiprocessing.Queue()
+        relatorio = multiprocessing.Process(
+            target=relatorios,
+            args=(caminho_db, ajustar_sqlite, inicio_evento, parar_evento, fila_relatorios)
+        )
+        relatorio.start()
+        processos = [
+            multiprocessing.Process(
+                target=estacao,
+                args=(caminho_db, ajustar_sqlite, bipadas_na_base + i * operacoes, operacoes, inicio_evento, fila)
+            )
+            for i in range(estacoes)
+        ]
+        for processo in processos:
+            processo.start()
+        time.sleep(1)
+        inicio_evento.set()
+
+        resultados = [fila.get() for _ in processos]
+        parar_evento.set()
+        exportacoes = fila_relatorios.get()
+        for processo in processos + [relatorio]:
+            processo.join()
+
+    bipagens = sum(r[0] for r in resultados)
+    erros = [erro for r in resultados for erro in r[1]]
+    duracao = max(r[2] for r in resultados)
+    return bipagens, erros, duracao, exportacoes
+
+
+def main():
+    estacoes = int(sys.argv[1]) if len(sys.argv) > 1 else 6
+    operacoes = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    bipadas_na_base = int(sys.argv[3]) if len(sys.argv) > 3 else 200_000
+
+    for nome, ajustar_sqlite in [('SQLite padrão', False), ('SQLite ajustado', True)]:
+        bipagens, erros, duracao, exportacoes = rodar(ajustar_sqlite, estacoes, operacoes, bipadas_na_base)
+        bloqueios = sum(1 for erro in erros if 'locked' in erro)
+        print(f"{nome:<16} {estacoes} estações, {bipagens} bipagens em {duracao:.1f}s "
+              f"({bipagens / duracao:,.0f}/s), {exportacoes} exportações - "
+              f"{len(erros)} erros ({bloqueios} 'database is locked')")
+        for erro in sorted(set(erro.splitlines()[0] for erro in erros))[:3]:
+            print(f"    {erro}")
+
+
+if __name__ == '__main__':
+    main()
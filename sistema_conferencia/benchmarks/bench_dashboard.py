@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Benchmark do recálculo do dashboard: laço por mercadoria com uma consulta de rastreio
+por linha (antes) x agregação transportadora x status em SQL (depois)
+
+Uso:
+    python benchmarks/bench_dashboard.py [bipadas_no_dia ...]
+
+Para cada tamanho (padrão 10.000 e 100.000 bipagens no dia, com 2% fora da base e
+transportadoras distribuídas entre as do dashboard) mede o recálculo completo e as
+chamadas de /api/dashboard/incrementar e /api/status/atualizar, que antes disparavam
+o recálculo e agora somam deltas.
+"""
+
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.comum import criar_app, popular_base, gerar_codigos, medir
+from src.models.rastreio import db, RastreioEsperado, MercadoriaConferida
+from src.services.dashboard import TRANSPORTADORAS, calcular_contadores
+
+
+def contadores_legado(hoje):
+    """Reprodução do laço original de forcar_recalculo_dashboard"""
+    bipadas_hoje = MercadoriaConferida.query.filter_by(data_bipagem=hoje).all()
+    transportadoras = {nome: 0 for nome in TRANSPORTADORAS}
+    coleta_hoje = insucesso_hoje = sem_status_hoje = 0
+
+    for mercadoria in bipadas_hoje:
+        if mercadoria.transportadora and mercadoria.transportadora.strip():
+            nome = mercadoria.transportadora.strip()
+            if nome in transportadoras:
+                transportadoras[nome] += 1
+
+        rastreio = RastreioEsperado.query.filter_by(codigo_rastreio=mercadoria.codigo_rastreio).first()
+        if rastreio and rastreio.status == 'coleta':
+            coleta_hoje += 1
+        elif rastreio and rastreio.status == 'insucesso':
+            insucesso_hoje += 1
+        else:
+            sem_status_hoje += 1
+
+    return {
+        'transportadoras': transportadoras,
+        'total_hoje': len(bipadas_hoje),
+        'coleta_hoje': coleta_hoje,
+        'insucesso_hoje': insucesso_hoje,
+        'sem_status_hoje': sem_status_hoje
+    }
+
+
+def main():
+    tamanhos = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000]
+
+    print(f"{'bipadas':>8} {'recálculo antes (ms)':>21} {'depois (ms)':>12} "
+          f"{'incrementar (ms)':>17} {'status/atualizar (ms)':>22}")
+    for tamanho in tamanhos:
+        with tempfile.TemporaryDirectory() as pasta:
+            app = criar_app(os.path.join(pasta, 'bench.db'))
+            cliente = app.test_client()
+            hoje = date.today()
+
+            with app.app_context():
+                fora_da_base = tamanho // 50
+                popular_base(tamanho, tamanho - fora_da_base, fora_da_base=fora_da_base)
+                # Transportadora definida em 9 de cada 10 bipagens
+                for indice, nome in enumerate(TRANSPORTADORAS):
+                    db.session.execute(
+                        db.text("UPDATE mercadorias_conferidas SET transportadora = :nome WHERE id % 10 = :indice"),
+                        {'nome': nome, 'indice': indice}
+                    )
+                db.session.commit()
+
+                inicio = time.perf_counter()
+                legado = contadores_legado(hoje)
+                antes = (time.perf_counter() - inicio) * 1000
+                assert calcular_contadores(hoje) == legado, 'Resultados divergentes entre as duas implementações'
+                db.session.remove()
+
+            resposta = cliente.post('/api/dashboard/atualizar')
+            assert resposta.status_code == 200, resposta.json
+            depois = medir(lambda: cliente.post('/api/dashboard/atualizar'))
+
+            incrementar = medir(lambda: cliente.post(
+                '/api/dashboard/incrementar', json={'transportadora': 'JADLOG', 'status': 'coleta'}
+            ), repeticoes=50)
+
+            codigos = iter(gerar_codigos(200))
+            status_atualizar = medir(lambda: cliente.post(
+                '/api/status/atualizar', json={'codigo_rastreio': next(codigos), 'status': 'insucesso'}
+            ), repeticoes=50)
+
+            with app.app_context():
+                db.session.remove()
+                db.engine.dispose()
+
+            print(f"{tamanho:>8} {antes:>21.1f} {depois:>12.1f} {incrementar:>17.2f} {status_atualizar:>22.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Suíte de benchmark dos endpoints de /api com relatório JSON comparável entre commits
+
+Uso:
+    python benchmarks/bench_endpoints.py [--tamanhos 10000 100000 1000000] [--semente N]
+                                         [--saida relatorio.json] [--comparar anterior.json]
+                                         [--endpoints bipar estatisticas ...]
+
+Para cada tamanho o cenário de benchmarks/gerador.py (manifesto + histórico de bipagens
+de 7 dias, metade dos rastreios bipados) é gravado num banco temporário e cada endpoint
+de conferencia_bp é chamado pelo test client do Flask, com Accept-Encoding: gzip como o
+navegador (respostas grandes medidas já comprimidas). Por endpoint o relatório traz
+latência p50/p95/p99, linhas processadas por segundo e instruções SQL por requisição.
+Com --comparar, imprime a razão do p50 de cada endpoint contra um relatório anterior.
+"""
+
+import argparse
+import gzip
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event
+from benchmarks.comum import criar_app
+from benchmarks.gerador import SEMENTE_PADRAO, carregar_cenario, gerar_codigos
+from src.models.rastreio import db
+from src.services.indice import indice_ativo
+
+TAMANHOS_PADRAO = [10_000, 100_000, 1_000_000]
+
+# Códigos por requisição nos endpoints em lote
+CODIGOS_POR_IMPORTACAO = 5000
+CODIGOS_POR_LOTE = 50
+
+# Como o navegador da interface: as respostas grandes vêm com gzip
+CABECALHOS = {'Accept-Encoding': 'gzip'}
+
+
+class ContadorSQL:
+    """Conta as instruções enviadas ao SQLite pelo engine do app"""
+
+    def __init__(self, engine):
+        self.total = 0
+        event.listen(engine, 'before_cursor_execute', self._contar)
+
+    def _contar(self, *args):
+        self.total += 1
+
+
+def percentil(ordenados, p):
+    """Percentil pelo método nearest-rank"""
+    return ordenados[max(0, math.ceil(p / 100 * len(ordenados)) - 1)]
+
+
+def linhas_json(chave):
+    return lambda resposta: len(resposta.get_json()[chave])
+
+
+def linhas_bipadas(resposta):
+    dados = resposta.get_json()
+    return sum(len(dados[chave]) for chave in ('bipadas_coleta', 'bipadas_insucesso', 'bipadas_sem_status'))
+
+
+def linhas_csv(resposta):
+    # Cabeçalho não conta
+    return resposta.get_data().count(b'\n') - 1
+
+
+def definir_casos(resumo, tamanho, semente):
+    """
+    Casos do benchmark na ordem de execução: (nome, método, url, corpo(i), linhas(resposta, corpo), repetições).
+    Os casos que escrevem consomem amostras diferentes do cenário para não repetir códigos.
+    """
+    pendentes = iter(resumo['pendentes'])
+    bipados = resumo['bipados']
+    fora = resumo['fora_da_base']
+    repeticoes_listagem_completa = 3 if tamanho <= 100_000 else 1
+
+    # Importação: 10% do tamanho do cenário em códigos novos, com 10% de repetidos por requisição
+    novos = max(tamanho // 10, CODIGOS_POR_IMPORTACAO)
+    importacoes = novos // CODIGOS_POR_IMPORTACAO
+    codigos_novos = (codigo for codigo, _ in gerar_codigos(novos, inicio=tamanho, semente=semente))
+
+    def corpo_importar(_):
+        lote = [next(codigos_novos) for _ in range(CODIGOS_POR_IMPORTACAO)]
+        return {'rastreios': lote + lote[:CODIGOS_POR_IMPORTACAO // 10]}
+
+    bipar = [next(pendentes) for _ in range(200)]
+    lotes = [[next(pendentes) for _ in range(CODIGOS_POR_LOTE)] for _ in range(10)]
+    status = [next(pendentes) for _ in range(100)]
+    excluir_rastreio = [next(pendentes) for _ in range(50)]
+
+    um = lambda resposta, corpo: 1
+    return [
+        ('importar', 'post', '/api/rastreios/importar', corpo_importar,
+         lambda resposta, corpo: len(corpo['rastreios']), importacoes),
+        ('bipar', 'post', '/api/mercadorias/bipar', lambda i: {'codigo_rastreio': bipar[i]}, um, len(bipar)),
+        ('bipar_ja_conferida', 'post', '/api/mercadorias/bipar',
+         lambda i: {'codigo_rastreio': bipados[i % len(bipados)]}, um, 100),
+        ('bipar_fora_da_base', 'post', '/api/mercadorias/bipar',
+         lambda i: {'codigo_rastreio': fora[i % len(fora)]}, um, 100),
+        ('bipar_lote', 'post', '/api/mercadorias/bipar-lote', lambda i: {'codigos': lotes[i]},
+         lambda resposta, corpo: len(corpo['codigos']), len(lotes)),
+        ('estatisticas', 'get', '/api/estatisticas', None, um, 20),
+        ('faltantes', 'get', '/api/mercadorias/faltantes', None,
+         lambda resposta, corpo: linhas_json('faltantes')(resposta), repeticoes_listagem_completa),
+        ('faltantes_pagina', 'get', '/api/mercadorias/faltantes?limit=100', None,
+         lambda resposta, corpo: linhas_json('faltantes')(resposta), 20),
+        ('faltantes_busca', 'get', '/api/mercadorias/faltantes?limit=100&busca=' + bipar[0][:6], None,
+         lambda resposta, corpo: linhas_json('faltantes')(resposta), 20),
+        ('conferidas_pagina', 'get', '/api/mercadorias/conferidas?limit=100', None,
+         lambda resposta, corpo: linhas_json('conferidas')(resposta), 20),
+        ('bipadas_pagina', 'get', '/api/mercadorias/bipadas?limit=100', None,
+         lambda resposta, corpo: linhas_bipadas(resposta), 20),
+        ('bipadas_coleta_pagina', 'get', '/api/mercadorias/bipadas/coleta?limit=100', None,
+         lambda resposta, corpo: linhas_json('bipadas')(resposta), 20),
+        ('dashboard', 'get', '/api/dashboard', None, um, 20),
+        ('dashboard_recalculo', 'post', '/api/dashboard/atualizar', None, um, 5),
+        ('dashboard_incrementar', 'post', '/api/dashboard/incrementar',
+         lambda i: {'transportadora': 'JADLOG', 'status': 'coleta'}, um, 50),
+        ('rastreio_status', 'post', '/api/rastreios/status',
+         lambda i: {'codigo_rastreio': status[i], 'status': 'coleta'}, um, 50),
+        ('status_atualizar', 'post', '/api/status/atualizar',
+         lambda i: {'codigo_rastreio': status[50 + i], 'status': 'insucesso'}, um, 50),
+        ('status_lote', 'post', '/api/rastreios/status/lote',
+         lambda i: {'codigos': bipados[300:800], 'status': ['coleta', 'insucesso'][i % 2]},
+         lambda resposta, corpo: len(corpo['codigos']), 10),
+        ('transportadora', 'post', '/api/transportadora/atualizar',
+         lambda i: {'codigo_rastreio': bipados[100 + i], 'transportadora': 'LOGAN'}, um, 50),
+        ('transportadora_lote', 'post', '/api/transportadora/atualizar-lote',
+         lambda i: {'transportadora': 'J&T'},
+         lambda resposta, corpo: resposta.get_json()['atualizadas'], 1),
+        ('exportar', 'post', '/api/exportar/excel', lambda i: {'transportadora': 'J&T'},
+         lambda resposta, corpo: linhas_csv(resposta), repeticoes_listagem_completa),
+        ('excluir_mercadoria', 'delete', '/api/mercadorias/excluir',
+         lambda i: {'codigo_rastreio': bipados[200 + i]}, um, 50),
+        ('excluir_rastreio', 'delete', '/api/rastreios/excluir',
+         lambda i: {'codigo_rastreio': excluir_rastreio[i]}, um, len(excluir_rastreio)),
+    ]
+
+
+def medir_caso(cliente, contador, metodo, url, corpo, linhas, repeticoes):
+    tempos = []
+    instrucoes = []
+    total_linhas = 0
+    for i in range(repeticoes):
+        dados = corpo(i) if corpo else None
+        antes = contador.total
+        inicio = time.perf_counter()
+        resposta = getattr(cliente, metodo)(url, json=dados, headers=CABECALHOS)
+        # Respostas em streaming (exportação) só terminam quando o corpo é lido
+        resposta.get_data()
+        tempos.append(time.perf_counter() - inicio)
+        if resposta.headers.get('Content-Encoding') == 'gzip':
+            resposta.set_data(gzip.decompress(resposta.get_data()))
+        instrucoes.append(contador.total - antes)
+        if resposta.status_code >= 400:
+            raise RuntimeError(f"{metodo.upper()} {url} -> {resposta.status_code}: {resposta.get_data(as_text=True)[:300]}")
+        total_linhas += linhas(resposta, dados)
+
+    tempos.sort()
+    return {
+        'requisicoes': repeticoes,
+        'p50_ms': round(percentil(tempos, 50) * 1000, 3),
+        'p95_ms': round(percentil(tempos, 95) * 1000, 3),
+        'p99_ms': round(percentil(tempos, 99) * 1000, 3),
+        'media_ms': round(statistics.mean(tempos) * 1000, 3),
+        'linhas': total_linhas,
+        'linhas_por_segundo': round(total_linhas / sum(tempos), 1),
+        'sql_por_requisicao': round(statistics.mean(instrucoes), 1),
+        'sql_max': max(instrucoes)
+    }
+
+
+def rodar_tamanho(tamanho, semente, filtro):
+    with tempfile.TemporaryDirectory() as pasta:
+        app = criar_app(os.path.join(pasta, 'bench.db'))
+        cliente = app.test_client()
+
+        with app.app_context():
+            inicio = time.perf_counter()
+            resumo = carregar_cenario(tamanho, semente=semente)
+            carga = time.perf_counter() - inicio
+            # Carga do índice em memória fora das medições
+            indice_ativo()
+            contador = ContadorSQL(db.engine)
+            db.session.remove()
+
+        resultados = {}
+        for nome, metodo, url, corpo, linhas, repeticoes in definir_casos(resumo, tamanho, semente):
+            if filtro and nome not in filtro:
+                continue
+            resultados[nome] = medir_caso(cliente, contador, metodo, url, corpo, linhas, repeticoes)
+            r = resultados[nome]
+            print(f"  {nome:<24} p50 {r['p50_ms']:>10.2f}  p95 {r['p95_ms']:>10.2f}  p99 {r['p99_ms']:>10.2f} ms  "
+                  f"{r['linhas_por_segundo']:>12,.0f} linhas/s  {r['sql_por_requisicao']:>8.1f} SQL/req")
+
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+
+    return {
+        'cenario': {
+            'esperados': resumo['esperados'],
+            'bipagens': resumo['bipagens'],
+            'por_status': resumo['por_status'],
+            'carga_s': round(carga, 2)
+        },
+        'endpoints': resultados
+    }
+
+
+def commit_atual():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparar(relatorio, caminho_anterior):
+    """Imprime a razão atual/anterior do p50 de cada endpoint (< 1 = mais rápido agora)"""
+    with open(caminho_anterior, encoding='utf-8') as arquivo:
+        anterior = json.load(arquivo)
+
+    print(f"\nComparação com {caminho_anterior} (commit {anterior.get('commit')}): p50 atual / anterior")
+    for tamanho, dados in relatorio['tamanhos'].items():
+        endpoints_anteriores = anterior['tamanhos'].get(tamanho, {}).get('endpoints', {})
+        for nome, resultado in dados['endpoints'].items():
+            if nome in endpoints_anteriores and endpoints_anteriores[nome]['p50_ms']:
+                razao = resultado['p50_ms'] / endpoints_anteriores[nome]['p50_ms']
+                print(f"  {tamanho:>8} {nome:<24} {endpoints_anteriores[nome]['p50_ms']:>10.2f} -> "
+                      f"{resultado['p50_ms']:>10.2f} ms  x{razao:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark dos endpoints de /api')
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=TAMANHOS_PADRAO)
+    parser.add_argument('--semente', type=int, default=SEMENTE_PADRAO)
+    parser.add_argument('--saida', default='relatorio_endpoints.json')
+    parser.add_argument('--comparar', help='relatório JSON de outro commit')
+    parser.add_argument('--endpoints', nargs='+', help='medir apenas estes casos')
+    args = parser.parse_args()
+
+    relatorio = {
+        'gerado_em': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit_atual(),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'semente': args.semente,
+        'tamanhos': {}
+    }
+    for tamanho in args.tamanhos:
+        print(f"{tamanho:,} rastreios esperados")
+        relatorio['tamanhos'][str(tamanho)] = rodar_tamanho(tamanho, args.semente, args.endpoints)
+
+    with open(args.saida, 'w', encoding='utf-8') as arquivo:
+        json.dump(relatorio, arquivo, ensure_ascii=False, indent=2)
+    print(f"\nRelatório gravado em {args.saida}")
+
+    if args.comparar:
+        comparar(relatorio, args.comparar)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Benchmark dos arquivos estáticos: send_from_directory x memória com gzip e ETag
+
+Uso:
+    python benchmarks/bench_estaticos.py [--repeticoes 500]
+
+Simula a abertura da interface por um tablet (index.html, styles.css e script.js) na
+primeira visita e em um recarregamento, contando requisições e bytes transferidos, e
+mede o tempo por requisição de cada arquivo na rota antiga (os.path.exists +
+send_from_directory: sem compressão, todo arquivo revalidado a cada carga) e na atual
+(src/services/estaticos.py).
+"""
+
+import argparse
+import gzip
+import os
+import re
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from flask import Flask, send_from_directory
+from src.services.estaticos import ArquivosEstaticos
+
+PASTA = os.path.join(RAIZ, 'src', 'static')
+NAVEGADOR = {'Accept-Encoding': 'gzip, deflate, br'}
+
+
+def app_antigo():
+    app = Flask(__name__, static_folder=PASTA)
+
+    @app.route('/', defaults={'path': ''})
+    @app.route('/<path:path>')
+    def serve(path):
+        if path != "" and os.path.exists(os.path.join(app.static_folder, path)):
+            return send_from_directory(app.static_folder, path)
+        return send_from_directory(app.static_folder, 'index.html')
+
+    return app
+
+
+def app_atual():
+    app = Flask(__name__, static_folder=PASTA)
+    estaticos = ArquivosEstaticos(PASTA)
+
+    @app.route('/', defaults={'path': ''})
+    @app.route('/<path:path>')
+    def serve(path):
+        return estaticos.responder(path)
+
+    return app
+
+
+def abrir_interface(cliente, etags):
+    """Baixa a página e os recursos dela como um navegador - retorna (requisições, bytes recebidos)"""
+    requisicoes = 1
+    resposta = cliente.get('/', headers={**NAVEGADOR, **etags.get('/', {})})
+    total = len(resposta.data)
+    etags['/'] = {'If-None-Match': resposta.headers['ETag']} if resposta.headers.get('ETag') else {}
+    if resposta.status_code == 304:
+        html = etags['html']
+    else:
+        corpo = resposta.data
+        if resposta.headers.get('Content-Encoding') == 'gzip':
+            corpo = gzip.decompress(corpo)
+        html = etags['html'] = corpo.decode('utf-8')
+    for recurso in re.findall(r'(?:href|src)="([^":]+\.(?:css|js))"', html):
+        if recurso in etags.get('imutaveis', set()):
+            continue  # Cache-Control immutable: o navegador nem pergunta
+        requisicoes += 1
+        resposta = cliente.get('/' + recurso, headers={**NAVEGADOR, **etags.get(recurso, {})})
+        total += len(resposta.data)
+        if 'immutable' in resposta.headers.get('Cache-Control', ''):
+            etags.setdefault('imutaveis', set()).add(recurso)
+        if resposta.headers.get('ETag'):
+            etags[recurso] = {'If-None-Match': resposta.headers['ETag']}
+    return requisicoes, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeticoes', type=int, default=500)
+    args = parser.parse_args()
+
+    print(f"{'rota':<10} {'1ª visita':>16} {'recarregar':>16} {'/ (µs)':>8} {'styles.css (µs)':>16} {'script.js (µs)':>15}")
+    for rotulo, app in [('antiga', app_antigo()), ('memória', app_atual())]:
+        cliente = app.test_client()
+        etags = {}
+        primeira = abrir_interface(cliente, etags)
+        recarregar = abrir_interface(cliente, etags)
+
+        tempos = []
+        for caminho in ['/', '/styles.css', '/script.js']:
+            inicio = time.perf_counter()
+            for _ in range(args.repeticoes):
+                cliente.get(caminho, headers=NAVEGADOR).close()
+            tempos.append((time.perf_counter() - inicio) / args.repeticoes * 1_000_000)
+
+        print(f"{rotulo:<10} {primeira[0]:>3} req {primeira[1] / 1024:>6.1f} KB {recarregar[0]:>3} req {recarregar[1] / 1024:>6.1f} KB "
+              f"{tempos[0]:>8.0f} {tempos[1]:>16.0f} {tempos[2]:>15.0f}")
+
+
+if __name__ == '__main__':
+    main()
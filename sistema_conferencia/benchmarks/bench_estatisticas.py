@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Benchmark de /api/estatisticas: cinco COUNTs separados (antes) x agregação única (depois)
+
+O "antes" roda as consultas originais sem índice em rastreios_esperados.status;
+o "depois" chama a rota atual com o índice criado pela migração.
+
+Uso:
+    python benchmarks/bench_estatisticas.py [tamanho ...]
+
+Para cada tamanho (padrão 100.000 e 1.000.000 rastreios esperados) a base recebe
+metade dos códigos bipados e mais 1% de bipagens fora da base.
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.comum import criar_app, popular_base, medir
+from src.models.rastreio import db, RastreioEsperado, MercadoriaConferida
+
+
+def estatisticas_legado():
+    """Reprodução das consultas originais de obter_estatisticas"""
+    total_esperados = RastreioEsperado.query.count()
+    total_conferidos = db.session.query(RastreioEsperado).filter(
+        RastreioEsperado.status.in_(['conferido', 'coleta', 'insucesso'])
+    ).count()
+    total_pendentes = RastreioEsperado.query.filter_by(status='pendente').count()
+    total_fora_base = MercadoriaConferida.query.join(
+        RastreioEsperado,
+        MercadoriaConferida.codigo_rastreio == RastreioEsperado.codigo_rastreio,
+        isouter=True
+    ).filter(RastreioEsperado.id.is_(None)).count()
+    total_bipadas = MercadoriaConferida.query.count()
+    return total_esperados, total_conferidos, total_pendentes, total_fora_base, total_bipadas
+
+
+def main():
+    tamanhos = [int(arg) for arg in sys.argv[1:]] or [100_000, 1_000_000]
+
+    print(f"{'esperados':>10} {'bipadas':>10} {'antes (ms)':>12} {'depois (ms)':>12} {'ganho':>7}")
+    for tamanho in tamanhos:
+        with tempfile.TemporaryDirectory() as pasta:
+            app = criar_app(os.path.join(pasta, 'bench.db'))
+            cliente = app.test_client()
+
+            with app.app_context():
+                popular_base(tamanho, tamanho // 2, fora_da_base=tamanho // 100)
+
+                # Antes: consultas originais sobre o esquema original (sem índice no status)
+                db.session.execute(db.text("DROP INDEX ix_rastreios_esperados_status_codigo"))
+                antes = medir(estatisticas_legado)
+                db.session.execute(db.text("CREATE INDEX ix_rastreios_esperados_status_codigo ON rastreios_esperados (status, codigo_rastreio)"))
+                db.session.commit()
+
+            resposta = cliente.get('/api/estatisticas')
+            assert resposta.status_code == 200, resposta.json
+            depois = medir(lambda: cliente.get('/api/estatisticas'))
+
+            with app.app_context():
+                assert estatisticas_legado() == (
+                    resposta.json['total_esperados'], resposta.json['total_conferidos'],
+                    resposta.json['total_pendentes'], resposta.json['total_fora_base'],
+                    resposta.json['total_bipadas']
+                ), 'Resultados divergentes entre as duas implementações'
+                bipadas = MercadoriaConferida.query.count()
+                db.session.remove()
+                db.engine.dispose()
+
+            print(f"{tamanho:>10} {bipadas:>10} {antes:>12.1f} {depois:>12.1f} {antes / depois:>6.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Benchmark do histórico do dashboard: resumo diário x agregação das bipagens
+
+Uso:
+    python benchmarks/bench_historico.py [rastreios...] [--dias N]
+
+Para cada tamanho (padrão 100.000 e 1.000.000 rastreios, metade bipada ao longo de
+`dias` dias - padrão 90) mede o fechamento de todos os dias pendentes e a latência de
+/api/dashboard/historico para 7, 30 e `dias` dias, comparando com a mesma série
+calculada direto de mercadorias_conferidas (GROUP BY por dia x transportadora x status).
+Confere também que o resumo bate com a agregação das bipagens.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func, select
+from benchmarks.comum import criar_app, medir
+from benchmarks.gerador import carregar_cenario
+from src.models.rastreio import db, RastreioEsperado, MercadoriaConferida
+from src.services.dashboard import categoria_status
+from src.services.resumo import fechar_dias_pendentes
+
+REPETICOES = 20
+
+
+def serie_das_bipagens(de, ate):
+    """Mesma série do histórico calculada das bipagens (o que o resumo evita)"""
+    linhas = db.session.execute(
+        select(MercadoriaConferida.data_bipagem, categoria_status(RastreioEsperado.status), func.count())
+        .select_from(MercadoriaConferida)
+        .outerjoin(RastreioEsperado, MercadoriaConferida.codigo_rastreio == RastreioEsperado.codigo_rastreio)
+        .where(MercadoriaConferida.data_bipagem >= de, MercadoriaConferida.data_bipagem <= ate)
+        .group_by(MercadoriaConferida.data_bipagem, categoria_status(RastreioEsperado.status))
+    ).all()
+    totais = {}
+    for data, categoria, quantidade in linhas:
+        totais[categoria] = totais.get(categoria, 0) + quantidade
+    return totais
+
+
+def rodar(quantidade, dias):
+    with tempfile.TemporaryDirectory() as pasta:
+        app = criar_app(os.path.join(pasta, 'bench.db'))
+        cliente = app.test_client()
+        hoje = date.today()
+        resultado = {'rastreios': quantidade, 'periodos': {}}
+
+        with app.app_context():
+            resumo = carregar_cenario(quantidade, dias=dias, hoje=hoje)
+            resultado['bipagens'] = resumo['bipagens']
+
+            inicio = time.perf_counter()
+            fechados = fechar_dias_pendentes()
+            resultado['fechamento_s'] = time.perf_counter() - inicio
+            resultado['dias_fechados'] = len(fechados)
+
+        # Dias já encerrados: o dia atual vem do DashboardCache, não do resumo
+        ontem = hoje - timedelta(days=1)
+        for periodo in sorted({7, 30, dias}):
+            de = hoje - timedelta(days=periodo)
+            url = f'/api/dashboard/historico?de={de.isoformat()}&ate={ontem.isoformat()}'
+            resposta = cliente.get(url).get_json()
+            tempo_resumo = medir(lambda: cliente.get(url), REPETICOES)
+
+            with app.app_context():
+                bipagens = serie_das_bipagens(de, ontem)
+                tempo_bipagens = medir(lambda: serie_das_bipagens(de, ontem), max(REPETICOES // 4, 1))
+
+            totais = resposta['totais']
+            confere = (
+                totais['total'] == sum(bipagens.values())
+                and all(totais[categoria] == bipagens.get(categoria, 0) for categoria in ['coleta', 'insucesso', 'sem_status'])
+            )
+            resultado['periodos'][periodo] = {
+                'resumo_ms': tempo_resumo,
+                'bipagens_ms': tempo_bipagens,
+                'dias': len(resposta['dias']),
+                'confere': confere
+            }
+
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('tamanhos', nargs='*', type=int, default=[100_000, 1_000_000])
+    parser.add_argument('--dias', type=int, default=90)
+    args = parser.parse_args()
+
+    print(f"{'rastreios':>10} {'bipagens':>9} {'fechamento':>11} {'período':>8} "
+          f"{'histórico (ms)':>15} {'das bipagens (ms)':>18} {'ganho':>7}  conferência")
+    for quantidade in args.tamanhos:
+        r = rodar(quantidade, args.dias)
+        for periodo, p in r['periodos'].items():
+            print(f"{r['rastreios']:>10,} {r['bipagens']:>9,} {r['fechamento_s']:>10.2f}s {periodo:>6} d "
+                  f"{p['resumo_ms']:>15.2f} {p['bipagens_ms']:>18.2f} {p['bipagens_ms'] / p['resumo_ms']:>6.0f}x  "
+                  f"{'ok' if p['confere'] else 'DIVERGENTE'} ({p['dias']} dias)")
+
+
+if __name__ == '__main__':
+    main()
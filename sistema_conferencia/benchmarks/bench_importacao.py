@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark da importação em massa de rastreios
+
+Uso:
+    python benchmarks/bench_importacao.py [quantidade]
+
+Cria um banco SQLite temporário, importa `quantidade` códigos (padrão 500.000)
+pelo motor set-based e compara com o laço antigo (uma consulta por código)
+numa amostra menor, extrapolando o tempo para o mesmo volume.
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from src.models.rastreio import db, RastreioEsperado
+from src.services.importacao import importar_codigos
+
+AMOSTRA_LEGADO = 5000
+
+
+def criar_app(caminho_db):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{caminho_db}"
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def gerar_codigos(quantidade, inicio=0):
+    # Formato S10 dos Correios: 2 letras + 9 dígitos + BR
+    return [f"AA{numero:09d}BR" for numero in range(inicio, inicio + quantidade)]
+
+
+def importar_legado(codigos):
+    """Reprodução do laço original de importar_rastreios"""
+    novos = duplicados = 0
+    for codigo in codigos:
+        codigo = codigo.strip().upper()
+        if RastreioEsperado.query.filter_by(codigo_rastreio=codigo).first():
+            duplicados += 1
+            continue
+        db.session.add(RastreioEsperado(codigo_rastreio=codigo))
+        novos += 1
+    db.session.commit()
+    return novos, duplicados
+
+
+def main():
+    quantidade = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+
+    with tempfile.TemporaryDirectory() as pasta:
+        app = criar_app(os.path.join(pasta, 'bench.db'))
+        with app.app_context():
+            codigos = gerar_codigos(quantidade)
+
+            inicio = time.perf_counter()
+            novos, duplicados = importar_codigos(codigos)
+            db.session.commit()
+            tempo_novo = time.perf_counter() - inicio
+            print(f"Motor set-based: {quantidade} códigos em {tempo_novo:.2f}s "
+                  f"({quantidade / tempo_novo:,.0f} códigos/s) - novos={novos} duplicados={duplicados}")
+
+            # Reimportar metade dos códigos + metade nova mede o caminho de duplicados
+            metade = quantidade // 2
+            mistura = codigos[metade:] + gerar_codigos(metade, inicio=quantidade)
+            inicio = time.perf_counter()
+            novos, duplicados = importar_codigos(mistura)
+            db.session.commit()
+            tempo_misto = time.perf_counter() - inicio
+            print(f"Reimportação 50% duplicada: {len(mistura)} códigos em {tempo_misto:.2f}s "
+                  f"- novos={novos} duplicados={duplicados}")
+
+            amostra = gerar_codigos(AMOSTRA_LEGADO, inicio=quantidade * 2)
+            inicio = time.perf_counter()
+            importar_legado(amostra)
+            tempo_legado = time.perf_counter() - inicio
+            estimado = tempo_legado / AMOSTRA_LEGADO * quantidade
+            print(f"Laço legado: {AMOSTRA_LEGADO} códigos em {tempo_legado:.2f}s "
+                  f"(estimativa para {quantidade}: {estimado:.0f}s)")
+
+            db.session.remove()
+            db.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
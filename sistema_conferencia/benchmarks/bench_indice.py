@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark do índice em memória dos rastreios (src/services/indice.py)
+
+Uso:
+    python benchmarks/bench_indice.py [tamanho ...]
+
+Para cada tamanho (padrão 100.000 e 1.000.000 rastreios esperados, com metade já
+bipada) mede a carga do índice, a memória ocupada e a latência de
+/api/mercadorias/bipar com o índice desativado (consultas ao banco) e ativado,
+para códigos da base e fora dela, além do tempo só da consulta que a bipagem faz.
+No fim confere o índice contra o banco.
+"""
+
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.comum import criar_app, popular_base, gerar_codigos
+from src import config
+from src.models.rastreio import db
+from src.services.indice import indice_rastreios, consultar_rastreio
+
+AMOSTRAS = 200
+
+
+def medir_bipagens(cliente, codigos, esperado):
+    """Retorna (p50, p95) em milissegundos da bipagem de cada código"""
+    tempos = []
+    for codigo in codigos:
+        inicio = time.perf_counter()
+        resposta = cliente.post('/api/mercadorias/bipar', json={'codigo_rastreio': codigo})
+        tempos.append((time.perf_counter() - inicio) * 1000)
+        assert resposta.json.get('status') == esperado, resposta.json
+    tempos.sort()
+    return statistics.median(tempos), tempos[int(len(tempos) * 0.95) - 1]
+
+
+def medir_consultas(app, codigos):
+    """Tempo médio em microssegundos só da consulta (status, já bipado) de cada código"""
+    with app.app_context():
+        inicio = time.perf_counter()
+        for codigo in codigos:
+            consultar_rastreio(codigo)
+        return (time.perf_counter() - inicio) * 1_000_000 / len(codigos)
+
+
+def main():
+    tamanhos = [int(arg) for arg in sys.argv[1:]] or [100_000, 1_000_000]
+
+    print(f"{'esperados':>10} {'carga (ms)':>11} {'memória (MB)':>13} {'B/rastreio':>11} "
+          f"{'consulta sem/com (µs)':>22} {'sem índice p50/p95 (ms)':>25} {'com índice p50/p95 (ms)':>25} "
+          f"{'fora da base c/ índice':>23}")
+    for tamanho in tamanhos:
+        with tempfile.TemporaryDirectory() as pasta:
+            app = criar_app(os.path.join(pasta, 'bench.db'))
+            cliente = app.test_client()
+            pendentes = gerar_codigos(2 * AMOSTRAS, inicio=tamanho // 2)
+            fora_da_base = gerar_codigos(AMOSTRAS, prefixo='ZZ')
+
+            with app.app_context():
+                popular_base(tamanho, tamanho // 2)
+
+            amostra = gerar_codigos(AMOSTRAS * 10, inicio=tamanho // 3)
+            config.INDICE_MEMORIA = False
+            consulta_banco = medir_consultas(app, amostra)
+            sem_indice = medir_bipagens(cliente, pendentes[:AMOSTRAS], 'encontrado')
+
+            config.INDICE_MEMORIA = True
+            with app.app_context():
+                indice_rastreios.carregar()
+            memoria = indice_rastreios.memoria()
+            consulta_indice = medir_consultas(app, amostra)
+            com_indice = medir_bipagens(cliente, pendentes[AMOSTRAS:], 'encontrado')
+            fora = medir_bipagens(cliente, fora_da_base, 'nao_encontrado')
+
+            verificacao = cliente.get('/api/indice/verificar').json
+            assert verificacao['consistente'], verificacao
+
+            with app.app_context():
+                db.session.remove()
+                db.engine.dispose()
+
+            print(f"{tamanho:>10} {indice_rastreios.duracao_carga_ms:>11.0f} {memoria['mb_total']:>13.1f} "
+                  f"{memoria['bytes_por_rastreio']:>11.0f} {consulta_banco:>10.1f} / {consulta_indice:>9.1f} {sem_indice[0]:>13.2f} / {sem_indice[1]:>9.2f} "
+                  f"{com_indice[0]:>13.2f} / {com_indice[1]:>9.2f} {fora[0]:>11.2f} / {fora[1]:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
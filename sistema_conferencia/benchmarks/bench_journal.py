@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Benchmark do journal de bipagens (write-behind) x bipagem gravada direto no SQLite
+
+Uso:
+    python benchmarks/bench_journal.py [bipagens] [estacoes] [esperados_na_base]
+
+Com a mesma base (padrão 100.000 rastreios, metade bipada) mede, nos dois modos, a
+latência de confirmação de /api/mercadorias/bipar (p50/p95/p99) e a vazão sustentada
+com `estacoes` threads bipando ao mesmo tempo (padrão 2.000 bipagens e 4 estações).
+No modo journal também mede quanto tempo a gravação em lote leva para alcançar as
+confirmações e confere o resultado: banco, índice e dashboard iguais ao modo direto.
+"""
+
+import math
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.comum import criar_app, popular_base, gerar_codigos
+from src.models.rastreio import db, MercadoriaConferida
+from src.services.dashboard import calcular_contadores
+from src.services.indice import indice_ativo
+from src.services.journal import journal_bipagens
+
+
+def percentil(ordenados, p):
+    return ordenados[max(0, math.ceil(p / 100 * len(ordenados)) - 1)]
+
+
+def bipar_em_paralelo(app, codigos, estacoes):
+    """Divide os códigos entre as estações - retorna (latências em ms, duração total em s)"""
+    latencias = []
+    lock = threading.Lock()
+    inicio_evento = threading.Event()
+
+    def estacao(parte):
+        cliente = app.test_client()
+        tempos = []
+        inicio_evento.wait()
+        for codigo in parte:
+            inicio = time.perf_counter()
+            resposta = cliente.post('/api/mercadorias/bipar', json={'codigo_rastreio': codigo})
+            tempos.append((time.perf_counter() - inicio) * 1000)
+            assert resposta.status_code == 200, resposta.get_json()
+        with lock:
+            latencias.extend(tempos)
+
+    threads = [threading.Thread(target=estacao, args=(codigos[i::estacoes],)) for i in range(estacoes)]
+    for thread in threads:
+        thread.start()
+    inicio = time.perf_counter()
+    inicio_evento.set()
+    for thread in threads:
+        thread.join()
+    return sorted(latencias), time.perf_counter() - inicio
+
+
+def rodar(modo, bipagens, estacoes, esperados):
+    with tempfile.TemporaryDirectory() as pasta:
+        app = criar_app(os.path.join(pasta, 'bench.db'))
+        cliente = app.test_client()
+        with app.app_context():
+            popular_base(esperados, esperados // 2)
+            indice_ativo()
+        cliente.get('/api/dashboard')
+
+        # Metade pendentes da base, 5% fora da base, 5% repetidas
+        pendentes = gerar_codigos(bipagens, inicio=esperados // 2)
+        codigos = pendentes[:int(bipagens * 0.9)] + gerar_codigos(bipagens // 20, prefixo='ZZ')
+        codigos += pendentes[:bipagens - len(codigos)]
+        sequenciais, paralelos = codigos[:bipagens // 4], codigos[bipagens // 4:]
+
+        if modo == 'journal':
+            journal_bipagens.iniciar(app, os.path.join(pasta, 'bipagens.journal'))
+
+        latencias, _ = bipar_em_paralelo(app, sequenciais, 1)
+        latencias_paralelo, duracao = bipar_em_paralelo(app, paralelos, estacoes)
+
+        alcance = 0.0
+        if modo == 'journal':
+            # Tempo até o banco alcançar todas as bipagens confirmadas
+            inicio = time.perf_counter()
+            while journal_bipagens.situacao()['pendentes']:
+                time.sleep(0.01)
+            alcance = time.perf_counter() - inicio
+            journal_bipagens.parar()
+
+        with app.app_context():
+            gravadas = db.session.query(MercadoriaConferida).count()
+            contadores = calcular_contadores(date.today())
+        dashboard = cliente.get('/api/dashboard').get_json()
+        consistente = cliente.get('/api/indice/verificar').get_json()['consistente']
+
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+
+    return {
+        'latencias': latencias,
+        'latencias_paralelo': latencias_paralelo,
+        'vazao': len(paralelos) / duracao,
+        'alcance': alcance,
+        'gravadas': gravadas,
+        'dashboard_ok': dashboard['total_hoje'] == contadores['total_hoje']
+                        and dashboard['sem_status_hoje'] == contadores['sem_status_hoje'],
+        'indice_ok': consistente
+    }
+
+
+def main():
+    bipagens = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    estacoes = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    esperados = int(sys.argv[3]) if len(sys.argv) > 3 else 100_000
+
+    resultados = {modo: rodar(modo, bipagens, estacoes, esperados) for modo in ['direto', 'journal']}
+
+    print(f"{'modo':<8} {'confirmação p50/p95/p99 (ms)':>30} {f'{estacoes} estações p50/p99 (ms)':>26} "
+          f"{'bipagens/s':>11} {'alcance do banco (s)':>21} {'linhas':>8}  consistência")
+    for modo, r in resultados.items():
+        sequencial, paralelo = r['latencias'], r['latencias_paralelo']
+        print(f"{modo:<8} {percentil(sequencial, 50):>10.2f} / {percentil(sequencial, 95):>6.2f} / {percentil(sequencial, 99):>6.2f} "
+              f"{percentil(paralelo, 50):>15.2f} / {percentil(paralelo, 99):>7.2f} {r['vazao']:>11,.0f} "
+              f"{r['alcance']:>21.2f} {r['gravadas']:>8}  "
+              f"dashboard {'ok' if r['dashboard_ok'] else 'DIVERGENTE'}, índice {'ok' if r['indice_ok'] else 'DIVERGENTE'}")
+
+
+if __name__ == '__main__':
+    main()
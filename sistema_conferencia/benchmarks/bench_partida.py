@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Benchmark da inicialização do servidor (python -m src.serve)
+
+Uso:
+    python benchmarks/bench_partida.py [--rastreios 1000000] [--repeticoes 3]
+
+Mede, do início do processo até a primeira resposta HTTP e até o índice em memória
+ficar pronto (/api/indice), a partida do servidor em três situações:
+
+- banco novo (arquivo ainda inexistente);
+- banco com `rastreios` (metade bipada) sem a versão do schema gravada: migração
+  completa e carga do índice antes de atender, como era toda partida antes;
+- o mesmo banco já na versão atual: introspecção pulada e índice em segundo plano.
+"""
+
+import argparse
+import http.client
+import json
+import os
+import shutil
+import signal
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from benchmarks.bench_servidor import porta_livre, preparar_banco
+
+
+def consultar(porta, url):
+    conexao = http.client.HTTPConnection('127.0.0.1', porta, timeout=5)
+    try:
+        conexao.request('GET', url)
+        resposta = conexao.getresponse()
+        return resposta.status, resposta.read()
+    finally:
+        conexao.close()
+
+
+def partida(banco, ambiente_extra=None, limite=300):
+    """Sobe o servidor e retorna (s até a primeira resposta, s até o índice pronto)"""
+    porta = porta_livre()
+    ambiente = dict(
+        os.environ,
+        CONFERENCIA_DB_PATH=banco,
+        CONFERENCIA_SERVIDOR_HOST='127.0.0.1',
+        CONFERENCIA_SERVIDOR_PORTA=str(porta),
+        CONFERENCIA_FECHAMENTO_DIARIO='0',
+        **(ambiente_extra or {})
+    )
+    inicio = time.perf_counter()
+    processo = subprocess.Popen(
+        [sys.executable, '-m', 'src.serve'], cwd=RAIZ, env=ambiente, start_new_session=True,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    primeira_resposta = None
+    try:
+        while time.perf_counter() - inicio < limite:
+            if processo.poll() is not None:
+                raise RuntimeError('o servidor terminou antes de responder')
+            try:
+                status, corpo = consultar(porta, '/api/indice')
+            except OSError:
+                time.sleep(0.01)
+                continue
+            agora = time.perf_counter() - inicio
+            if status == 200 and primeira_resposta is None:
+                primeira_resposta = agora
+            if status == 200 and json.loads(corpo).get('ativo'):
+                return primeira_resposta, agora
+            time.sleep(0.01)
+        raise RuntimeError('o servidor não ficou pronto a tempo')
+    finally:
+        os.killpg(processo.pid, signal.SIGTERM)
+        processo.wait()
+
+
+def gravar_versao(banco, versao):
+    with sqlite3.connect(banco) as conexao:
+        conexao.execute(f"PRAGMA user_version = {versao}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rastreios', type=int, default=1_000_000)
+    parser.add_argument('--repeticoes', type=int, default=3)
+    args = parser.parse_args()
+
+    resultados = {}
+    with tempfile.TemporaryDirectory() as pasta:
+        banco = os.path.join(pasta, 'partida.db')
+
+        def medir(rotulo, preparar, ambiente_extra=None):
+            medidas = []
+            for _ in range(args.repeticoes):
+                preparar()
+                medidas.append(partida(banco, ambiente_extra))
+            resultados[rotulo] = (
+                statistics.median(m[0] for m in medidas) * 1000,
+                statistics.median(m[1] for m in medidas) * 1000
+            )
+
+        def apagar_banco():
+            for sufixo in ('', '-wal', '-shm'):
+                if os.path.exists(banco + sufixo):
+                    os.remove(banco + sufixo)
+
+        medir('banco novo', apagar_banco)
+
+        modelo = os.path.join(pasta, 'modelo.db')
+        preparar_banco(modelo, args.rastreios)
+
+        def banco_sem_versao():
+            apagar_banco()
+            shutil.copy(modelo, banco)
+            gravar_versao(banco, 0)
+
+        medir('sem versão, índice antes de atender', banco_sem_versao, {'CONFERENCIA_INDICE_SEGUNDO_PLANO': '0'})
+        medir('versão atual, índice em segundo plano', lambda: None)
+
+    print(f"{args.rastreios:,} rastreios (metade bipada), mediana de {args.repeticoes} partidas")
+    print(f"{'situação':<40} {'1ª resposta (ms)':>17} {'índice pronto (ms)':>19}")
+    for rotulo, (resposta, indice) in resultados.items():
+        print(f"{rotulo:<40} {resposta:>17,.0f} {indice:>19,.0f}")
+
+
+if __name__ == '__main__':
+    main()
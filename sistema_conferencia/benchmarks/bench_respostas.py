@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Benchmark da camada de resposta: codificadores JSON e gzip em uma listagem de 100k linhas
+
+Uso:
+    python benchmarks/bench_respostas.py [linhas] [--repeticoes 5]
+
+Com `linhas` bipadas (padrão 100.000) mede:
+- a montagem dos dicionários e a serialização da listagem /api/mercadorias/bipadas:
+  como era (isoformat por linha + provedor padrão do Flask) x ProvedorJson com stdlib
+  x com orjson;
+- os bytes na rede sem compressão e com gzip níveis 1, 5 e 9, e o tempo de compressão;
+- a requisição completa pelo cliente de testes com cada codificador, com e sem gzip.
+"""
+
+import argparse
+import gzip
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask.json.provider import DefaultJSONProvider
+from benchmarks.comum import criar_app, popular_base
+from src import config
+from src.models.rastreio import db
+from src.routes.conferencia import consultar_bipadas, item_bipada
+from src.services.respostas import CODIFICADORES, ProvedorJson
+
+
+def mediana_ms(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tempos), resultado
+
+
+def item_bipada_antigo(linha):
+    return {
+        "codigo": linha.codigo_rastreio,
+        "timestamp": linha.timestamp.isoformat(),
+        "transportadora": linha.transportadora,
+        "data_bipagem": linha.data_bipagem.isoformat() if linha.data_bipagem else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('linhas', nargs='?', type=int, default=100_000)
+    parser.add_argument('--repeticoes', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        app = criar_app(os.path.join(pasta, 'bench.db'))
+        with app.app_context():
+            popular_base(args.linhas, args.linhas)
+            linhas, _ = consultar_bipadas()
+
+            def listagem(formatar):
+                listas = {'coleta': [], 'insucesso': [], 'sem_status': []}
+                for linha in linhas:
+                    listas[linha.categoria].append(formatar(linha))
+                return {'bipadas_coleta': listas['coleta'], 'bipadas_insucesso': listas['insucesso'],
+                        'bipadas_sem_status': listas['sem_status'], 'total': len(linhas)}
+
+            provedores = [('antes: isoformat + Flask', DefaultJSONProvider(app), item_bipada_antigo)]
+            provedores += [(f'ProvedorJson {nome}', ProvedorJson(app, funcao), item_bipada)
+                           for nome, funcao in CODIFICADORES.items()]
+
+            print(f"{args.linhas:,} linhas em /api/mercadorias/bipadas, mediana de {args.repeticoes} execuções")
+            print()
+            print(f"{'serialização':<28} {'montagem (ms)':>14} {'JSON (ms)':>10} {'bytes':>12}")
+            corpo = None
+            for rotulo, provedor, formatar in provedores:
+                ms_montagem, dados = mediana_ms(lambda: listagem(formatar), args.repeticoes)
+                with app.test_request_context():
+                    ms_json, resposta = mediana_ms(lambda: provedor.response(dados), args.repeticoes)
+                corpo = resposta.get_data()
+                print(f"{rotulo:<28} {ms_montagem:>14.1f} {ms_json:>10.1f} {len(corpo):>12,}")
+
+            print()
+            print(f"{'compressão':<28} {'tempo (ms)':>21} {'bytes na rede':>14} {'taxa':>7}")
+            print(f"{'sem gzip':<28} {0:>21.1f} {len(corpo):>14,} {1:>6.1f}x")
+            for nivel in (1, 5, 9):
+                ms, comprimido = mediana_ms(lambda: gzip.compress(corpo, compresslevel=nivel, mtime=0), args.repeticoes)
+                print(f"{'gzip nível ' + str(nivel):<28} {ms:>21.1f} {len(comprimido):>14,} {len(corpo) / len(comprimido):>6.1f}x")
+
+        print()
+        print(f"{'requisição completa':<28} {'sem gzip (ms)':>21} {'com gzip (ms)':>14}")
+        cliente = app.test_client()
+        for nome, funcao in CODIFICADORES.items():
+            app.json = ProvedorJson(app, funcao)
+            tempos = []
+            for cabecalhos in ({}, {'Accept-Encoding': 'gzip'}):
+                ms, _ = mediana_ms(lambda: cliente.get('/api/mercadorias/bipadas', headers=cabecalhos).data, args.repeticoes)
+                tempos.append(ms)
+            print(f"{nome + ' (gzip nível ' + str(config.GZIP_NIVEL) + ')':<28} {tempos[0]:>21.1f} {tempos[1]:>14.1f}")
+
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Teste de carga: servidor de desenvolvimento (python src/main.py) x produção (python -m src.serve)
+
+Uso:
+    python benchmarks/bench_servidor.py [--clientes 16] [--segundos 15] [--rastreios 100000]
+
+Prepara um banco com `rastreios` (metade bipada), sobe cada servidor em um processo
+próprio sobre uma cópia desse banco e dispara `clientes` conexões simultâneas durante
+`segundos` segundos, cada uma reaproveitando a conexão HTTP quando o servidor permite
+(keep-alive). A carga é a de uma estação de bipagem com a tela aberta: 60% bipagens,
+30% dashboard e 10% estatísticas. Reporta requisições/s, latência p50/p95/p99, erros e o tempo até o
+servidor responder a primeira requisição.
+"""
+
+import argparse
+import http.client
+import itertools
+import json
+import math
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from benchmarks.comum import criar_app, popular_base, gerar_codigos
+from src.models.rastreio import db
+
+MODOS = {
+    'desenvolvimento': [sys.executable, os.path.join('src', 'main.py')],
+    'waitress': [sys.executable, '-m', 'src.serve'],
+}
+
+
+def percentil(ordenados, p):
+    return ordenados[max(0, math.ceil(p / 100 * len(ordenados)) - 1)]
+
+
+def porta_livre():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def preparar_banco(caminho, rastreios):
+    app = criar_app(caminho)
+    with app.app_context():
+        popular_base(rastreios, rastreios // 2)
+        db.session.remove()
+        db.engine.dispose()
+
+
+def aguardar_servidor(porta, processo, limite=120):
+    inicio = time.perf_counter()
+    while time.perf_counter() - inicio < limite:
+        if processo.poll() is not None:
+            raise RuntimeError('o servidor terminou antes de responder')
+        try:
+            conexao = http.client.HTTPConnection('127.0.0.1', porta, timeout=2)
+            conexao.request('GET', '/api/estatisticas')
+            if conexao.getresponse().status == 200:
+                return time.perf_counter() - inicio
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError('o servidor não respondeu a tempo')
+
+
+def carga(porta, clientes, segundos, codigos):
+    """Dispara a carga mista - retorna (latências em ms, erros, duração em s)"""
+    latencias = []
+    erros = [0]
+    lock = threading.Lock()
+    fim = time.perf_counter() + segundos
+
+    def cliente():
+        conexao = None
+        tempos = []
+        falhas = 0
+        for passo in itertools.count():
+            if time.perf_counter() >= fim:
+                break
+            tipo = passo % 10
+            if tipo < 6:
+                with lock:
+                    codigo = next(codigos)
+                metodo, url, corpo = 'POST', '/api/mercadorias/bipar', json.dumps({'codigo_rastreio': codigo})
+            elif tipo < 9:
+                metodo, url, corpo = 'GET', '/api/dashboard', None
+            else:
+                metodo, url, corpo = 'GET', '/api/estatisticas', None
+
+            inicio = time.perf_counter()
+            try:
+                if conexao is None:
+                    conexao = http.client.HTTPConnection('127.0.0.1', porta, timeout=30)
+                conexao.request(metodo, url, body=corpo, headers={'Content-Type': 'application/json'})
+                resposta = conexao.getresponse()
+                resposta.read()
+                if resposta.status != 200:
+                    falhas += 1
+                if resposta.will_close:
+                    conexao.close()
+                    conexao = None
+            except (OSError, http.client.HTTPException):
+                falhas += 1
+                if conexao is not None:
+                    conexao.close()
+                conexao = None
+            tempos.append((time.perf_counter() - inicio) * 1000)
+
+        if conexao is not None:
+            conexao.close()
+        with lock:
+            latencias.extend(tempos)
+            erros[0] += falhas
+
+    threads = [threading.Thread(target=cliente) for _ in range(clientes)]
+    inicio = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sorted(latencias), erros[0], time.perf_counter() - inicio
+
+
+def rodar(modo, banco_modelo, pasta, args):
+    banco = os.path.join(pasta, f'{modo}.db')
+    shutil.copy(banco_modelo, banco)
+    porta = porta_livre()
+    ambiente = dict(
+        os.environ,
+        CONFERENCIA_DB_PATH=banco,
+        CONFERENCIA_SERVIDOR_PORTA=str(porta),
+        CONFERENCIA_SERVIDOR_HOST='127.0.0.1',
+        CONFERENCIA_SERVIDOR_THREADS=str(args.threads),
+        PYTHONUNBUFFERED='1',
+    )
+    processo = subprocess.Popen(
+        MODOS[modo], cwd=RAIZ, env=ambiente, start_new_session=True,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        partida = aguardar_servidor(porta, processo)
+        # Códigos pendentes da base: cada bipagem confere um rastreio diferente
+        codigos = iter(gerar_codigos(args.rastreios - args.rastreios // 2, inicio=args.rastreios // 2))
+        latencias, erros, duracao = carga(porta, args.clientes, args.segundos, codigos)
+    finally:
+        # O servidor de desenvolvimento cria um processo filho (reloader): encerra o grupo inteiro
+        os.killpg(processo.pid, signal.SIGTERM)
+        processo.wait()
+
+    return {
+        'partida_s': partida,
+        'requisicoes': len(latencias),
+        'vazao': len(latencias) / duracao,
+        'p50': percentil(latencias, 50),
+        'p95': percentil(latencias, 95),
+        'p99': percentil(latencias, 99),
+        'erros': erros
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clientes', type=int, default=16)
+    parser.add_argument('--segundos', type=int, default=15)
+    parser.add_argument('--rastreios', type=int, default=100_000)
+    parser.add_argument('--threads', type=int, default=16, help='threads do waitress')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        banco_modelo = os.path.join(pasta, 'modelo.db')
+        preparar_banco(banco_modelo, args.rastreios)
+        resultados = {modo: rodar(modo, banco_modelo, pasta, args) for modo in MODOS}
+
+    print(f"{args.rastreios:,} rastreios, {args.clientes} clientes simultâneos por {args.segundos} s "
+          f"(waitress com {args.threads} threads)")
+    print(f"{'servidor':<16} {'partida (s)':>11} {'requisições':>12} {'req/s':>8} "
+          f"{'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9} {'erros':>6}")
+    for modo, r in resultados.items():
+        print(f"{modo:<16} {r['partida_s']:>11.2f} {r['requisicoes']:>12,} {r['vazao']:>8,.0f} "
+              f"{r['p50']:>9.1f} {r['p95']:>9.1f} {r['p99']:>9.1f} {r['erros']:>6}")
+    base = resultados['desenvolvimento']['vazao']
+    if base:
+        print(f"\nGanho de vazão do waitress: {resultados['waitress']['vazao'] / base:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
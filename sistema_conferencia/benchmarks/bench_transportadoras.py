@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark da detecção de transportadora pelo código de rastreio
+
+Uso:
+    python benchmarks/bench_transportadoras.py [--codigos 1000000] [--repeticoes 3]
+
+Gera os códigos com benchmarks/gerador.py (cada um com a transportadora que o gerou) e
+mede a vazão (códigos/s) de duas formas de aplicar as mesmas regras:
+
+- regra a regra: uma expressão compilada por regra, testadas em sequência;
+- expressão única: ClassificadorTransportadoras (src/services/transportadoras.py).
+
+Também confere o resultado contra a transportadora do gerador: CORREIOS PA tem o mesmo
+formato S10 dos Correios e as transportadoras sem regra ficam sem detecção.
+"""
+
+import argparse
+import os
+import re
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.gerador import gerar_codigos
+from src.services.transportadoras import REGRAS_PADRAO, ClassificadorTransportadoras
+
+
+def classificador_regra_a_regra(regras):
+    compiladas = [
+        (re.compile(re.escape(regra['prefixo']) + '.*' if 'prefixo' in regra else regra['regex']), regra['transportadora'])
+        for regra in regras
+    ]
+
+    def classificar(codigo):
+        for expressao, transportadora in compiladas:
+            if expressao.fullmatch(codigo):
+                return transportadora
+        return None
+
+    return classificar
+
+
+def vazao(classificar, codigos, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = list(map(classificar, codigos))
+        tempos.append(time.perf_counter() - inicio)
+    segundos = statistics.median(tempos)
+    return len(codigos) / segundos, segundos, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--codigos', type=int, default=1_000_000)
+    parser.add_argument('--repeticoes', type=int, default=3)
+    args = parser.parse_args()
+
+    gerados = list(gerar_codigos(args.codigos))
+    codigos = [codigo for codigo, _ in gerados]
+
+    print(f"{args.codigos:,} códigos, {len(REGRAS_PADRAO)} regras, mediana de {args.repeticoes} execuções")
+    print(f"{'forma':<18} {'códigos/s':>12} {'tempo (ms)':>11}")
+    resultados = {}
+    for rotulo, classificar in [
+        ('regra a regra', classificador_regra_a_regra(REGRAS_PADRAO)),
+        ('expressão única', ClassificadorTransportadoras(REGRAS_PADRAO).classificar),
+    ]:
+        por_segundo, segundos, resultados[rotulo] = vazao(classificar, codigos, args.repeticoes)
+        print(f"{rotulo:<18} {por_segundo:>12,.0f} {segundos * 1000:>11,.0f}")
+
+    assert resultados['regra a regra'] == resultados['expressão única'], 'as duas formas devem classificar igual'
+
+    print()
+    print(f"{'transportadora (gerador)':<26} {'códigos':>10} {'detectada':>16} {'sem detecção':>13}")
+    por_transportadora = {}
+    for (_, esperada), detectada in zip(gerados, resultados['expressão única']):
+        contagem = por_transportadora.setdefault(esperada, {})
+        contagem[detectada] = contagem.get(detectada, 0) + 1
+    for esperada, contagem in sorted(por_transportadora.items(), key=lambda item: -sum(item[1].values())):
+        detectadas = ', '.join(f"{nome} {quantidade:,}" for nome, quantidade in contagem.items() if nome is not None)
+        print(f"{esperada:<26} {sum(contagem.values()):>10,} {detectadas or '-':>16} {contagem.get(None, 0):>13,}")
+
+
+if __name__ == '__main__':
+    main()
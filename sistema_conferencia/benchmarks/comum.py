@@ -0,0 +1,94 @@
+"""
+Funções compartilhadas pelos benchmarks: app Flask com banco temporário e carga de dados sintéticos
+"""
+
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from src.models.rastreio import db, RastreioEsperado, MercadoriaConferida
+from src.database.engine import configurar_sqlite
+from src.services.metricas import configurar_metricas
+from src.services.respostas import configurar_respostas
+
+
+def criar_app(caminho_db, registrar_rotas=True, ajustar_sqlite=True):
+    """
+    Cria um app Flask apontando para um banco SQLite temporário, com as mesmas métricas,
+    provedor JSON e gzip do create_app (src/main.py) - as rotas medidas são as que rodam
+    em produção. Não migra o banco nem inicia índice, journal ou fechamento diário.
+    """
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{caminho_db}"
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+
+    if ajustar_sqlite:
+        configurar_sqlite(app)
+
+    if registrar_rotas:
+        from src.routes.conferencia import conferencia_bp
+        app.register_blueprint(conferencia_bp, url_prefix='/api')
+
+    # Mesma ordem do create_app: a latência medida pelas métricas inclui a compressão
+    configurar_metricas(app)
+    configurar_respostas(app)
+
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def gerar_codigos(quantidade, inicio=0, prefixo='AA'):
+    """Códigos no formato S10 dos Correios: 2 letras + 9 dígitos + BR"""
+    return [f"{prefixo}{numero:09d}BR" for numero in range(inicio, inicio + quantidade)]
+
+
+def popular_base(quantidade_esperados, quantidade_bipadas, fora_da_base=0, lote=50_000):
+    """
+    Insere rastreios esperados e mercadorias bipadas diretamente (sem passar pelas rotas).
+
+    As primeiras `quantidade_bipadas` mercadorias estão na base com status alternando entre
+    conferido, coleta e insucesso; as demais bipadas (`fora_da_base`) não existem na base.
+    """
+    agora = datetime.now()
+    hoje = agora.date()
+    status_bipadas = ['conferido', 'coleta', 'insucesso']
+
+    for inicio in range(0, quantidade_esperados, lote):
+        fim = min(inicio + lote, quantidade_esperados)
+        db.session.execute(RastreioEsperado.__table__.insert(), [
+            {
+                'codigo_rastreio': codigo,
+                'status': status_bipadas[i % 3] if i < quantidade_bipadas else 'pendente',
+                'timestamp': agora
+            }
+            for i, codigo in enumerate(gerar_codigos(fim - inicio, inicio), start=inicio)
+        ])
+
+    codigos_bipados = gerar_codigos(quantidade_bipadas) + gerar_codigos(fora_da_base, prefixo='ZZ')
+    for inicio in range(0, len(codigos_bipados), lote):
+        db.session.execute(MercadoriaConferida.__table__.insert(), [
+            {
+                'codigo_rastreio': codigo,
+                'timestamp': agora - timedelta(seconds=len(codigos_bipados) - i),
+                'data_bipagem': hoje
+            }
+            for i, codigo in enumerate(codigos_bipados[inicio:inicio + lote], start=inicio)
+        ])
+
+    db.session.commit()
+
+
+def medir(funcao, repeticoes=5):
+    """Executa `funcao` algumas vezes e retorna o menor tempo em milissegundos"""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return min(tempos)
@@ -0,0 +1,157 @@
+"""
+Gerador determinístico de dados sintéticos: códigos de rastreio, manifestos e históricos de bipagem
+
+A mesma semente (e a mesma data de referência) gera sempre os mesmos códigos, status,
+transportadoras e horários, então relatórios de commits diferentes medem a mesma carga.
+Os códigos seguem os formatos das transportadoras do dashboard (aproximados): S10 dos
+Correios com dígito verificador, numéricos da Jadlog, prefixados da J&T e da Logan.
+"""
+
+import os
+import random
+import sys
+from datetime import datetime, time, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.models.rastreio import db, RastreioEsperado, MercadoriaConferida
+
+SEMENTE_PADRAO = 20250101
+
+# Participação de cada transportadora no manifesto
+PESOS_TRANSPORTADORAS = {
+    'CORREIOS': 35, 'J&T': 20, 'JADLOG': 15, 'CORREIOS PA': 8, 'LOGAN': 6,
+    'DIALOGO': 5, 'FAVELA LOG': 4, 'SAC SERVICE': 4, 'DISSUDES': 3
+}
+
+# Prefixos de serviço S10 usados nos códigos dos Correios
+PREFIXOS_S10 = ['AA', 'AB', 'OY', 'QB', 'NL', 'LB', 'PN', 'OV']
+
+# Status dos rastreios já bipados
+PESOS_STATUS = {'conferido': 70, 'coleta': 20, 'insucesso': 10}
+
+PESOS_S10 = [8, 6, 4, 2, 3, 5, 9, 7]
+
+# Espaço de números dos códigos; o multiplicador é primo com ele, então (i * MULTIPLICADOR) % ESPACO
+# é uma permutação: códigos únicos que não saem em ordem crescente
+ESPACO_NUMEROS = 100_000_000
+MULTIPLICADOR = 7_919_221
+
+# Índice a partir do qual são gerados os códigos fora da base (nunca se misturam ao manifesto)
+INICIO_FORA_DA_BASE = 90_000_000
+
+
+def digito_s10(numero):
+    """Dígito verificador do padrão S10 (UPU) para os 8 dígitos do número"""
+    soma = sum(int(digito) * peso for digito, peso in zip(f"{numero:08d}", PESOS_S10))
+    resto = 11 - soma % 11
+    return 0 if resto == 10 else 5 if resto == 11 else resto
+
+
+def formatar_codigo(numero, transportadora, rng):
+    if transportadora == 'J&T':
+        return f"JT{numero:08d}{rng.randrange(100_000):05d}"
+    if transportadora == 'JADLOG':
+        return f"10{numero:08d}{rng.randrange(10_000):04d}"
+    if transportadora == 'LOGAN':
+        return f"LGN{numero:08d}{rng.randrange(100):02d}"
+    origem = 'BR' if transportadora in ('CORREIOS', 'CORREIOS PA') else rng.choice(['BR', 'CN', 'US'])
+    return f"{rng.choice(PREFIXOS_S10)}{numero:08d}{digito_s10(numero)}{origem}"
+
+
+def gerar_codigos(quantidade, inicio=0, semente=SEMENTE_PADRAO):
+    """Gera (codigo, transportadora) para os índices [inicio, inicio + quantidade) do manifesto"""
+    nomes = list(PESOS_TRANSPORTADORAS)
+    pesos = list(PESOS_TRANSPORTADORAS.values())
+    for indice in range(inicio, inicio + quantidade):
+        # Um gerador por índice: o código de cada posição não depende de quantos foram gerados antes
+        rng = random.Random(semente * ESPACO_NUMEROS + indice)
+        numero = (indice * MULTIPLICADOR) % ESPACO_NUMEROS
+        transportadora = rng.choices(nomes, pesos)[0]
+        yield formatar_codigo(numero, transportadora, rng), transportadora
+
+
+def gerar_cenario(quantidade, semente=SEMENTE_PADRAO, fracao_bipada=0.5, fracao_fora=0.02,
+                  dias=7, hoje=None, sem_transportadora=0.1, bloco=50_000):
+    """
+    Gera o manifesto de `quantidade` rastreios e o histórico de bipagens em blocos
+    (esperados, bipagens), prontos para INSERT.
+
+    Cada rastreio é bipado com probabilidade `fracao_bipada` (e recebe conferido/coleta/
+    insucesso); os demais ficam pendentes. Para cada bipagem na base há `fracao_fora`
+    de chance de uma bipagem fora da base. As bipagens se espalham pelos últimos `dias`
+    dias (8h às 18h) em ordem crescente de horário, e `sem_transportadora` delas
+    ficam sem transportadora definida.
+    """
+    hoje = hoje or datetime.now().date()
+    rng = random.Random(semente)
+    status_nomes = list(PESOS_STATUS)
+    status_pesos = list(PESOS_STATUS.values())
+    inicio_periodo = datetime.combine(hoje - timedelta(days=dias - 1), time(8))
+    segundos_por_rastreio = dias * 24 * 3600 / max(quantidade, 1)
+    fora = gerar_codigos(quantidade, inicio=INICIO_FORA_DA_BASE, semente=semente)
+
+    def momento(indice):
+        # Horário proporcional à posição no manifesto, comprimido no expediente de cada dia
+        decorrido = timedelta(seconds=indice * segundos_por_rastreio)
+        dia = inicio_periodo + timedelta(days=decorrido.days)
+        return dia + timedelta(seconds=decorrido.seconds * 10 / 24)
+
+    for inicio in range(0, quantidade, bloco):
+        esperados = []
+        bipagens = []
+        codigos = gerar_codigos(min(bloco, quantidade - inicio), inicio=inicio, semente=semente)
+        for indice, (codigo, transportadora) in enumerate(codigos, start=inicio):
+            status = 'pendente'
+            if rng.random() < fracao_bipada:
+                status = rng.choices(status_nomes, status_pesos)[0]
+                timestamp = momento(indice)
+                bipagens.append({
+                    'codigo_rastreio': codigo,
+                    'timestamp': timestamp,
+                    'data_bipagem': timestamp.date(),
+                    'transportadora': None if rng.random() < sem_transportadora else transportadora
+                })
+                if rng.random() < fracao_fora:
+                    codigo_fora, transportadora_fora = next(fora)
+                    bipagens.append({
+                        'codigo_rastreio': codigo_fora,
+                        'timestamp': timestamp,
+                        'data_bipagem': timestamp.date(),
+                        'transportadora': transportadora_fora
+                    })
+            esperados.append({'codigo_rastreio': codigo, 'status': status, 'timestamp': inicio_periodo})
+        yield esperados, bipagens
+
+
+def carregar_cenario(quantidade, amostras=2000, **opcoes):
+    """
+    Grava o cenário de gerar_cenario no banco do app atual (requer contexto do app).
+
+    Retorna um resumo com as contagens e até `amostras` códigos de cada tipo
+    (pendentes, bipados, fora da base) para os benchmarks usarem nas requisições.
+    """
+    resumo = {
+        'esperados': 0, 'bipagens': 0, 'por_status': {},
+        'pendentes': [], 'bipados': [], 'fora_da_base': []
+    }
+    for esperados, bipagens in gerar_cenario(quantidade, **opcoes):
+        db.session.execute(RastreioEsperado.__table__.insert(), esperados)
+        if bipagens:
+            db.session.execute(MercadoriaConferida.__table__.insert(), bipagens)
+
+        resumo['esperados'] += len(esperados)
+        resumo['bipagens'] += len(bipagens)
+        status_por_codigo = {}
+        for linha in esperados:
+            status_por_codigo[linha['codigo_rastreio']] = linha['status']
+            resumo['por_status'][linha['status']] = resumo['por_status'].get(linha['status'], 0) + 1
+            if linha['status'] == 'pendente' and len(resumo['pendentes']) < amostras:
+                resumo['pendentes'].append(linha['codigo_rastreio'])
+        for linha in bipagens:
+            lista = 'bipados' if linha['codigo_rastreio'] in status_por_codigo else 'fora_da_base'
+            if len(resumo[lista]) < amostras:
+                resumo[lista].append(linha['codigo_rastreio'])
+
+    db.session.commit()
+    return resumo
@@ -34,7 +34,7 @@ if %errorlevel% neq 0 (
     exit /b 1
 )
 
-echo [3/3] Iniciando servidor Flask...
+echo [3/3] Iniciando servidor (waitress)...
 echo.
 echo ========================================
 echo   SERVIDOR INICIADO COM SUCESSO!
@@ -67,7 +67,7 @@ echo.
 echo Aguardando conexoes...
 echo.
 
-python src\main.py
+python -m src.serve
 
 echo.
 echo ========================================
@@ -0,0 +1,90 @@
+"""
+Configurações do sistema lidas de variáveis de ambiente (com padrões para produção)
+"""
+
+import os
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def env_str(nome, padrao):
+    valor = os.environ.get(nome)
+    return valor.strip() if valor and valor.strip() else padrao
+
+
+def env_int(nome, padrao):
+    valor = os.environ.get(nome)
+    if valor is None or not valor.strip():
+        return padrao
+    try:
+        return int(valor)
+    except ValueError:
+        print(f"Aviso: valor inválido para {nome} ({valor!r}), usando {padrao}")
+        return padrao
+
+
+def env_bool(nome, padrao):
+    valor = os.environ.get(nome)
+    if valor is None or not valor.strip():
+        return padrao
+    return valor.strip().lower() in ['1', 'true', 'sim', 'on', 'yes']
+
+
+# Banco de dados
+DATABASE_PATH = env_str('CONFERENCIA_DB_PATH', os.path.join(BASE_DIR, 'database', 'app.db'))
+
+# Ajustes do SQLite aplicados a cada conexão do pool
+# WAL permite leituras simultâneas a uma escrita; NORMAL só faz fsync nos checkpoints do WAL
+SQLITE_JOURNAL_MODE = env_str('CONFERENCIA_SQLITE_JOURNAL_MODE', 'WAL').upper()
+SQLITE_SYNCHRONOUS = env_str('CONFERENCIA_SQLITE_SYNCHRONOUS', 'NORMAL').upper()
+# Tempo que uma conexão espera pelo lock de escrita antes de falhar com "database is locked"
+SQLITE_BUSY_TIMEOUT_MS = env_int('CONFERENCIA_SQLITE_BUSY_TIMEOUT_MS', 15000)
+# Leitura do arquivo via mmap (bytes); 0 desativa
+SQLITE_MMAP_SIZE = env_int('CONFERENCIA_SQLITE_MMAP_SIZE', 256 * 1024 * 1024)
+# Cache de páginas por conexão: negativo = KiB (padrão 64 MB), positivo = número de páginas
+SQLITE_CACHE_SIZE = env_int('CONFERENCIA_SQLITE_CACHE_SIZE', -64 * 1024)
+# Tabelas temporárias (ORDER BY / GROUP BY grandes) em memória
+SQLITE_TEMP_STORE = env_str('CONFERENCIA_SQLITE_TEMP_STORE', 'MEMORY').upper()
+
+# Índice em memória dos rastreios para a bipagem (desativar com vários processos de servidor)
+INDICE_MEMORIA = env_bool('CONFERENCIA_INDICE_MEMORIA', True)
+# Carga do índice na inicialização em segundo plano: o servidor responde logo e a bipagem
+# consulta o banco até a carga terminar (com o journal de bipagens a carga é sempre antes)
+INDICE_SEGUNDO_PLANO = env_bool('CONFERENCIA_INDICE_SEGUNDO_PLANO', True)
+
+# Regras de detecção da transportadora pelo código (arquivo JSON); vazio = regras padrão
+TRANSPORTADORAS_REGRAS = env_str('CONFERENCIA_TRANSPORTADORAS_REGRAS', '')
+
+# Métricas por endpoint em /api/metrics e cabeçalhos Server-Timing / X-Query-Count
+METRICAS = env_bool('CONFERENCIA_METRICAS', True)
+
+# Respostas da API: codificador JSON ('orjson' se instalado, senão 'stdlib') e gzip das
+# respostas a partir de GZIP_MINIMO_BYTES (0 desativa) quando o cliente aceita
+JSON_CODIFICADOR = env_str('CONFERENCIA_JSON_CODIFICADOR', 'orjson').lower()
+GZIP_MINIMO_BYTES = env_int('CONFERENCIA_GZIP_MINIMO_BYTES', 2048)
+GZIP_NIVEL = env_int('CONFERENCIA_GZIP_NIVEL', 1)  # nível 1: quase a taxa do 9 com uma fração da CPU
+
+# Journal de bipagens (write-behind): confirma a bipagem após o fsync do journal e grava no banco em lotes
+JOURNAL_BIPAGEM = env_bool('CONFERENCIA_JOURNAL_BIPAGEM', False)
+JOURNAL_CAMINHO = env_str('CONFERENCIA_JOURNAL_CAMINHO', os.path.join(os.path.dirname(DATABASE_PATH), 'bipagens.journal'))
+# Intervalo que junta as bipagens no mesmo fsync; intervalo de gravação dos lotes no banco
+JOURNAL_FSYNC_MS = env_int('CONFERENCIA_JOURNAL_FSYNC_MS', 2)
+JOURNAL_INTERVALO_GRAVACAO_MS = env_int('CONFERENCIA_JOURNAL_INTERVALO_GRAVACAO_MS', 200)
+
+# Fechamento diário: congela os contadores de cada dia em dashboard_resumo_diario logo depois da meia-noite
+FECHAMENTO_DIARIO = env_bool('CONFERENCIA_FECHAMENTO_DIARIO', True)
+
+# Arquivamento: bipagens com mais de CONFERENCIA_RETENCAO_DIAS dias (contando hoje) saem de
+# mercadorias_conferidas para um arquivo SQLite por mês; 0 desativa
+RETENCAO_DIAS = env_int('CONFERENCIA_RETENCAO_DIAS', 0)
+ARQUIVO_PASTA = env_str('CONFERENCIA_ARQUIVO_PASTA', os.path.join(os.path.dirname(DATABASE_PATH), 'arquivo'))
+
+# Servidor de produção (python -m src.serve, waitress): endereço, threads de atendimento,
+# threads que /api/eventos não pode ocupar (ficam para as bipagens), conexões simultâneas
+# e tempo máximo de conexão ociosa (keep-alive) ou de cliente parado
+SERVIDOR_HOST = env_str('CONFERENCIA_SERVIDOR_HOST', '0.0.0.0')
+SERVIDOR_PORTA = env_int('CONFERENCIA_SERVIDOR_PORTA', 5000)
+SERVIDOR_THREADS = env_int('CONFERENCIA_SERVIDOR_THREADS', 16)
+SERVIDOR_THREADS_RESERVADAS = env_int('CONFERENCIA_SERVIDOR_THREADS_RESERVADAS', 6)
+SERVIDOR_CONEXOES = env_int('CONFERENCIA_SERVIDOR_CONEXOES', 200)
+SERVIDOR_TIMEOUT_S = env_int('CONFERENCIA_SERVIDOR_TIMEOUT_S', 120)
@@ -0,0 +1,48 @@
+"""
+Ajustes de conexão do SQLite (PRAGMAs) aplicados a cada conexão criada pelo pool
+"""
+
+from sqlalchemy import event
+from src import config
+from src.models.rastreio import db
+
+JOURNAL_MODES = ['DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF']
+SYNCHRONOUS_MODES = ['OFF', 'NORMAL', 'FULL', 'EXTRA']
+TEMP_STORE_MODES = ['DEFAULT', 'FILE', 'MEMORY']
+
+
+def pragmas_sqlite():
+    """Monta a lista de PRAGMAs a partir da configuração, validando os valores textuais"""
+    for nome, valor, validos in [
+        ('CONFERENCIA_SQLITE_JOURNAL_MODE', config.SQLITE_JOURNAL_MODE, JOURNAL_MODES),
+        ('CONFERENCIA_SQLITE_SYNCHRONOUS', config.SQLITE_SYNCHRONOUS, SYNCHRONOUS_MODES),
+        ('CONFERENCIA_SQLITE_TEMP_STORE', config.SQLITE_TEMP_STORE, TEMP_STORE_MODES),
+    ]:
+        if valor not in validos:
+            raise ValueError(f"{nome} inválido: {valor} (use {', '.join(validos)})")
+
+    return [
+        ('journal_mode', config.SQLITE_JOURNAL_MODE),
+        ('synchronous', config.SQLITE_SYNCHRONOUS),
+        ('busy_timeout', int(config.SQLITE_BUSY_TIMEOUT_MS)),
+        ('mmap_size', int(config.SQLITE_MMAP_SIZE)),
+        ('cache_size', int(config.SQLITE_CACHE_SIZE)),
+        ('temp_store', config.SQLITE_TEMP_STORE),
+    ]
+
+
+def configurar_sqlite(app):
+    """Registra o listener que aplica os PRAGMAs em toda nova conexão do engine do app"""
+    pragmas = pragmas_sqlite()
+
+    def aplicar_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for nome, valor in pragmas:
+                cursor.execute(f"PRAGMA {nome} = {valor}")
+        finally:
+            cursor.close()
+
+    with app.app_context():
+        if db.engine.dialect.name == 'sqlite':
+            event.listen(db.engine, 'connect', aplicar_pragmas)
@@ -5,19 +5,43 @@ Script de migração para adicionar novos campos ao banco de dados
 
 import sqlite3
 import os
+import json
 from datetime import datetime
-from src.models.rastreio import db
-from src.main import app
+from src.config import DATABASE_PATH
+
+# Versão do schema gravada no banco (PRAGMA user_version) depois da migração e do create_all.
+# Incrementar a cada mudança de modelo, índice ou migração: um banco já na versão atual
+# pula toda a introspecção na inicialização.
+SCHEMA_VERSAO = 5
+
+def versao_schema():
+    """Versão do schema gravada no banco (0 = banco novo ou anterior ao controle de versão)"""
+    if not os.path.exists(DATABASE_PATH):
+        return 0
+    conn = sqlite3.connect(DATABASE_PATH)
+    try:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        conn.close()
+
+def gravar_versao_schema():
+    """Marca o banco com a versão atual do schema (chamar depois da migração e do create_all)"""
+    conn = sqlite3.connect(DATABASE_PATH)
+    try:
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSAO}")
+        conn.commit()
+    finally:
+        conn.close()
 
 def migrate_database():
-    """Executa a migração do banco de dados"""
+    """Executa a migração do banco de dados - retorna False se ela falhou"""
     
     # Caminho para o banco de dados
-    db_path = os.path.join(os.path.dirname(__file__), 'app.db')
+    db_path = DATABASE_PATH
     
     if not os.path.exists(db_path):
         print("Banco de dados não encontrado. Criando novo banco...")
-        return
+        return True
     
     try:
         # Conectar ao banco
@@ -40,6 +64,12 @@ def migrate_database():
             cursor.execute("UPDATE rastreios_esperados SET timestamp = ? WHERE timestamp IS NULL", (agora,))
             print(f"Preenchendo timestamp para registros existentes com: {agora}")
         
+        # Índice composto da listagem paginada de faltantes (status + ordem/prefixo do código); como
+        # começa pelo status também atende a agregação das estatísticas, então o índice só do status
+        # criado por versões anteriores é redundante e só encarece a escrita
+        cursor.execute("DROP INDEX IF EXISTS ix_rastreios_esperados_status")
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_rastreios_esperados_status_codigo ON rastreios_esperados (status, codigo_rastreio)")
+        
         # Verificar colunas existentes na tabela mercadorias_conferidas
         cursor.execute("PRAGMA table_info(mercadorias_conferidas)")
         columns = [column[1] for column in cursor.fetchall()]
@@ -59,6 +89,10 @@ def migrate_database():
             cursor.execute("UPDATE mercadorias_conferidas SET data_bipagem = ? WHERE data_bipagem IS NULL", (hoje,))
             print(f"Preenchendo data_bipagem para registros existentes com: {hoje}")
         
+        # Índices do caminho de bipagem (busca por código) e do recálculo do dashboard (busca por data)
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_mercadorias_conferidas_codigo_rastreio ON mercadorias_conferidas (codigo_rastreio)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_mercadorias_conferidas_data_bipagem ON mercadorias_conferidas (data_bipagem)")
+        
         # Verificar se a tabela dashboard_cache existe
         cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='dashboard_cache'")
         if not cursor.fetchone():
@@ -77,6 +111,41 @@ def migrate_database():
             """)
             print("Tabela dashboard_cache criada com sucesso!")
         
+        # Verificar se a tabela dashboard_rastreios_contados existe
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='dashboard_rastreios_contados'")
+        if not cursor.fetchone():
+            print("Criando tabela 'dashboard_rastreios_contados'...")
+            cursor.execute("""
+                CREATE TABLE dashboard_rastreios_contados (
+                    id INTEGER NOT NULL PRIMARY KEY,
+                    data DATE NOT NULL,
+                    codigo_rastreio VARCHAR(100) NOT NULL,
+                    CONSTRAINT uq_rastreio_contado_data_codigo UNIQUE (data, codigo_rastreio)
+                )
+            """)
+            print("Tabela dashboard_rastreios_contados criada com sucesso!")
+        
+        # Mover as listas JSON de dashboard_cache.rastreios_contados para a tabela indexada
+        cursor.execute("PRAGMA table_info(dashboard_cache)")
+        dashboard_columns = [column[1] for column in cursor.fetchall()]
+        if 'rastreios_contados' in dashboard_columns:
+            cursor.execute("SELECT data, rastreios_contados FROM dashboard_cache WHERE rastreios_contados IS NOT NULL AND rastreios_contados NOT IN ('', '[]')")
+            total_migrados = 0
+            for data_cache, rastreios_json in cursor.fetchall():
+                try:
+                    codigos = json.loads(rastreios_json)
+                except ValueError:
+                    print(f"Lista de rastreios contados inválida em {data_cache}, ignorando...")
+                    continue
+                cursor.executemany(
+                    "INSERT OR IGNORE INTO dashboard_rastreios_contados (data, codigo_rastreio) VALUES (?, ?)",
+                    [(data_cache, codigo) for codigo in codigos if codigo]
+                )
+                total_migrados += len(codigos)
+            if total_migrados:
+                cursor.execute("UPDATE dashboard_cache SET rastreios_contados = '[]'")
+                print(f"{total_migrados} rastreios contados migrados para dashboard_rastreios_contados")
+        
         # Commit das alterações
         conn.commit()
         print("Migração concluída com sucesso!")
@@ -93,29 +162,33 @@ def migrate_database():
         final_columns = cursor.fetchall()
         for column in final_columns:
             print(f"  - {column[1]} ({column[2]})")
+        return True
         
     except Exception as e:
         print(f"Erro durante a migração: {e}")
         conn.rollback()
+        return False
     finally:
         conn.close()
 
 def migrate_dashboard_cache():
     """Adiciona o campo rastreios_contados à tabela dashboard_cache"""
-    with app.app_context():
-        try:
-            # Adicionar coluna rastreios_contados se não existir
-            with db.engine.connect() as conn:
-                conn.execute(db.text("""
-                    ALTER TABLE dashboard_cache 
-                    ADD COLUMN rastreios_contados TEXT DEFAULT '[]'
-                """))
-                conn.commit()
-            print("Campo rastreios_contados adicionado com sucesso!")
-        except Exception as e:
-            print(f"Erro na migração: {e}")
-            # Se a coluna já existe, ignorar o erro
-            pass
+    # sqlite3 direto, como migrate_database: importar o app aqui criaria um import circular com src.main
+    conn = sqlite3.connect(DATABASE_PATH)
+    try:
+        # Adicionar coluna rastreios_contados se não existir
+        conn.execute("""
+            ALTER TABLE dashboard_cache 
+            ADD COLUMN rastreios_contados TEXT DEFAULT '[]'
+        """)
+        conn.commit()
+        print("Campo rastreios_contados adicionado com sucesso!")
+    except Exception as e:
+        print(f"Erro na migração: {e}")
+        # Se a coluna já existe, ignorar o erro
+        pass
+    finally:
+        conn.close()
 
 if __name__ == "__main__":
     migrate_database()
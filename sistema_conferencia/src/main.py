@@ -1,59 +1,145 @@
+import atexit
+import importlib
 import os
 import sys
+import time
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory
+from flask import Flask
 from flask_cors import CORS
 from src.models.rastreio import db, RastreioEsperado, MercadoriaConferida, DashboardCache
-from src.routes.conferencia import conferencia_bp
-from src.routes.user import user_bp
+from src.config import DATABASE_PATH
+from src.database.engine import configurar_sqlite
+from src.database.migrate import SCHEMA_VERSAO, versao_schema, gravar_versao_schema
+from src.services.metricas import configurar_metricas
+from src.services.estaticos import ArquivosEstaticos
+from src.services.respostas import configurar_respostas
+from src.services.indice import indice_rastreios, indice_ativo
+from src.services.journal import journal_bipagens
+from src.services.resumo import fechamento_diario
+from src import config
 
-app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
-app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
-
-# Configurar CORS para permitir acesso do frontend
-CORS(app)
-
-app.register_blueprint(conferencia_bp, url_prefix='/api')
-
-# uncomment if you need to use database
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db.init_app(app)
+# Blueprints registrados pelo create_app: (módulo, atributo, prefixo)
+BLUEPRINTS = [
+    ('src.routes.conferencia', 'conferencia_bp', '/api'),
+]
 
 # Executar migração do banco de dados
 def run_migration():
-    """Executa migração automática do banco de dados"""
+    """Executa migração automática do banco de dados - retorna False se ela falhou"""
     try:
         from src.database.migrate import migrate_database
-        migrate_database()
+        return migrate_database()
     except Exception as e:
         print(f"Aviso: Não foi possível executar a migração automática: {e}")
+        return False
+
+def registrar_blueprints(app):
+    for modulo, atributo, prefixo in BLUEPRINTS:
+        app.register_blueprint(getattr(importlib.import_module(modulo), atributo), url_prefix=prefixo)
+
+def preparar_banco(app):
+    """Migra o banco e cria as tabelas que faltam - nada a fazer se ele já está na versão atual do schema"""
+    versao = versao_schema()
+    if versao == SCHEMA_VERSAO:
+        return
+
+    with app.app_context():
+        # Executar migração antes de criar as tabelas
+        migrado = run_migration()
+
+        # Criar todas as tabelas
+        db.create_all()
+
+    # Migração com erro: a versão não é gravada e a próxima inicialização tenta de novo
+    if not migrado:
+        return
+    gravar_versao_schema()
+    print(f"Schema do banco atualizado da versão {versao} para a {SCHEMA_VERSAO}")
+
+def carregar_indice(app):
+    """Carrega o índice em memória dos rastreios (ver src/services/indice.py)"""
+    if not config.INDICE_MEMORIA:
+        return
+
+    # O journal de bipagens decide a bipagem só pelo índice: com ele a carga termina antes de atender
+    if config.INDICE_SEGUNDO_PLANO and not config.JOURNAL_BIPAGEM:
+        indice_rastreios.carregar_em_segundo_plano(app)
+        return
+
+    with app.app_context():
+        if indice_ativo():
+            memoria = indice_rastreios.memoria()
+            print(f"Índice de rastreios carregado: {memoria['rastreios']} rastreios, "
+                  f"{memoria['codigos_bipados']} códigos bipados, {memoria['mb_total']} MB "
+                  f"em {indice_rastreios.duracao_carga_ms} ms")
+
+def iniciar_servicos(app):
+    """Threads em segundo plano do processo: journal de bipagens e fechamento diário"""
+    # Journal de bipagens (write-behind): regrava o que ficou pendente e inicia as threads
+    if config.JOURNAL_BIPAGEM:
+        journal_bipagens.iniciar(app)
+        atexit.register(journal_bipagens.parar)
 
-with app.app_context():
-    # Executar migração antes de criar as tabelas
-    run_migration()
-    
-    # Criar todas as tabelas
-    db.create_all()
-
-@app.route('/', defaults={'path': ''})
-@app.route('/<path:path>')
-def serve(path):
-    static_folder_path = app.static_folder
-    if static_folder_path is None:
-            return "Static folder not configured", 404
-
-    if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
-        return send_from_directory(static_folder_path, path)
-    else:
-        index_path = os.path.join(static_folder_path, 'index.html')
-        if os.path.exists(index_path):
-            return send_from_directory(static_folder_path, 'index.html')
-        else:
+    # Fechamento diário: congela os dias anteriores no resumo (e arquiva as bipagens fora da retenção)
+    # agora e logo depois de cada meia-noite
+    if config.FECHAMENTO_DIARIO:
+        fechamento_diario.iniciar(app)
+        atexit.register(fechamento_diario.parar)
+
+def create_app():
+    """
+    Cria e prepara o app (rotas, banco migrado, índice e serviços em segundo plano).
+    Chamado uma vez por processo: importar este módulo não cria nada.
+    """
+    inicio = time.perf_counter()
+    app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
+    app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
+
+    # Configurar CORS para permitir acesso do frontend
+    CORS(app)
+
+    registrar_blueprints(app)
+
+    # uncomment if you need to use database
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{DATABASE_PATH}"
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+
+    # Aplicar WAL, busy_timeout, mmap, cache etc. em cada conexão (ver src/config.py)
+    configurar_sqlite(app)
+
+    # Latência, instruções SQL e tempo de banco por endpoint (/api/metrics, Server-Timing, X-Query-Count)
+    configurar_metricas(app)
+
+    # JSON com o codificador configurado (orjson se instalado) e gzip nas respostas grandes;
+    # registrado depois das métricas para que a latência medida inclua a compressão
+    configurar_respostas(app)
+
+    preparar_banco(app)
+    carregar_indice(app)
+    iniciar_servicos(app)
+
+    # Interface (index.html, script.js, styles.css) lida uma vez e servida da memória com gzip e ETag
+    estaticos = ArquivosEstaticos(app.static_folder) if app.static_folder and os.path.isdir(app.static_folder) else None
+
+    @app.route('/', defaults={'path': ''})
+    @app.route('/<path:path>')
+    def serve(path):
+        if estaticos is None:
+                return "Static folder not configured", 404
+
+        resposta = estaticos.responder(path)
+        if resposta is None:
             return "index.html not found", 404
+        return resposta
+
+    print(f"App pronto em {(time.perf_counter() - inicio) * 1000:.0f} ms")
+    return app
 
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    # Servidor de desenvolvimento (debugger e reloader); em produção use: python -m src.serve
+    app = create_app()
+    app.run(host=config.SERVIDOR_HOST, port=config.SERVIDOR_PORTA, debug=True)
@@ -8,9 +8,15 @@ class RastreioEsperado(db.Model):
     
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     codigo_rastreio = db.Column(db.String(100), nullable=False, unique=True)
-    status = db.Column(db.String(50), default='pendente')
+    status = db.Column(db.String(50), default='pendente')  # Indexado pelo índice composto abaixo
     timestamp = db.Column(db.DateTime, default=datetime.now)
     
+    __table_args__ = (
+        # Listagem paginada de faltantes (status = 'pendente' em ordem de código, com busca por prefixo)
+        # e GROUP BY das estatísticas - o prefixo status dispensa um índice só do status
+        db.Index('ix_rastreios_esperados_status_codigo', 'status', 'codigo_rastreio'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -23,10 +29,10 @@ class MercadoriaConferida(db.Model):
     __tablename__ = 'mercadorias_conferidas'
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    codigo_rastreio = db.Column(db.String(100), nullable=False)
+    codigo_rastreio = db.Column(db.String(100), nullable=False, index=True)  # Consultado a cada bipagem
     timestamp = db.Column(db.DateTime, default=datetime.now)
     transportadora = db.Column(db.String(50), nullable=True)
-    data_bipagem = db.Column(db.Date, default=lambda: datetime.now().date())
+    data_bipagem = db.Column(db.Date, default=lambda: datetime.now().date(), index=True)  # Recálculo do dashboard do dia
     
     def to_dict(self):
         return {
@@ -47,7 +53,6 @@ class DashboardCache(db.Model):
     coleta_hoje = db.Column(db.Integer, default=0)
     insucesso_hoje = db.Column(db.Integer, default=0)
     sem_status_hoje = db.Column(db.Integer, default=0)
-    rastreios_contados = db.Column(db.Text, default='[]')  # Lista de rastreios já contados no dashboard (JSON como texto)
     ultima_atualizacao = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
     
     def to_dict(self):
@@ -59,7 +64,77 @@ class DashboardCache(db.Model):
             'coleta_hoje': self.coleta_hoje,
             'insucesso_hoje': self.insucesso_hoje,
             'sem_status_hoje': self.sem_status_hoje,
-            'rastreios_contados': self.rastreios_contados or '[]',
             'ultima_atualizacao': self.ultima_atualizacao.isoformat()
         }
 
+
+class RastreioContado(db.Model):
+    __tablename__ = 'dashboard_rastreios_contados'
+    __table_args__ = (
+        # Um rastreio só é contado uma vez por dia no dashboard
+        db.UniqueConstraint('data', 'codigo_rastreio', name='uq_rastreio_contado_data_codigo'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    data = db.Column(db.Date, nullable=False)
+    codigo_rastreio = db.Column(db.String(100), nullable=False)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'data': self.data.isoformat(),
+            'codigo_rastreio': self.codigo_rastreio
+        }
+
+
+class JournalAplicado(db.Model):
+    __tablename__ = 'journal_bipagens_aplicado'
+
+    # Linha única: última sequência do journal de bipagens já gravada no banco
+    id = db.Column(db.Integer, primary_key=True)
+    ultimo_seq = db.Column(db.Integer, nullable=False, default=0)
+    atualizado_em = db.Column(db.DateTime, default=datetime.now)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'ultimo_seq': self.ultimo_seq,
+            'atualizado_em': self.atualizado_em.isoformat() if self.atualizado_em else None
+        }
+
+
+class ResumoDiario(db.Model):
+    __tablename__ = 'dashboard_resumo_diario'
+    __table_args__ = (
+        # Uma linha por dia x transportadora x status; o índice também atende o histórico por período
+        db.UniqueConstraint('data', 'transportadora', 'status', name='uq_resumo_diario_data_transportadora_status'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    data = db.Column(db.Date, nullable=False)
+    transportadora = db.Column(db.String(50), nullable=False, default='')  # '' = sem transportadora
+    status = db.Column(db.String(50), nullable=False)  # Status da base no fechamento ('fora_da_base' se não consta)
+    quantidade = db.Column(db.Integer, nullable=False, default=0)
+    fechado_em = db.Column(db.DateTime, default=datetime.now)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'data': self.data.isoformat(),
+            'transportadora': self.transportadora,
+            'status': self.status,
+            'quantidade': self.quantidade,
+            'fechado_em': self.fechado_em.isoformat() if self.fechado_em else None
+        }
+
+
+class ResumoParcial(db.Model):
+    """Contadores das bipagens apagadas por um reset ou limpeza da base, somados no fechamento do dia"""
+    __tablename__ = 'dashboard_resumo_parcial'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    data = db.Column(db.Date, nullable=False, index=True)
+    transportadora = db.Column(db.String(50), nullable=False, default='')
+    status = db.Column(db.String(50), nullable=False)  # Status da base no momento da limpeza
+    quantidade = db.Column(db.Integer, nullable=False, default=0)
+    congelado_em = db.Column(db.DateTime, default=datetime.now)
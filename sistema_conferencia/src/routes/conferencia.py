@@ -1,13 +1,138 @@
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
 from src.models.rastreio import db, RastreioEsperado, MercadoriaConferida, DashboardCache
-from datetime import datetime, date
+from src.services.dashboard import categoria_status, categoria_de, calcular_contadores, aplicar_delta_dashboard, dados_dashboard, obter_ou_criar_cache, marcar_rastreio_contado, marcar_rastreios_contados, desmarcar_rastreio_contado, limpar_rastreios_contados, redefinir_rastreios_contados
+from src.services.importacao import TAMANHO_LOTE, dividir_em_lotes, normalizar_codigo, importar_codigos, iniciar_importacao_arquivo, obter_importacao
+from src.services.eventos import publicar, assinar, cancelar, fluxo_eventos
+from src.services.indice import indice_rastreios, indice_ativo, consultar_rastreio, consultar_rastreios
+from src.services.metricas import texto_prometheus
+from src.services.journal import journal_bipagens
+from src.services.resumo import contadores_do_dia, congelar_bipagens_apagadas, fechar_dia, fechar_dias_pendentes, historico, fechamento_diario
+from src.services.arquivo import bipagens_com_arquivo, situacao_arquivo
+from src.services.transportadoras import detectar_transportadora
+from src import config
+from datetime import datetime, date, time, timedelta
+from sqlalchemy import case, select, update, func
 import io
 import csv
 import os
-import json
+import codecs
+from contextlib import nullcontext
 
 conferencia_bp = Blueprint('conferencia', __name__)
 
+# Tamanho máximo de página aceito pelas listagens paginadas
+LIMITE_MAXIMO_PAGINA = 5000
+
+# Linhas lidas do banco por bloco na exportação em streaming
+TAMANHO_BLOCO_EXPORTACAO = 2000
+
+def ler_paginacao(tipo_cursor=int):
+    """Lê os parâmetros limit/cursor da query string - sem limit a listagem vem completa"""
+    limit = request.args.get('limit', type=int)
+    cursor = request.args.get('cursor', type=tipo_cursor)
+    if limit is not None:
+        limit = max(1, min(limit, LIMITE_MAXIMO_PAGINA))
+    return limit, cursor
+
+def consultar_bipadas(filtros=(), limit=None, cursor=None):
+    """
+    Busca as mercadorias bipadas com o status da base em um único LEFT JOIN,
+    da mais recente para a mais antiga. Retorna (linhas, proximo_cursor).
+    """
+    consulta = (
+        select(
+            MercadoriaConferida.id,
+            MercadoriaConferida.codigo_rastreio,
+            MercadoriaConferida.timestamp,
+            MercadoriaConferida.transportadora,
+            MercadoriaConferida.data_bipagem,
+            RastreioEsperado.id.label('rastreio_id'),
+            categoria_status(RastreioEsperado.status).label('categoria')
+        )
+        .outerjoin(RastreioEsperado, MercadoriaConferida.codigo_rastreio == RastreioEsperado.codigo_rastreio)
+        .where(*filtros)
+        .order_by(MercadoriaConferida.id.desc())
+    )
+    if cursor:
+        consulta = consulta.where(MercadoriaConferida.id < cursor)
+    if limit:
+        # Uma linha extra indica se existe próxima página
+        consulta = consulta.limit(limit + 1)
+    
+    linhas = db.session.execute(consulta).all()
+    
+    proximo_cursor = None
+    if limit and len(linhas) > limit:
+        linhas = linhas[:limit]
+        proximo_cursor = linhas[-1].id
+    
+    return linhas, proximo_cursor
+
+def filtro_prefixo(coluna, prefixo):
+    """Faixa [prefixo, próximo prefixo) - ao contrário de LIKE, usa o índice da coluna"""
+    seguinte = prefixo[:-1] + chr(ord(prefixo[-1]) + 1)
+    return (coluna >= prefixo, coluna < seguinte)
+
+def consultar_faltantes(ordem='codigo', busca=None, limit=None, cursor=None):
+    """
+    Rastreios pendentes por keyset: em ordem de código (cursor = último código) ou de
+    importação (cursor = último id), opcionalmente só os que começam com `busca`.
+    Retorna (linhas, proximo_cursor).
+    """
+    coluna_ordem = RastreioEsperado.codigo_rastreio if ordem == 'codigo' else RastreioEsperado.id
+    consulta = (
+        select(RastreioEsperado.id, RastreioEsperado.codigo_rastreio, RastreioEsperado.status)
+        .where(RastreioEsperado.status == 'pendente')
+        .order_by(coluna_ordem)
+    )
+    if busca:
+        consulta = consulta.where(*filtro_prefixo(RastreioEsperado.codigo_rastreio, busca))
+    if cursor is not None:
+        consulta = consulta.where(coluna_ordem > cursor)
+    if limit:
+        # Uma linha extra indica se existe próxima página
+        consulta = consulta.limit(limit + 1)
+    
+    linhas = db.session.execute(consulta).all()
+    
+    proximo_cursor = None
+    if limit and len(linhas) > limit:
+        linhas = linhas[:limit]
+        proximo_cursor = linhas[-1].codigo_rastreio if ordem == 'codigo' else linhas[-1].id
+    
+    return linhas, proximo_cursor
+
+def evento_bipagem(codigo, timestamp, resultado, status_anterior=None, status=None, transportadora=None):
+    """Dados do evento 'bipagem' - status_anterior/status são os da base (None = fora da base)"""
+    return {
+        'codigo': codigo,
+        'resultado': resultado,
+        'status_anterior': status_anterior,
+        'status': status,
+        'transportadora': transportadora,
+        'timestamp': timestamp.isoformat()
+    }
+
+def publicar_status(codigo, status_anterior, status):
+    """Publica a mudança de status de um rastreio, indicando se ele já foi bipado"""
+    _, bipada = consultar_rastreio(codigo)
+    publicar('status', {'codigo': codigo, 'status_anterior': status_anterior, 'status': status, 'bipada': bipada})
+
+def publicar_dashboard(hoje):
+    """Publica os contadores do dashboard do dia, se o cache existir"""
+    cache = DashboardCache.query.filter_by(data=hoje).first()
+    if cache:
+        publicar('dashboard', dados_dashboard(cache))
+
+def item_bipada(linha):
+    """Formata uma linha de consultar_bipadas para a resposta JSON"""
+    return {
+        "codigo": linha.codigo_rastreio,
+        "timestamp": linha.timestamp,
+        "transportadora": linha.transportadora,
+        "data_bipagem": linha.data_bipagem
+    }
+
 @conferencia_bp.route('/rastreios/importar', methods=['POST'])
 def importar_rastreios():
     """Importa uma lista de códigos de rastreio para a base"""
@@ -22,32 +147,20 @@ def importar_rastreios():
         
         # Limpar base existente se solicitado
         if data.get('limpar_base', False):
+            journal_bipagens.drenar()
+            # Dias anteriores ficam congelados com o status da base atual; as bipagens de hoje
+            # entram no fechamento de hoje pelo resumo parcial
+            fechar_dias_pendentes()
+            congelar_bipagens_apagadas()
             db.session.query(RastreioEsperado).delete()
             db.session.query(MercadoriaConferida).delete()
+            indice_rastreios.registrar_limpeza()
         
-        novos_rastreios = 0
-        duplicados = 0
-        
-        for codigo in rastreios:
-            if not codigo or not isinstance(codigo, str):
-                continue
-                
-            codigo = codigo.strip().upper()
-            if not codigo:
-                continue
-                
-            # Verificar se já existe
-            existe = RastreioEsperado.query.filter_by(codigo_rastreio=codigo).first()
-            if existe:
-                duplicados += 1
-                continue
-            
-            # Criar novo rastreio
-            novo_rastreio = RastreioEsperado(codigo_rastreio=codigo)
-            db.session.add(novo_rastreio)
-            novos_rastreios += 1
+        # Deduplicação, verificação de existência e inserção em lotes set-based
+        novos_rastreios, duplicados = importar_codigos(rastreios)
         
         db.session.commit()
+        publicar('recarregar', {'motivo': 'importacao'})
         
         return jsonify({
             'mensagem': f'Importação concluída. {novos_rastreios} novos rastreios adicionados.',
@@ -59,6 +172,77 @@ def importar_rastreios():
         db.session.rollback()
         return jsonify({'erro': f'Erro ao importar rastreios: {str(e)}'}), 500
 
+@conferencia_bp.route('/rastreios/importar-arquivo', methods=['POST'])
+def importar_rastreios_arquivo():
+    """Importa a base a partir de um arquivo CSV/TXT enviado por upload, processado em segundo plano"""
+    try:
+        arquivo = request.files.get('arquivo')
+        if not arquivo or not arquivo.filename:
+            return jsonify({'erro': 'Arquivo é obrigatório'}), 400
+        
+        # Sem coluna: um código por linha. Com coluna: CSV (nome do cabeçalho ou posição a partir de 1)
+        coluna = request.form.get('coluna', '').strip() or None
+        cabecalho = request.form.get('cabecalho', '').strip().lower() in ['1', 'true', 'on', 'sim']
+        limpar_base = request.form.get('limpar_base', '').strip().lower() in ['1', 'true', 'on', 'sim']
+        if limpar_base:
+            journal_bipagens.drenar()
+            fechar_dias_pendentes()
+        
+        importacao = iniciar_importacao_arquivo(
+            current_app._get_current_object(),
+            arquivo.stream,
+            arquivo.filename,
+            coluna=coluna,
+            cabecalho=cabecalho,
+            limpar_base=limpar_base
+        )
+        
+        return jsonify(importacao), 202
+        
+    except Exception as e:
+        return jsonify({'erro': f'Erro ao importar arquivo: {str(e)}'}), 500
+
+@conferencia_bp.route('/rastreios/importar-arquivo/<importacao_id>', methods=['GET'])
+def status_importacao_arquivo(importacao_id):
+    """Retorna o progresso de uma importação por arquivo"""
+    importacao = obter_importacao(importacao_id)
+    if not importacao:
+        return jsonify({'erro': 'Importação não encontrada'}), 404
+    
+    return jsonify(importacao)
+
+def bipar_via_journal(codigo, status_anterior, ja_bipado, agora, transportadora):
+    """Bipagem no modo journal: confirmada após o fsync do journal, gravada no banco em lote depois"""
+    if ja_bipado and status_anterior is not None:
+        timestamp_anterior = journal_bipagens.timestamp_pendente(codigo)
+        if timestamp_anterior is None:
+            ja_conferida = MercadoriaConferida.query.filter_by(codigo_rastreio=codigo).first()
+            timestamp_anterior = ja_conferida.timestamp.isoformat() if ja_conferida else None
+        if timestamp_anterior:
+            return jsonify({
+                'mensagem': 'Mercadoria já foi conferida anteriormente',
+                'timestamp_anterior': timestamp_anterior
+            })
+    
+    # Status atualizado apenas se ainda for 'pendente'; fora da base continua sem status
+    status = 'conferido' if status_anterior == 'pendente' else status_anterior
+    journal_bipagens.registrar(codigo, agora, status_anterior, status, transportadora)
+    
+    if status_anterior is None:
+        publicar('bipagem', evento_bipagem(codigo, agora, 'nao_encontrado', transportadora=transportadora))
+        return jsonify({
+            'mensagem': 'Mercadoria não encontrada na base de rastreios',
+            'status': 'nao_encontrado',
+            'codigo': codigo
+        })
+    
+    publicar('bipagem', evento_bipagem(codigo, agora, 'encontrado', status_anterior, status, transportadora))
+    return jsonify({
+        'mensagem': 'Mercadoria conferida com sucesso',
+        'status': 'encontrado',
+        'codigo': codigo
+    })
+
 @conferencia_bp.route('/mercadorias/bipar', methods=['POST'])
 def bipar_mercadoria():
     """Registra uma mercadoria bipada e verifica seu status"""
@@ -71,66 +255,40 @@ def bipar_mercadoria():
         if not codigo:
             return jsonify({'erro': 'Código de rastreio não pode estar vazio'}), 400
         
-        # Verificar se o rastreio está na base
-        rastreio = RastreioEsperado.query.filter_by(codigo_rastreio=codigo).first()
+        # Verificar se o rastreio está na base e se já foi bipado (índice em memória, sem ir ao banco)
+        status_anterior, ja_bipado = consultar_rastreio(codigo)
+        agora = datetime.now()
+        # Transportadora pelo formato do código: o card do dashboard já conta a bipagem
+        transportadora = detectar_transportadora(codigo)
         
-        if not rastreio:
+        if journal_bipagens.iniciado:
+            return bipar_via_journal(codigo, status_anterior, ja_bipado, agora, transportadora)
+        
+        if status_anterior is None:
             # Registrar como não encontrado
             mercadoria_conferida = MercadoriaConferida(
                 codigo_rastreio=codigo,
-                data_bipagem=datetime.now().date()
+                timestamp=agora,
+                data_bipagem=agora.date(),
+                transportadora=transportadora
             )
             db.session.add(mercadoria_conferida)
+            indice_rastreios.registrar_bipagem(codigo)
             db.session.commit()
+            publicar('bipagem', evento_bipagem(codigo, agora, 'nao_encontrado', transportadora=transportadora))
             
             # Incrementar dashboard mesmo para rastreios não encontrados
             try:
                 hoje = datetime.now().date()
-                cache = DashboardCache.query.filter_by(data=hoje).first()
-                
-                # Verificar se este rastreio já foi contado no dashboard hoje
-                rastreios_contados = json.loads(cache.rastreios_contados) if cache and cache.rastreios_contados else []
                 
-                if codigo not in rastreios_contados:
-                    if cache:
-                        # Incrementar contadores existentes
-                        cache.total_hoje += 1
-                        cache.sem_status_hoje += 1  # Não encontrado = sem status
-                        
-                        # A transportadora será atualizada posteriormente através das funções de atualização
-                        # Por enquanto, apenas incrementar o total e status
-                        
-                        # Adicionar à lista de rastreios contados
-                        if not cache.rastreios_contados:
-                            cache.rastreios_contados = '[]'
-                        rastreios_contados = json.loads(cache.rastreios_contados)
-                        rastreios_contados.append(codigo)
-                        cache.rastreios_contados = json.dumps(rastreios_contados)
-                        
-                        cache.ultima_atualizacao = datetime.now()
-                        db.session.commit()
-                    else:
-                        # Se não existe cache, criar novo
-                        transportadoras = {
-                            'J&T': 0, 'JADLOG': 0, 'DIALOGO': 0, 'CORREIOS': 0, 'CORREIOS PA': 0,
-                            'LOGAN': 0, 'FAVELA LOG': 0, 'SAC SERVICE': 0, 'DISSUDES': 0
-                        }
-                        
-                        # A transportadora será atualizada posteriormente através das funções de atualização
-                        # Por enquanto, apenas incrementar o total e status
-                        
-                        cache = DashboardCache(
-                            data=hoje,
-                            transportadoras=transportadoras,
-                            total_hoje=1,
-                            coleta_hoje=0,
-                            insucesso_hoje=0,
-                            sem_status_hoje=1,  # Não encontrado = sem status
-                            rastreios_contados=json.dumps([codigo]),
-                            ultima_atualizacao=datetime.now()
-                        )
-                        db.session.add(cache)
-                        db.session.commit()
+                # Registrar no conjunto de contados do dia (falha se já foi contado hoje)
+                if marcar_rastreio_contado(hoje, codigo):
+                    # UPDATE atômico: bipagens simultâneas não perdem incrementos
+                    obter_ou_criar_cache(hoje)
+                    db.session.flush()
+                    aplicar_delta_dashboard(hoje, total=1, categorias={'sem_status': 1}, transportadoras={transportadora: 1})  # Não encontrado = sem status
+                    db.session.commit()
+                    publicar_dashboard(hoje)
                 else:
                     print(f"Rastreio {codigo} já foi contado no dashboard hoje")
                     
@@ -144,87 +302,51 @@ def bipar_mercadoria():
                 'codigo': codigo
             })
         
-        # Verificar se já foi conferida
-        ja_conferida = MercadoriaConferida.query.filter_by(codigo_rastreio=codigo).first()
-        if ja_conferida:
-            return jsonify({
-                'mensagem': 'Mercadoria já foi conferida anteriormente',
-                'timestamp_anterior': ja_conferida.timestamp.isoformat()
-            })
+        # Verificar se já foi conferida (o banco só é lido para informar o horário da bipagem anterior)
+        if ja_bipado:
+            ja_conferida = MercadoriaConferida.query.filter_by(codigo_rastreio=codigo).first()
+            if ja_conferida:
+                return jsonify({
+                    'mensagem': 'Mercadoria já foi conferida anteriormente',
+                    'timestamp_anterior': ja_conferida.timestamp.isoformat()
+                })
         
         # Registrar como conferida
         mercadoria_conferida = MercadoriaConferida(
             codigo_rastreio=codigo,
-            data_bipagem=datetime.now().date()
+            timestamp=agora,
+            data_bipagem=agora.date(),
+            transportadora=transportadora
         )
         db.session.add(mercadoria_conferida)
+        indice_rastreios.registrar_bipagem(codigo)
         
         # Atualizar status do rastreio apenas se ainda for 'pendente'
-        if rastreio.status == 'pendente':
-            rastreio.status = 'conferido'
+        status_atual = status_anterior
+        if status_anterior == 'pendente':
+            status_atual = 'conferido'
+            db.session.execute(
+                update(RastreioEsperado)
+                .where(RastreioEsperado.codigo_rastreio == codigo, RastreioEsperado.status == 'pendente')
+                .values(status=status_atual)
+            )
+            indice_rastreios.registrar_status(codigo, status_atual)
         
         db.session.commit()
+        publicar('bipagem', evento_bipagem(codigo, agora, 'encontrado', status_anterior, status_atual, transportadora))
         
         # Incrementar dashboard após bipagem (apenas se não foi contado antes)
         try:
             hoje = datetime.now().date()
-            cache = DashboardCache.query.filter_by(data=hoje).first()
-            
-            # Verificar se este rastreio já foi contado no dashboard hoje
-            rastreios_contados = json.loads(cache.rastreios_contados) if cache and cache.rastreios_contados else []
             
-            if codigo not in rastreios_contados:
-                if cache:
-                    # Incrementar contadores existentes
-                    cache.total_hoje += 1
-                    
-                    # Verificar status atual do rastreio para incrementar o contador correto
-                    if rastreio.status == 'coleta':
-                        cache.coleta_hoje += 1
-                    elif rastreio.status == 'insucesso':
-                        cache.insucesso_hoje += 1
-                    else:
-                        cache.sem_status_hoje += 1  # pendente, conferido, etc.
-                    
-                    # A transportadora será atualizada posteriormente através das funções de atualização
-                    # Por enquanto, apenas incrementar o total e status
-                    
-                    # Adicionar à lista de rastreios contados
-                    if not cache.rastreios_contados:
-                        cache.rastreios_contados = '[]'
-                    rastreios_contados = json.loads(cache.rastreios_contados)
-                    rastreios_contados.append(codigo)
-                    cache.rastreios_contados = json.dumps(rastreios_contados)
-                    
-                    cache.ultima_atualizacao = datetime.now()
-                    db.session.commit()
-                else:
-                    # Se não existe cache, criar novo
-                    transportadoras = {
-                        'J&T': 0, 'JADLOG': 0, 'DIALOGO': 0, 'CORREIOS': 0, 'CORREIOS PA': 0,
-                        'LOGAN': 0, 'FAVELA LOG': 0, 'SAC SERVICE': 0, 'DISSUDES': 0
-                    }
-                    
-                    # Verificar status atual do rastreio para o contador inicial
-                    coleta_inicial = 1 if rastreio.status == 'coleta' else 0
-                    insucesso_inicial = 1 if rastreio.status == 'insucesso' else 0
-                    sem_status_inicial = 1 if rastreio.status not in ['coleta', 'insucesso'] else 0
-                    
-                    # A transportadora será atualizada posteriormente através das funções de atualização
-                    # Por enquanto, apenas incrementar o total e status
-                    
-                    cache = DashboardCache(
-                        data=hoje,
-                        transportadoras=transportadoras,
-                        total_hoje=1,
-                        coleta_hoje=coleta_inicial,
-                        insucesso_hoje=insucesso_inicial,
-                        sem_status_hoje=sem_status_inicial,
-                        rastreios_contados=json.dumps([codigo]),
-                        ultima_atualizacao=datetime.now()
-                    )
-                    db.session.add(cache)
-                    db.session.commit()
+            # Registrar no conjunto de contados do dia (falha se já foi contado hoje)
+            if marcar_rastreio_contado(hoje, codigo):
+                # UPDATE atômico na categoria do status atual (pendente, conferido etc. = sem status)
+                obter_ou_criar_cache(hoje)
+                db.session.flush()
+                aplicar_delta_dashboard(hoje, total=1, categorias={categoria_de(status_atual): 1}, transportadoras={transportadora: 1})
+                db.session.commit()
+                publicar_dashboard(hoje)
             else:
                 print(f"Rastreio {codigo} já foi contado no dashboard hoje")
                 
@@ -242,23 +364,150 @@ def bipar_mercadoria():
         db.session.rollback()
         return jsonify({'erro': f'Erro ao bipar mercadoria: {str(e)}'}), 500
 
+@conferencia_bp.route('/mercadorias/bipar-lote', methods=['POST'])
+def bipar_mercadorias_lote():
+    """Registra um lote de mercadorias bipadas (leituras acumuladas pelo coletor) em uma única transação"""
+    try:
+        data = request.get_json()
+        if not data or 'codigos' not in data:
+            return jsonify({'erro': 'Lista de códigos é obrigatória'}), 400
+        
+        codigos = data['codigos']
+        if not isinstance(codigos, list):
+            return jsonify({'erro': 'Códigos deve ser uma lista'}), 400
+        
+        normalizados = [normalizar_codigo(codigo) for codigo in codigos]
+        unicos = list(dict.fromkeys(codigo for codigo in normalizados if codigo))
+        
+        # Resolver todos os códigos contra a base e contra as bipagens anteriores pelo índice em memória;
+        # o banco só é lido para o horário da bipagem anterior dos que já foram conferidos
+        status_base, ja_bipados = consultar_rastreios(unicos)
+        bipados_antes = {}
+        for lote in dividir_em_lotes(list(ja_bipados), TAMANHO_LOTE):
+            bipados_antes.update(db.session.execute(
+                select(MercadoriaConferida.codigo_rastreio, func.min(MercadoriaConferida.timestamp))
+                .where(MercadoriaConferida.codigo_rastreio.in_(lote))
+                .group_by(MercadoriaConferida.codigo_rastreio)
+            ).all())
+        
+        agora = datetime.now()
+        hoje = agora.date()
+        resultados = []
+        novas_mercadorias = []
+        conferidos_agora = set()
+        
+        for original, codigo in zip(codigos, normalizados):
+            if not codigo:
+                resultados.append({'codigo': original if isinstance(original, str) else None, 'status': 'invalido'})
+            elif codigo not in status_base:
+                # Fora da base: registrado a cada leitura, como na bipagem individual
+                novas_mercadorias.append({'codigo_rastreio': codigo, 'timestamp': agora, 'data_bipagem': hoje, 'transportadora': detectar_transportadora(codigo)})
+                resultados.append({'codigo': codigo, 'status': 'nao_encontrado'})
+            elif codigo in bipados_antes:
+                resultados.append({
+                    'codigo': codigo,
+                    'status': 'ja_conferida',
+                    'timestamp_anterior': bipados_antes[codigo].isoformat()
+                })
+            elif codigo in conferidos_agora:
+                resultados.append({'codigo': codigo, 'status': 'ja_conferida', 'timestamp_anterior': agora.isoformat()})
+            else:
+                conferidos_agora.add(codigo)
+                novas_mercadorias.append({'codigo_rastreio': codigo, 'timestamp': agora, 'data_bipagem': hoje, 'transportadora': detectar_transportadora(codigo)})
+                resultados.append({'codigo': codigo, 'status': 'encontrado'})
+        
+        if novas_mercadorias:
+            db.session.execute(MercadoriaConferida.__table__.insert(), novas_mercadorias)
+            for mercadoria in novas_mercadorias:
+                indice_rastreios.registrar_bipagem(mercadoria['codigo_rastreio'])
+        
+        # Atualizar status apenas dos que ainda estavam 'pendente'
+        for lote in dividir_em_lotes(list(conferidos_agora), TAMANHO_LOTE):
+            db.session.execute(
+                update(RastreioEsperado)
+                .where(RastreioEsperado.codigo_rastreio.in_(lote), RastreioEsperado.status == 'pendente')
+                .values(status='conferido')
+            )
+        for codigo in conferidos_agora:
+            if status_base[codigo] == 'pendente':
+                indice_rastreios.registrar_status(codigo, 'conferido')
+        
+        # Incrementar o dashboard apenas com os rastreios ainda não contados hoje
+        contados_agora = marcar_rastreios_contados(hoje, [m['codigo_rastreio'] for m in novas_mercadorias])
+        if contados_agora:
+            categorias = {}
+            transportadoras = {}
+            for codigo in contados_agora:
+                # pendente, conferido ou fora da base = sem status
+                categoria = categoria_de(status_base.get(codigo))
+                categorias[categoria] = categorias.get(categoria, 0) + 1
+                transportadora = detectar_transportadora(codigo)
+                transportadoras[transportadora] = transportadoras.get(transportadora, 0) + 1
+            obter_ou_criar_cache(hoje)
+            db.session.flush()
+            aplicar_delta_dashboard(hoje, total=len(contados_agora), categorias=categorias, transportadoras=transportadoras)
+        
+        db.session.commit()
+        
+        if novas_mercadorias:
+            itens = []
+            for mercadoria in novas_mercadorias:
+                codigo = mercadoria['codigo_rastreio']
+                transportadora = mercadoria['transportadora']
+                if codigo in status_base:
+                    anterior = status_base[codigo]
+                    itens.append(evento_bipagem(codigo, agora, 'encontrado', anterior, 'conferido' if anterior == 'pendente' else anterior, transportadora))
+                else:
+                    itens.append(evento_bipagem(codigo, agora, 'nao_encontrado', transportadora=transportadora))
+            publicar('bipagem_lote', {'itens': itens})
+        if contados_agora:
+            publicar_dashboard(hoje)
+        
+        return jsonify({
+            'resultados': resultados,
+            'total': len(resultados),
+            'encontrados': sum(1 for r in resultados if r['status'] == 'encontrado'),
+            'nao_encontrados': sum(1 for r in resultados if r['status'] == 'nao_encontrado'),
+            'ja_conferidas': sum(1 for r in resultados if r['status'] == 'ja_conferida')
+        })
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'erro': f'Erro ao bipar lote de mercadorias: {str(e)}'}), 500
+
 @conferencia_bp.route('/mercadorias/faltantes', methods=['GET'])
 def listar_faltantes():
-    """Retorna a lista de mercadorias faltantes"""
+    """Retorna as mercadorias faltantes - paginadas com ?limit=&cursor=, ordem=codigo|importacao e busca por prefixo"""
     try:
-        # Apenas rastreios pendentes são considerados faltantes
-        faltantes = RastreioEsperado.query.filter_by(status='pendente').all()
+        ordem = request.args.get('ordem', 'codigo')
+        if ordem not in ['codigo', 'importacao']:
+            return jsonify({'erro': 'Ordem inválida (use codigo ou importacao)'}), 400
+        busca = request.args.get('busca', '').strip().upper() or None
+        limit, cursor = ler_paginacao(str if ordem == 'codigo' else int)
         
-        lista_faltantes = []
-        for rastreio in faltantes:
-            lista_faltantes.append({
-                'codigo': rastreio.codigo_rastreio,
-                'status': rastreio.status
-            })
+        # Apenas rastreios pendentes são considerados faltantes
+        linhas, proximo_cursor = consultar_faltantes(ordem, busca, limit, cursor)
+        
+        lista_faltantes = [{
+            'codigo': linha.codigo_rastreio,
+            'status': linha.status
+        } for linha in linhas]
+        
+        # Em listagens paginadas o total vem de um COUNT separado, só na primeira página
+        if limit is None:
+            total = len(lista_faltantes)
+        elif cursor is None:
+            filtros = [RastreioEsperado.status == 'pendente']
+            if busca:
+                filtros.extend(filtro_prefixo(RastreioEsperado.codigo_rastreio, busca))
+            total = db.session.execute(select(func.count()).select_from(RastreioEsperado).where(*filtros)).scalar()
+        else:
+            total = None
         
         return jsonify({
             'faltantes': lista_faltantes,
-            'total': len(lista_faltantes)
+            'total': total,
+            'proximo_cursor': proximo_cursor
         })
         
     except Exception as e:
@@ -268,24 +517,25 @@ def listar_faltantes():
 def listar_conferidas():
     """Retorna a lista de mercadorias já conferidas"""
     try:
-        conferidas = MercadoriaConferida.query.all()
+        limit, cursor = ler_paginacao()
+        linhas, proximo_cursor = consultar_bipadas(limit=limit, cursor=cursor)
         
-        lista_conferidas = []
-        for mercadoria in conferidas:
-            # Verificar se estava na base
-            rastreio = RastreioEsperado.query.filter_by(codigo_rastreio=mercadoria.codigo_rastreio).first()
-            status_base = 'na_base' if rastreio else 'fora_da_base'
-            
-            lista_conferidas.append({
-                'codigo': mercadoria.codigo_rastreio,
-                'timestamp': mercadoria.timestamp.isoformat(),
-                'status_base': status_base,
-                'transportadora': mercadoria.transportadora
-            })
+        lista_conferidas = [{
+            'codigo': linha.codigo_rastreio,
+            'timestamp': linha.timestamp,
+            'status_base': 'na_base' if linha.rastreio_id else 'fora_da_base',
+            'transportadora': linha.transportadora
+        } for linha in linhas]
+        
+        # Em listagens paginadas o total vem de um COUNT separado
+        total = len(lista_conferidas) if limit is None else db.session.execute(
+            select(func.count()).select_from(MercadoriaConferida)
+        ).scalar()
         
         return jsonify({
             'conferidas': lista_conferidas,
-            'total': len(lista_conferidas)
+            'total': total,
+            'proximo_cursor': proximo_cursor
         })
         
     except Exception as e:
@@ -295,6 +545,14 @@ def listar_conferidas():
 def resetar_sistema():
     """Reseta o sistema: apaga rastreios esperados e TODAS as mercadorias conferidas/bipadas. NÃO afeta o dashboard."""
     try:
+        # Bipagens ainda no journal entram na contagem e na limpeza
+        journal_bipagens.drenar()
+        
+        # Congelar no resumo diário os dias anteriores antes de apagar as bipagens; as de hoje
+        # ficam no resumo parcial e são somadas ao fechamento do dia, como o dashboard mantido
+        fechar_dias_pendentes()
+        congelar_bipagens_apagadas()
+        
         # Contagens antes da limpeza
         total_rastreios = RastreioEsperado.query.count()
         total_mercadorias = MercadoriaConferida.query.count()
@@ -302,11 +560,13 @@ def resetar_sistema():
         # Limpar rastreios esperados e TODAS as mercadorias conferidas/bipadas
         db.session.query(RastreioEsperado).delete()
         db.session.query(MercadoriaConferida).delete()
+        indice_rastreios.registrar_limpeza()
         
         # NÃO limpar o cache do dashboard - manter os contadores do dia
         # O dashboard continuará mostrando os dados do dia mesmo após o reset
         
         db.session.commit()
+        publicar('recarregar', {'motivo': 'reset'})
         
         return jsonify({
             'mensagem': f'Sistema resetado com sucesso! {total_rastreios} rastreios esperados e {total_mercadorias} mercadorias (bipadas/conferidas) foram removidos. O dashboard do dia foi mantido.',
@@ -331,9 +591,11 @@ def resetar_dashboard():
         if not cache:
             return jsonify({'mensagem': 'Nenhum cache do dashboard encontrado para hoje'})
         
-        # Remover cache
+        # Remover cache e o conjunto de rastreios contados do dia
         db.session.delete(cache)
+        limpar_rastreios_contados(hoje)
         db.session.commit()
+        publicar('recarregar', {'motivo': 'reset_dashboard', 'escopo': ['dashboard']})
         
         return jsonify({
             'mensagem': f'Cache do dashboard do dia resetado com sucesso.',
@@ -345,28 +607,130 @@ def resetar_dashboard():
         db.session.rollback()
         return jsonify({'erro': f'Erro ao resetar dashboard: {str(e)}'}), 500
 
+@conferencia_bp.route('/indice', methods=['GET'])
+def situacao_indice():
+    """Situação do índice em memória dos rastreios: carga e memória ocupada"""
+    try:
+        if indice_rastreios.carregando_em_segundo_plano:
+            return jsonify({'ativo': False, 'carregando': True, 'mensagem': 'Índice em memória carregando - bipagem consultando o banco'})
+        if not indice_ativo():
+            return jsonify({'ativo': False, 'mensagem': 'Índice em memória desativado (CONFERENCIA_INDICE_MEMORIA=0)'})
+        
+        return jsonify({
+            'ativo': True,
+            'carregado_em': indice_rastreios.carregado_em.isoformat(),
+            'duracao_carga_ms': indice_rastreios.duracao_carga_ms,
+            'memoria': indice_rastreios.memoria()
+        })
+        
+    except Exception as e:
+        return jsonify({'erro': f'Erro ao consultar índice: {str(e)}'}), 500
+
+@conferencia_bp.route('/indice/verificar', methods=['GET'])
+def verificar_indice():
+    """Compara o índice em memória com o banco; com ?corrigir=1 recarrega o índice se houver divergência"""
+    try:
+        if indice_rastreios.carregando_em_segundo_plano:
+            return jsonify({'erro': 'Índice em memória ainda carregando'}), 409
+        if not indice_ativo():
+            return jsonify({'erro': 'Índice em memória desativado (CONFERENCIA_INDICE_MEMORIA=0)'}), 400
+        
+        resultado = indice_rastreios.verificar()
+        resultado['corrigido'] = False
+        if not resultado['consistente'] and request.args.get('corrigir', '').lower() in ['1', 'true', 'sim']:
+            indice_rastreios.carregar()
+            resultado['corrigido'] = True
+        
+        return jsonify(resultado)
+        
+    except Exception as e:
+        return jsonify({'erro': f'Erro ao verificar índice: {str(e)}'}), 500
+
+@conferencia_bp.route('/journal', methods=['GET'])
+def situacao_journal():
+    """Situação do journal de bipagens: sequências confirmadas, gravadas no banco e pendentes"""
+    return jsonify(journal_bipagens.situacao())
+
+@conferencia_bp.route('/arquivo', methods=['GET'])
+def situacao_arquivamento():
+    """Retenção, tamanho da tabela viva de bipagens e arquivos mensais"""
+    try:
+        return jsonify(situacao_arquivo())
+    except Exception as e:
+        return jsonify({'erro': f'Erro ao consultar arquivamento: {str(e)}'}), 500
+
+@conferencia_bp.route('/arquivo/executar', methods=['POST'])
+def executar_arquivamento():
+    """Executa agora o fechamento dos dias pendentes e o arquivamento das bipagens fora da retenção"""
+    try:
+        if config.RETENCAO_DIAS <= 0:
+            return jsonify({'erro': 'Arquivamento desativado (CONFERENCIA_RETENCAO_DIAS=0)'}), 400
+
+        resultado = fechamento_diario.fechar_agora()
+        return jsonify({
+            'dias_fechados': [dia.isoformat() for dia in resultado['dias_fechados']],
+            'arquivamento': resultado['arquivamento']
+        })
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'erro': f'Erro ao arquivar bipagens: {str(e)}'}), 500
+
+@conferencia_bp.route('/metrics', methods=['GET'])
+def metricas():
+    """Latência, instruções SQL e tempo de banco por endpoint no formato texto do Prometheus"""
+    if not config.METRICAS:
+        return jsonify({'erro': 'Métricas desativadas (CONFERENCIA_METRICAS=0)'}), 404
+    
+    return Response(texto_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@conferencia_bp.route('/eventos', methods=['GET'])
+def eventos():
+    """Canal Server-Sent Events com as mudanças publicadas pelas rotas de escrita"""
+    # EventSource reenvia o último id recebido ao reconectar
+    ultimo_id = request.headers.get('Last-Event-ID', type=int)
+    if ultimo_id is None:
+        ultimo_id = request.args.get('ultimo_id', type=int)
+    
+    assinatura, perdidos = assinar(ultimo_id)
+    if assinatura is None:
+        # Sem thread livre para mais uma conexão: a tela usa a atualização periódica e tenta depois
+        return jsonify({'erro': 'Limite de telas conectadas ao canal de eventos atingido'}), 503, {'Retry-After': '60'}
+    
+    resposta = Response(
+        fluxo_eventos(assinatura, perdidos),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'  # Sem buffer em proxies (nginx)
+        }
+    )
+    # Libera a vaga mesmo se o cliente sair antes de o corpo começar a ser enviado
+    resposta.call_on_close(lambda: cancelar(assinatura))
+    return resposta
+
 @conferencia_bp.route('/estatisticas', methods=['GET'])
 def obter_estatisticas():
     """Retorna estatísticas do sistema"""
     try:
-        total_esperados = RastreioEsperado.query.count()
-        
-        # Contar rastreios que foram processados (conferido, coleta, insucesso)
-        total_conferidos = db.session.query(RastreioEsperado).filter(
-            RastreioEsperado.status.in_(['conferido', 'coleta', 'insucesso'])
-        ).count()
+        # Uma única passada agrupada pelo status da base
+        por_status = dict(db.session.execute(
+            select(RastreioEsperado.status, func.count()).group_by(RastreioEsperado.status)
+        ).all())
         
-        total_pendentes = RastreioEsperado.query.filter_by(status='pendente').count()
+        total_esperados = sum(por_status.values())
         
-        # Contar mercadorias bipadas que não estão na base
-        total_fora_base = MercadoriaConferida.query.join(
-            RastreioEsperado, 
-            MercadoriaConferida.codigo_rastreio == RastreioEsperado.codigo_rastreio,
-            isouter=True
-        ).filter(RastreioEsperado.id.is_(None)).count()
+        # Rastreios que foram processados (conferido, coleta, insucesso)
+        total_conferidos = sum(por_status.get(status, 0) for status in ['conferido', 'coleta', 'insucesso'])
+        total_pendentes = por_status.get('pendente', 0)
         
-        # Total de mercadorias bipadas (incluindo fora da base)
-        total_bipadas = MercadoriaConferida.query.count()
+        # Total de bipadas e quantas não estão na base (sem correspondência no LEFT JOIN)
+        total_bipadas, total_na_base = db.session.execute(
+            select(func.count(), func.count(RastreioEsperado.id))
+            .select_from(MercadoriaConferida)
+            .outerjoin(RastreioEsperado, MercadoriaConferida.codigo_rastreio == RastreioEsperado.codigo_rastreio)
+        ).one()
+        total_fora_base = total_bipadas - total_na_base
         
         # Percentual baseado no total de esperados
         percentual_conferido = (total_conferidos / total_esperados * 100) if total_esperados > 0 else 0
@@ -387,42 +751,36 @@ def obter_estatisticas():
 def listar_bipadas():
     """Retorna a lista de todas as mercadorias bipadas separadas por status"""
     try:
-        bipadas = MercadoriaConferida.query.all()
-        
-        bipadas_coleta = []
-        bipadas_insucesso = []
-        bipadas_sem_status = []
-        
-        for mercadoria in bipadas:
-            # Verificar se está na base e qual o status
-            rastreio = RastreioEsperado.query.filter_by(codigo_rastreio=mercadoria.codigo_rastreio).first()
-            
-            item = {
-                "codigo": mercadoria.codigo_rastreio,
-                "timestamp": mercadoria.timestamp.isoformat(),
-                "transportadora": mercadoria.transportadora,
-                "data_bipagem": mercadoria.data_bipagem.isoformat() if mercadoria.data_bipagem else None
-            }
-            
-            if rastreio:
-                if rastreio.status == 'coleta':
-                    bipadas_coleta.append(item)
-                elif rastreio.status == 'insucesso':
-                    bipadas_insucesso.append(item)
-                else:
-                    bipadas_sem_status.append(item)
-            else:
-                # Não está na base
-                bipadas_sem_status.append(item)
+        limit, cursor = ler_paginacao()
+        linhas, proximo_cursor = consultar_bipadas(limit=limit, cursor=cursor)
+        
+        # Fora da base ou com status pendente/conferido contam como sem status
+        listas = {'coleta': [], 'insucesso': [], 'sem_status': []}
+        for linha in linhas:
+            listas[linha.categoria].append(item_bipada(linha))
+        
+        if limit is None:
+            totais = {categoria: len(itens) for categoria, itens in listas.items()}
+        else:
+            # Em listagens paginadas os totais vêm de um único COUNT agrupado
+            categoria = categoria_status(RastreioEsperado.status)
+            totais = {'coleta': 0, 'insucesso': 0, 'sem_status': 0}
+            totais.update(db.session.execute(
+                select(categoria, func.count())
+                .select_from(MercadoriaConferida)
+                .outerjoin(RastreioEsperado, MercadoriaConferida.codigo_rastreio == RastreioEsperado.codigo_rastreio)
+                .group_by(categoria)
+            ).all())
         
         return jsonify({
-            "bipadas_coleta": bipadas_coleta,
-            "bipadas_insucesso": bipadas_insucesso,
-            "bipadas_sem_status": bipadas_sem_status,
-            "total_coleta": len(bipadas_coleta),
-            "total_insucesso": len(bipadas_insucesso),
-            "total_sem_status": len(bipadas_sem_status),
-            "total": len(bipadas)
+            "bipadas_coleta": listas['coleta'],
+            "bipadas_insucesso": listas['insucesso'],
+            "bipadas_sem_status": listas['sem_status'],
+            "total_coleta": totais['coleta'],
+            "total_insucesso": totais['insucesso'],
+            "total_sem_status": totais['sem_status'],
+            "total": sum(totais.values()),
+            "proximo_cursor": proximo_cursor
         })
         
     except Exception as e:
@@ -449,8 +807,11 @@ def aplicar_status():
             return jsonify({"erro": "Rastreio não encontrado na base"}), 404
         
         # Atualizar status
+        status_anterior = rastreio.status
         rastreio.status = status
+        indice_rastreios.registrar_status(codigo, status)
         db.session.commit()
+        publicar_status(codigo, status_anterior, status)
         
         return jsonify({
             "mensagem": f"Status '{status}' aplicado ao rastreio {codigo}",
@@ -462,6 +823,91 @@ def aplicar_status():
         db.session.rollback()
         return jsonify({"erro": f"Erro ao aplicar status: {str(e)}"}), 500
 
+def transicoes_status(codigos, status, hoje):
+    """
+    Rastreios dos códigos cujo status difere de `status`, com o status atual, as bipagens
+    na data `hoje` e se já foram bipados alguma vez - lista de (codigo, anterior, bipadas_hoje, bipada)
+    """
+    # LEFT JOIN pelo código: com uma subconsulta por data o SQLite escolheria o índice de
+    # data_bipagem e percorreria todas as bipagens do dia para cada rastreio
+    bipadas_hoje = func.coalesce(func.sum(case((MercadoriaConferida.data_bipagem == hoje, 1), else_=0)), 0)
+    transicoes = []
+    for lote in dividir_em_lotes(codigos, TAMANHO_LOTE):
+        transicoes.extend(db.session.execute(
+            select(RastreioEsperado.codigo_rastreio, RastreioEsperado.status, bipadas_hoje, func.count(MercadoriaConferida.id) > 0)
+            .select_from(RastreioEsperado)
+            .outerjoin(MercadoriaConferida, MercadoriaConferida.codigo_rastreio == RastreioEsperado.codigo_rastreio)
+            .where(RastreioEsperado.codigo_rastreio.in_(lote), RastreioEsperado.status.is_distinct_from(status))
+            .group_by(RastreioEsperado.codigo_rastreio)
+        ).all())
+    return transicoes
+
+@conferencia_bp.route("/rastreios/status/lote", methods=["POST"])
+def aplicar_status_lote():
+    """Aplica um status a uma lista de rastreios com um UPDATE por lote e ajusta o dashboard pelas transições"""
+    try:
+        data = request.get_json()
+        if not data or "codigos" not in data or "status" not in data:
+            return jsonify({"erro": "Lista de códigos e status são obrigatórios"}), 400
+        
+        codigos = data["codigos"]
+        if not isinstance(codigos, list) or not isinstance(data["status"], str):
+            return jsonify({"erro": "Códigos deve ser uma lista e status um texto"}), 400
+        
+        status = data["status"].strip().lower()
+        if status not in ["coleta", "insucesso", "pendente", "conferido"]:
+            return jsonify({"erro": "Status inválido"}), 400
+        
+        unicos = list(dict.fromkeys(codigo for codigo in map(normalizar_codigo, codigos) if codigo))
+        hoje = datetime.now().date()
+        
+        # As transições são lidas e aplicadas sob o mesmo lock de escrita: o RETURNING do SQLite
+        # só devolve o valor novo, e sem o BEGIN IMMEDIATE o driver leria fora da transação
+        if db.engine.dialect.name == 'sqlite':
+            db.session.connection().exec_driver_sql('BEGIN IMMEDIATE')
+        
+        transicoes = transicoes_status(unicos, status, hoje)
+        atualizados = 0
+        for lote in dividir_em_lotes([linha.codigo_rastreio for linha in transicoes], TAMANHO_LOTE):
+            atualizados += db.session.execute(
+                update(RastreioEsperado)
+                .where(RastreioEsperado.codigo_rastreio.in_(lote), RastreioEsperado.status.is_distinct_from(status))
+                .values(status=status)
+            ).rowcount
+        
+        # Bipagens de hoje de cada rastreio saem da categoria antiga e entram na nova
+        categorias = {}
+        quantidades = {}
+        for codigo, anterior, bipadas_hoje, _ in transicoes:
+            indice_rastreios.registrar_status(codigo, status)
+            quantidades[anterior] = quantidades.get(anterior, 0) + 1
+            if bipadas_hoje and categoria_de(anterior) != categoria_de(status):
+                categorias[categoria_de(anterior)] = categorias.get(categoria_de(anterior), 0) - bipadas_hoje
+                categorias[categoria_de(status)] = categorias.get(categoria_de(status), 0) + bipadas_hoje
+        dashboard_alterado = any(categorias.values()) and aplicar_delta_dashboard(hoje, categorias=categorias)
+        
+        db.session.commit()
+        
+        if transicoes:
+            publicar('status_lote', {'itens': [
+                {'codigo': codigo, 'status_anterior': anterior, 'status': status, 'bipada': bool(bipada)}
+                for codigo, anterior, _, bipada in transicoes
+            ]})
+        if dashboard_alterado:
+            publicar_dashboard(hoje)
+        
+        return jsonify({
+            "mensagem": f"Status '{status}' aplicado a {atualizados} rastreios",
+            "status": status,
+            "total": len(unicos),
+            "atualizados": atualizados,
+            "transicoes": quantidades
+        })
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"erro": f"Erro ao aplicar status em lote: {str(e)}"}), 500
+
 @conferencia_bp.route("/mercadorias/bipadas/<status>", methods=["GET"])
 def listar_bipadas_por_status(status):
     """Retorna a lista de mercadorias bipadas por status específico"""
@@ -469,32 +915,25 @@ def listar_bipadas_por_status(status):
         if status not in ["coleta", "insucesso", "sem_status"]:
             return jsonify({"erro": "Status inválido"}), 400
         
-        bipadas = MercadoriaConferida.query.all()
-        lista_bipadas = []
+        limit, cursor = ler_paginacao()
         
-        for mercadoria in bipadas:
-            rastreio = RastreioEsperado.query.filter_by(codigo_rastreio=mercadoria.codigo_rastreio).first()
-            
-            if status == "sem_status":
-                if not rastreio or rastreio.status not in ["coleta", "insucesso"]:
-                    lista_bipadas.append({
-                        "codigo": mercadoria.codigo_rastreio,
-                        "timestamp": mercadoria.timestamp.isoformat(),
-                        "transportadora": mercadoria.transportadora,
-                        "data_bipagem": mercadoria.data_bipagem.isoformat() if mercadoria.data_bipagem else None
-                    })
-            elif rastreio and rastreio.status == status:
-                lista_bipadas.append({
-                    "codigo": mercadoria.codigo_rastreio,
-                    "timestamp": mercadoria.timestamp.isoformat(),
-                    "transportadora": mercadoria.transportadora,
-                    "data_bipagem": mercadoria.data_bipagem.isoformat() if mercadoria.data_bipagem else None
-                })
+        # Sem status inclui as fora da base (sem correspondência no LEFT JOIN)
+        filtro = categoria_status(RastreioEsperado.status) == status
+        linhas, proximo_cursor = consultar_bipadas([filtro], limit=limit, cursor=cursor)
+        lista_bipadas = [item_bipada(linha) for linha in linhas]
+        
+        total = len(lista_bipadas) if limit is None else db.session.execute(
+            select(func.count())
+            .select_from(MercadoriaConferida)
+            .outerjoin(RastreioEsperado, MercadoriaConferida.codigo_rastreio == RastreioEsperado.codigo_rastreio)
+            .where(filtro)
+        ).scalar()
         
         return jsonify({
             "bipadas": lista_bipadas,
             "status": status,
-            "total": len(lista_bipadas)
+            "total": total,
+            "proximo_cursor": proximo_cursor
         })
         
     except Exception as e:
@@ -566,7 +1005,6 @@ def calcular_e_salvar_dashboard(hoje):
             coleta_hoje=0,
             insucesso_hoje=0,
             sem_status_hoje=0,
-            rastreios_contados=json.dumps([]),
             ultima_atualizacao=datetime.now()
         )
         db.session.add(cache)
@@ -608,46 +1046,18 @@ def forcar_recalculo_dashboard(hoje):
                 coleta_hoje=0,
                 insucesso_hoje=0,
                 sem_status_hoje=0,
-                rastreios_contados=json.dumps([]),
                 ultima_atualizacao=datetime.now()
             )
             db.session.add(cache)
             db.session.commit()
         
-        # Buscar mercadorias bipadas hoje
-        bipadas_hoje = MercadoriaConferida.query.filter_by(data_bipagem=hoje).all()
-        
-        # Recalcular tudo baseado nas mercadorias bipadas hoje
-        total_hoje = len(bipadas_hoje)
-        coleta_hoje = 0
-        insucesso_hoje = 0
-        sem_status_hoje = 0
-        transportadoras = {
-            'J&T': 0, 'JADLOG': 0, 'DIALOGO': 0, 'CORREIOS': 0, 'CORREIOS PA': 0,
-            'LOGAN': 0, 'FAVELA LOG': 0, 'SAC SERVICE': 0, 'DISSUDES': 0
-        }
-        
-        # Contar todas as mercadorias bipadas hoje
-        for mercadoria in bipadas_hoje:
-            # Contar por transportadora (se tiver transportadora definida)
-            if mercadoria.transportadora and mercadoria.transportadora.strip():
-                transportadora_nome = mercadoria.transportadora.strip()
-                if transportadora_nome in transportadoras:
-                    transportadoras[transportadora_nome] += 1
-            
-            # Verificar se está na base atual para determinar status
-            rastreio = RastreioEsperado.query.filter_by(codigo_rastreio=mercadoria.codigo_rastreio).first()
-            if rastreio:
-                # Se está na base, usar status atual
-                if rastreio.status == 'coleta':
-                    coleta_hoje += 1
-                elif rastreio.status == 'insucesso':
-                    insucesso_hoje += 1
-                else:
-                    sem_status_hoje += 1  # pendente, conferido, etc.
-            else:
-                # Se não está na base atual, contar como sem status
-                sem_status_hoje += 1
+        # Recalcular tudo com uma consulta agrupada (transportadora x status) das mercadorias bipadas hoje
+        contadores = calcular_contadores(hoje)
+        transportadoras = contadores['transportadoras']
+        total_hoje = contadores['total_hoje']
+        coleta_hoje = contadores['coleta_hoje']
+        insucesso_hoje = contadores['insucesso_hoje']
+        sem_status_hoje = contadores['sem_status_hoje']
         
         # Atualizar cache com dados recalculados
         cache.transportadoras = transportadoras
@@ -655,10 +1065,11 @@ def forcar_recalculo_dashboard(hoje):
         cache.coleta_hoje = coleta_hoje
         cache.insucesso_hoje = insucesso_hoje
         cache.sem_status_hoje = sem_status_hoje
-        cache.rastreios_contados = json.dumps([m.codigo_rastreio for m in bipadas_hoje])
+        redefinir_rastreios_contados(hoje)
         cache.ultima_atualizacao = datetime.now()
         
         db.session.commit()
+        publicar('dashboard', dados_dashboard(cache))
         
         return {
             'transportadoras': transportadoras,
@@ -678,62 +1089,12 @@ def recalcular_status_dashboard(hoje):
         cache = DashboardCache.query.filter_by(data=hoje).first()
         
         if cache:
-            # Buscar mercadorias bipadas hoje
-            bipadas_hoje = MercadoriaConferida.query.filter_by(data_bipagem=hoje).all()
-            
-            # Recalcular status baseado nas mercadorias atuais
-            coleta_hoje = 0
-            insucesso_hoje = 0
-            sem_status_hoje = 0
-            
-            for mercadoria in bipadas_hoje:
-                rastreio = RastreioEsperado.query.filter_by(codigo_rastreio=mercadoria.codigo_rastreio).first()
-                if rastreio:
-                    if rastreio.status == 'coleta':
-                        coleta_hoje += 1
-                    elif rastreio.status == 'insucesso':
-                        insucesso_hoje += 1
-                    else:
-                        sem_status_hoje += 1  # pendente, conferido, etc.
-                else:
-                    # Se não está na base atual, contar como sem status
-                    sem_status_hoje += 1
+            contadores = calcular_contadores(hoje)
             
             # Atualizar apenas os status, preservando outros contadores
-            cache.coleta_hoje = coleta_hoje
-            cache.insucesso_hoje = insucesso_hoje
-            cache.sem_status_hoje = sem_status_hoje
-            cache.ultima_atualizacao = datetime.now()
-            db.session.commit()
-            
-    except Exception as e:
-        db.session.rollback()
-        raise e
-
-def recalcular_transportadoras_dashboard(hoje):
-    """Recalcula apenas as transportadoras do dashboard preservando outros dados"""
-    try:
-        cache = DashboardCache.query.filter_by(data=hoje).first()
-        
-        if cache:
-            # Buscar mercadorias bipadas hoje
-            bipadas_hoje = MercadoriaConferida.query.filter_by(data_bipagem=hoje).all()
-            
-            # Recalcular transportadoras baseado nas mercadorias atuais
-            transportadoras = {
-                'J&T': 0, 'JADLOG': 0, 'DIALOGO': 0, 'CORREIOS': 0, 'CORREIOS PA': 0,
-                'LOGAN': 0, 'FAVELA LOG': 0, 'SAC SERVICE': 0, 'DISSUDES': 0
-            }
-            
-            for mercadoria in bipadas_hoje:
-                # Contar por transportadora (se tiver transportadora definida)
-                if mercadoria.transportadora and mercadoria.transportadora.strip():
-                    transportadora_nome = mercadoria.transportadora.strip()
-                    if transportadora_nome in transportadoras:
-                        transportadoras[transportadora_nome] += 1
-            
-            # Atualizar apenas as transportadoras, preservando outros contadores
-            cache.transportadoras = transportadoras
+            cache.coleta_hoje = contadores['coleta_hoje']
+            cache.insucesso_hoje = contadores['insucesso_hoje']
+            cache.sem_status_hoje = contadores['sem_status_hoje']
             cache.ultima_atualizacao = datetime.now()
             db.session.commit()
             
@@ -747,7 +1108,8 @@ def atualizar_dashboard():
     try:
         hoje = datetime.now().date()
         
-        # Forçar recálculo
+        # Forçar recálculo (com as bipagens do journal já gravadas)
+        journal_bipagens.drenar()
         resultado = forcar_recalculo_dashboard(hoje)
         
         return jsonify({
@@ -765,6 +1127,77 @@ def atualizar_dashboard():
     except Exception as e:
         return jsonify({'erro': f'Erro ao atualizar dashboard: {str(e)}'}), 500
 
+def ler_data(valor, padrao):
+    """Converte uma data YYYY-MM-DD da requisição - ValueError se inválida"""
+    if valor is None or not str(valor).strip():
+        return padrao
+    return date.fromisoformat(str(valor).strip())
+
+def ler_momento(valor, fim_do_dia=False):
+    """Converte um horário ISO da requisição (só a data = início ou fim do dia) - None se vazio, ValueError se inválido"""
+    if valor is None or not str(valor).strip():
+        return None
+    valor = str(valor).strip()
+    if len(valor) == 10:
+        return datetime.combine(date.fromisoformat(valor), time.max if fim_do_dia else time.min)
+    return datetime.fromisoformat(valor)
+
+@conferencia_bp.route("/dashboard/historico", methods=["GET"])
+def historico_dashboard():
+    """Histórico diário do dashboard no período (de/ate, padrão: últimos 30 dias) lido do resumo diário"""
+    try:
+        hoje = datetime.now().date()
+        try:
+            ate = ler_data(request.args.get('ate'), hoje)
+            de = ler_data(request.args.get('de'), ate - timedelta(days=29))
+        except ValueError:
+            return jsonify({'erro': 'Datas devem estar no formato AAAA-MM-DD'}), 400
+        if de > ate:
+            return jsonify({'erro': 'A data inicial (de) deve ser anterior ou igual à final (ate)'}), 400
+        
+        return jsonify(historico(de, ate, hoje))
+        
+    except Exception as e:
+        return jsonify({'erro': f'Erro ao obter histórico do dashboard: {str(e)}'}), 500
+
+@conferencia_bp.route("/dashboard/fechar-dia", methods=["POST"])
+def fechar_dia_dashboard():
+    """Congela os contadores de um dia já encerrado no resumo diário (sem data: todos os dias pendentes)"""
+    try:
+        hoje = datetime.now().date()
+        data = request.get_json(silent=True) or {}
+        try:
+            dia = ler_data(data.get('data'), None)
+        except ValueError:
+            return jsonify({'erro': 'Data deve estar no formato AAAA-MM-DD'}), 400
+        
+        journal_bipagens.drenar()
+        if dia is None:
+            dias = fechar_dias_pendentes(hoje)
+            return jsonify({
+                'mensagem': f'{len(dias)} dia(s) fechado(s) no resumo diário',
+                'dias': [dia.isoformat() for dia in dias]
+            })
+        
+        if dia >= hoje:
+            return jsonify({'erro': 'Só é possível fechar dias já encerrados'}), 400
+        
+        # Refaz o fechamento do dia com os dados atuais (substitui o resumo anterior),
+        # lendo também o arquivo mensal se as bipagens do dia já foram arquivadas
+        with bipagens_com_arquivo(dia, dia) as bipagens:
+            contadores = contadores_do_dia(dia, bipagens)
+        total = fechar_dia(dia, contadores)
+        db.session.commit()
+        return jsonify({
+            'mensagem': f'Dia {dia.isoformat()} fechado no resumo diário',
+            'dias': [dia.isoformat()],
+            'total': total
+        })
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'erro': f'Erro ao fechar dia: {str(e)}'}), 500
+        
 @conferencia_bp.route("/dashboard/incrementar", methods=["POST"])
 def incrementar_dashboard():
     """Incrementa os contadores do dashboard quando uma mercadoria é bipada"""
@@ -777,8 +1210,19 @@ def incrementar_dashboard():
         status = data['status'].strip()
         hoje = datetime.now().date()
         
-        # Forçar recálculo completo do dashboard
-        resultado = forcar_recalculo_dashboard(hoje)
+        # Somar 1 ao total, ao status e à transportadora informados (sem recalcular o dia)
+        obter_ou_criar_cache(hoje)
+        db.session.flush()
+        aplicar_delta_dashboard(
+            hoje,
+            total=1,
+            categorias={categoria_de(status): 1},
+            transportadoras={transportadora: 1}
+        )
+        db.session.commit()
+        
+        resultado = dados_dashboard(DashboardCache.query.filter_by(data=hoje).first())
+        publicar('dashboard', resultado)
         
         return jsonify({
             'mensagem': 'Dashboard atualizado com sucesso',
@@ -814,13 +1258,25 @@ def atualizar_status():
             return jsonify({'erro': 'Rastreio não encontrado'}), 404
         
         # Atualizar status
+        status_anterior = rastreio.status
         rastreio.status = status
+        indice_rastreios.registrar_status(codigo, status)
         db.session.commit()
+        publicar_status(codigo, status_anterior, status)
         
-        # Atualizar dashboard após mudança de status
+        # Mover as bipagens de hoje deste rastreio da categoria antiga para a nova
         try:
             hoje = datetime.now().date()
-            recalcular_status_dashboard(hoje)
+            anterior, nova = categoria_de(status_anterior), categoria_de(status)
+            if anterior != nova:
+                bipadas_hoje = db.session.execute(
+                    select(func.count())
+                    .select_from(MercadoriaConferida)
+                    .where(MercadoriaConferida.codigo_rastreio == codigo, MercadoriaConferida.data_bipagem == hoje)
+                ).scalar()
+                if bipadas_hoje and aplicar_delta_dashboard(hoje, categorias={anterior: -bipadas_hoje, nova: bipadas_hoje}):
+                    db.session.commit()
+                    publicar_dashboard(hoje)
         except Exception as dashboard_error:
             print(f"Erro ao atualizar dashboard após mudança de status: {dashboard_error}")
         
@@ -836,7 +1292,7 @@ def atualizar_status():
 
 @conferencia_bp.route("/exportar/excel", methods=["POST"])
 def exportar_excel():
-    """Exporta dados para Excel (CSV) - APENAS mercadorias que estão na base"""
+    """Exporta dados para Excel (CSV) - APENAS mercadorias que estão na base (de/ate opcionais incluem os arquivos mensais)"""
     try:
         data = request.get_json()
         if not data or 'transportadora' not in data:
@@ -846,65 +1302,79 @@ def exportar_excel():
         if not transportadora:
             return jsonify({'erro': 'Transportadora não pode estar vazia'}), 400
         
-        # Buscar APENAS mercadorias bipadas que estão na base
-        mercadorias_na_base = []
-        todas_mercadorias = MercadoriaConferida.query.all()
-        
-        for mercadoria in todas_mercadorias:
-            # Verificar se está na base
-            rastreio = RastreioEsperado.query.filter_by(codigo_rastreio=mercadoria.codigo_rastreio).first()
-            if rastreio:  # SÓ incluir se estiver na base
-                mercadorias_na_base.append(mercadoria)
+        # Sem período: bipagens da tabela viva. Com período: tabela viva + arquivos mensais (ATTACH)
+        fonte = lambda: nullcontext(MercadoriaConferida.__table__)
+        periodo = bool(data.get('de') or data.get('ate'))
+        if periodo:
+            try:
+                ate = ler_data(data.get('ate'), datetime.now().date())
+                de = ler_data(data.get('de'), ate)
+            except ValueError:
+                return jsonify({'erro': 'Datas devem estar no formato AAAA-MM-DD'}), 400
+            if de > ate:
+                return jsonify({'erro': 'A data inicial (de) deve ser anterior ou igual à final (ate)'}), 400
+            fonte = lambda: bipagens_com_arquivo(de, ate)
+        
+        def montar_consulta(bipagens):
+            """APENAS mercadorias bipadas que estão na base (INNER JOIN), na ordem de bipagem"""
+            # Ids de arquivos diferentes podem se repetir (reset): com período a ordem começa pela data
+            ordem = [bipagens.c.data_bipagem, bipagens.c.id] if periodo else [bipagens.c.id]
+            return (
+                select(
+                    bipagens.c.codigo_rastreio,
+                    bipagens.c.data_bipagem,
+                    bipagens.c.timestamp,
+                    RastreioEsperado.status
+                )
+                .select_from(bipagens)
+                .join(RastreioEsperado, bipagens.c.codigo_rastreio == RastreioEsperado.codigo_rastreio)
+                .order_by(*ordem)
+            )
         
-        if not mercadorias_na_base:
+        try:
+            with fonte() as bipagens:
+                existe = db.session.execute(select(montar_consulta(bipagens).exists())).scalar()
+        except ValueError as e:
+            return jsonify({'erro': str(e)}), 400
+        if not existe:
             return jsonify({'erro': 'Nenhuma mercadoria bipada na base para exportar'}), 400
         
-        # Criar arquivo CSV em memória
-        output = io.StringIO()
-        writer = csv.writer(output)
-        
-        # Cabeçalho
-        writer.writerow(['Código de Rastreio', 'Data Bipagem', 'Hora Bipagem', 'Transportadora', 'Status'])
+        filename = f"conferencia_nestle_{datetime.now().strftime('%Y%m%d')}_{transportadora.replace(' ', '_')}.csv"
         
-        # Dados (APENAS as que estão na base)
-        for mercadoria in mercadorias_na_base:
-            # Verificar status (já sabemos que está na base)
-            rastreio = RastreioEsperado.query.filter_by(codigo_rastreio=mercadoria.codigo_rastreio).first()
-            status = rastreio.status if rastreio else 'Pendente'
+        def gerar_csv():
+            """Gera o CSV em blocos, lendo a consulta em partições"""
+            output = io.StringIO()
+            writer = csv.writer(output)
             
-            # Formatar data e hora
-            data_bipagem = mercadoria.data_bipagem.strftime('%d/%m/%Y') if mercadoria.data_bipagem else 'N/A'
-            hora_bipagem = mercadoria.timestamp.strftime('%H:%M:%S') if mercadoria.timestamp else 'N/A'
+            # Cabeçalho, precedido do BOM UTF-8 para o Excel reconhecer a codificação
+            writer.writerow(['Código de Rastreio', 'Data Bipagem', 'Hora Bipagem', 'Transportadora', 'Status'])
+            yield codecs.BOM_UTF8 + output.getvalue().encode('utf-8')
             
-            writer.writerow([
-                mercadoria.codigo_rastreio,
-                data_bipagem,
-                hora_bipagem,
-                transportadora,
-                status
-            ])
-        
-        # Preparar arquivo para download
-        output.seek(0)
-        
-        # Criar arquivo temporário
-        filename = f"conferencia_nestle_{datetime.now().strftime('%Y%m%d')}_{transportadora.replace(' ', '_')}.csv"
-        
-        # Retornar arquivo CSV
-        csv_data = output.getvalue()
-        output.close()
-        
-        # Criar resposta com arquivo
-        from io import BytesIO
-        buffer = BytesIO()
-        buffer.write(csv_data.encode('utf-8-sig'))  # UTF-8 com BOM para Excel
-        buffer.seek(0)
-        
-        return send_file(
-            buffer,
-            as_attachment=True,
-            download_name=filename,
-            mimetype='text/csv'
+            with fonte() as bipagens:
+                resultado = db.session.execute(montar_consulta(bipagens).execution_options(yield_per=TAMANHO_BLOCO_EXPORTACAO))
+                try:
+                    for bloco in resultado.partitions():
+                        output.seek(0)
+                        output.truncate()
+                        
+                        for codigo, data_bipagem, timestamp, status in bloco:
+                            writer.writerow([
+                                codigo,
+                                data_bipagem.strftime('%d/%m/%Y') if data_bipagem else 'N/A',
+                                timestamp.strftime('%H:%M:%S') if timestamp else 'N/A',
+                                transportadora,
+                                status
+                            ])
+                        
+                        yield output.getvalue().encode('utf-8')
+                finally:
+                    # Cursor fechado antes de desanexar os arquivos
+                    resultado.close()
+        
+        return Response(
+            stream_with_context(gerar_csv()),
+            mimetype='text/csv',
+            headers={'Content-Disposition': f'attachment; filename="{filename}"'}
         )
         
     except Exception as e:
@@ -933,6 +1403,7 @@ def atualizar_transportadora():
         # Atualizar transportadora
         mercadoria.transportadora = transportadora
         db.session.commit()
+        publicar('transportadora', {'codigo': codigo, 'transportadora': transportadora})
         
         return jsonify({
             'mensagem': f'Transportadora atualizada para {transportadora}',
@@ -946,7 +1417,10 @@ def atualizar_transportadora():
 
 @conferencia_bp.route("/transportadora/atualizar-lote", methods=["POST"])
 def atualizar_transportadora_lote():
-    """Atualiza a transportadora de múltiplas mercadorias de uma vez - APENAS as que estão na base"""
+    """
+    Atualiza a transportadora das mercadorias sem transportadora - APENAS as que estão na base.
+    Opcionais: `codigos` (lista) e `de`/`ate` (horário da bipagem, AAAA-MM-DD ou AAAA-MM-DDTHH:MM:SS)
+    """
     try:
         data = request.get_json()
         if not data or 'transportadora' not in data:
@@ -956,46 +1430,69 @@ def atualizar_transportadora_lote():
         if not transportadora:
             return jsonify({'erro': 'Transportadora não pode estar vazia'}), 400
         
-        # Buscar mercadorias que não têm transportadora definida
-        mercadorias_sem_transportadora = MercadoriaConferida.query.filter(
-            (MercadoriaConferida.transportadora.is_(None)) | 
-            (MercadoriaConferida.transportadora == '') |
-            (MercadoriaConferida.transportadora == 'Não definida')
-        ).all()
-        
-        # Filtrar APENAS as que estão na base
-        mercadorias_na_base = []
-        for mercadoria in mercadorias_sem_transportadora:
-            rastreio = RastreioEsperado.query.filter_by(codigo_rastreio=mercadoria.codigo_rastreio).first()
-            if rastreio:  # SÓ incluir se estiver na base
-                mercadorias_na_base.append(mercadoria)
-        
-        if not mercadorias_na_base:
+        codigos = data.get('codigos')
+        if codigos is not None and not isinstance(codigos, list):
+            return jsonify({'erro': 'Códigos deve ser uma lista'}), 400
+        
+        try:
+            de = ler_momento(data.get('de'))
+            ate = ler_momento(data.get('ate'), fim_do_dia=True)
+        except ValueError:
+            return jsonify({'erro': 'Datas devem estar no formato AAAA-MM-DD ou AAAA-MM-DDTHH:MM:SS'}), 400
+        if de and ate and de > ate:
+            return jsonify({'erro': 'O início (de) deve ser anterior ou igual ao fim (ate)'}), 400
+        
+        filtros = [
+            MercadoriaConferida.transportadora.is_(None) | MercadoriaConferida.transportadora.in_(['', 'Não definida']),
+            # SÓ as que estão na base
+            select(RastreioEsperado.id).where(RastreioEsperado.codigo_rastreio == MercadoriaConferida.codigo_rastreio).exists()
+        ]
+        if de:
+            filtros.append(MercadoriaConferida.timestamp >= de)
+        if ate:
+            filtros.append(MercadoriaConferida.timestamp <= ate)
+        
+        if codigos is None:
+            lotes = [None]
+        else:
+            lotes = list(dividir_em_lotes(list(dict.fromkeys(c for c in map(normalizar_codigo, codigos) if c)), TAMANHO_LOTE))
+        
+        # As bipagens de hoje vão em um UPDATE separado: o rowcount dele é o que o card
+        # da transportadora no dashboard ganha, sem reler o dia
+        hoje = datetime.now().date()
+        atualizadas = atualizadas_hoje = 0
+        for lote in lotes:
+            filtros_lote = filtros if lote is None else filtros + [MercadoriaConferida.codigo_rastreio.in_(lote)]
+            for de_hoje, filtro_dia in ((True, MercadoriaConferida.data_bipagem == hoje),
+                                        (False, MercadoriaConferida.data_bipagem.is_distinct_from(hoje))):
+                quantidade = db.session.execute(
+                    update(MercadoriaConferida)
+                    .where(*filtros_lote, filtro_dia)
+                    .values(transportadora=transportadora)
+                    .execution_options(synchronize_session=False)
+                ).rowcount
+                atualizadas += quantidade
+                if de_hoje:
+                    atualizadas_hoje += quantidade
+        
+        if not atualizadas:
             return jsonify({
                 'mensagem': 'Todas as mercadorias na base já têm transportadora definida',
                 'atualizadas': 0,
-                'total_mercadorias': len(mercadorias_sem_transportadora),
-                'mercadorias_na_base': len(mercadorias_na_base)
+                'atualizadas_hoje': 0,
+                'transportadora': transportadora
             })
         
-        # Atualizar transportadora para todas as que estão na base
-        for mercadoria in mercadorias_na_base:
-            mercadoria.transportadora = transportadora
-        
+        dashboard_alterado = bool(atualizadas_hoje) and aplicar_delta_dashboard(hoje, transportadoras={transportadora: atualizadas_hoje})
         db.session.commit()
-        
-        # Atualizar dashboard após mudança de transportadora
-        try:
-            hoje = datetime.now().date()
-            recalcular_transportadoras_dashboard(hoje)
-        except Exception as dashboard_error:
-            print(f"Erro ao atualizar dashboard após mudança de transportadora: {dashboard_error}")
+        publicar('transportadora_lote', {'transportadora': transportadora, 'atualizadas': atualizadas})
+        if dashboard_alterado:
+            publicar_dashboard(hoje)
         
         return jsonify({
-            'mensagem': f'Transportadora atualizada para {len(mercadorias_na_base)} mercadorias na base',
-            'atualizadas': len(mercadorias_na_base),
-            'total_mercadorias_sem_transportadora': len(mercadorias_sem_transportadora),
-            'mercadorias_na_base_atualizadas': len(mercadorias_na_base),
+            'mensagem': f'Transportadora atualizada para {atualizadas} mercadorias na base',
+            'atualizadas': atualizadas,
+            'atualizadas_hoje': atualizadas_hoje,
             'transportadora': transportadora
         })
         
@@ -1021,9 +1518,15 @@ def excluir_rastreio():
         if not rastreio:
             return jsonify({'erro': 'Rastreio não encontrado na base'}), 404
         
-        # Excluir o rastreio
+        # Excluir o rastreio (as bipadas dele passam a contar como fora da base)
+        status = rastreio.status
+        bipadas = db.session.execute(
+            select(func.count()).select_from(MercadoriaConferida).where(MercadoriaConferida.codigo_rastreio == codigo)
+        ).scalar()
         db.session.delete(rastreio)
+        indice_rastreios.registrar_remocao(codigo)
         db.session.commit()
+        publicar('exclusao', {'tipo': 'rastreio', 'codigo': codigo, 'status': status, 'bipadas': bipadas})
         
         return jsonify({
             'mensagem': f'Rastreio {codigo} excluído com sucesso da base',
@@ -1046,7 +1549,8 @@ def excluir_mercadoria():
         if not codigo:
             return jsonify({'erro': 'Código de rastreio não pode estar vazio'}), 400
         
-        # Buscar mercadoria conferida
+        # Buscar mercadoria conferida (gravando antes a que ainda estiver no journal)
+        journal_bipagens.drenar()
         mercadoria = MercadoriaConferida.query.filter_by(codigo_rastreio=codigo).first()
         
         if not mercadoria:
@@ -1065,38 +1569,27 @@ def excluir_mercadoria():
                 status = 'insucesso'
         
         # Excluir a mercadoria
+        evento = {'tipo': 'mercadoria', 'codigo': codigo, 'status': rastreio.status if rastreio else None}
         db.session.delete(mercadoria)
+        indice_rastreios.registrar_exclusao_bipagem(codigo)
         db.session.commit()
+        publicar('exclusao', evento)
         
         # Decrementar dashboard após exclusão
         try:
             hoje = datetime.now().date()
-            cache = DashboardCache.query.filter_by(data=hoje).first()
-            
-            if cache:
-                # Decrementar contadores
-                if cache.total_hoje > 0:
-                    cache.total_hoje -= 1
-                
-                if transportadora in cache.transportadoras and cache.transportadoras[transportadora] > 0:
-                    cache.transportadoras[transportadora] -= 1
-                
-                if status == 'coleta' and cache.coleta_hoje > 0:
-                    cache.coleta_hoje -= 1
-                elif status == 'insucesso' and cache.insucesso_hoje > 0:
-                    cache.insucesso_hoje -= 1
-                elif cache.sem_status_hoje > 0:
-                    cache.sem_status_hoje -= 1
-                
-                # Remover da lista de rastreios contados
-                if cache.rastreios_contados:
-                    rastreios_contados = json.loads(cache.rastreios_contados)
-                    if codigo in rastreios_contados:
-                        rastreios_contados.remove(codigo)
-                        cache.rastreios_contados = json.dumps(rastreios_contados)
+            # Decrementar contadores (UPDATE atômico, sem ficar negativo)
+            if aplicar_delta_dashboard(
+                hoje,
+                total=-1,
+                categorias={status: -1},
+                transportadoras={transportadora: -1}
+            ):
+                # Remover do conjunto de rastreios contados
+                desmarcar_rastreio_contado(hoje, codigo)
                 
-                cache.ultima_atualizacao = datetime.now()
                 db.session.commit()
+                publicar_dashboard(hoje)
                 
         except Exception as dashboard_error:
             # Se houver erro no dashboard, não afetar a exclusão
@@ -0,0 +1,67 @@
+"""
+Servidor de produção: o app atendido pelo waitress (WSGI multi-thread), sem debugger nem reloader
+
+Uso (na pasta do projeto):
+    python -m src.serve [--host 0.0.0.0] [--porta 5000] [--threads 16] [--reservadas 6]
+                        [--conexoes 200] [--timeout 120]
+
+O app é criado uma única vez - migração, índice em memória, journal e fechamento
+diário - e atendido pelas threads do mesmo processo: o índice, o journal e o canal de
+eventos vivem na memória do processo, então o servidor não usa vários processos.
+As conexões HTTP/1.1 ficam abertas entre requisições (keep-alive) até `timeout`
+segundos ociosas.
+
+Cada tela com /api/eventos aberto ocupa uma thread enquanto está conectada. O canal
+aceita no máximo `threads - reservadas` telas ao mesmo tempo, então `reservadas` threads
+ficam sempre livres para as bipagens e demais requisições; as telas além do limite
+recebem 503 e passam à atualização periódica até conseguir uma vaga.
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from waitress import serve
+from src import config
+from src.main import create_app
+from src.services.eventos import limitar_assinantes
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Servidor de produção do sistema de conferência (waitress)')
+    parser.add_argument('--host', default=config.SERVIDOR_HOST)
+    parser.add_argument('--porta', type=int, default=config.SERVIDOR_PORTA)
+    parser.add_argument('--threads', type=int, default=config.SERVIDOR_THREADS,
+                        help='threads que atendem requisições (cada tela conectada em /api/eventos ocupa uma)')
+    parser.add_argument('--reservadas', type=int, default=config.SERVIDOR_THREADS_RESERVADAS,
+                        help='threads que /api/eventos não pode ocupar (ficam para as bipagens)')
+    parser.add_argument('--conexoes', type=int, default=config.SERVIDOR_CONEXOES,
+                        help='conexões simultâneas aceitas')
+    parser.add_argument('--timeout', type=int, default=config.SERVIDOR_TIMEOUT_S,
+                        help='segundos até fechar uma conexão ociosa (keep-alive) ou um cliente parado')
+    args = parser.parse_args()
+
+    if not 0 <= args.reservadas < args.threads:
+        parser.error('--reservadas deve ficar entre 0 e o número de threads - 1')
+
+    app = create_app()
+    telas = args.threads - args.reservadas
+    limitar_assinantes(telas)
+    print(f"Servidor de produção (waitress) em http://{args.host}:{args.porta} - "
+          f"{args.threads} threads (até {telas} telas em /api/eventos), até {args.conexoes} conexões, "
+          f"timeout de {args.timeout} s")
+    serve(
+        app,
+        host=args.host,
+        port=args.porta,
+        threads=args.threads,
+        connection_limit=args.conexoes,
+        channel_timeout=args.timeout,
+        ident='conferencia',
+    )
+
+
+if __name__ == '__main__':
+    main()
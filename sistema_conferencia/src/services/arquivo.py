@@ -0,0 +1,258 @@
+"""
+Arquivamento das bipagens antigas em arquivos SQLite mensais
+
+Com CONFERENCIA_RETENCAO_DIAS > 0 o fechamento diário move as bipagens anteriores à
+retenção de mercadorias_conferidas para um arquivo por mês (mercadorias_AAAA-MM.db em
+CONFERENCIA_ARQUIVO_PASTA), então a tabela viva - e tudo o que a percorre: bipagem,
+dashboard, listagens, carga do índice - fica do tamanho dos dias retidos.
+
+Só saem dias já congelados no resumo diário. Cada lote é copiado para o arquivo (com
+commit) e só é apagado da tabela viva depois de conferido que todas as suas linhas estão
+no arquivo: uma queda entre os dois passos deixa a cópia, que a próxima execução ignora
+(chave única id de origem + dia no arquivo) antes de repetir a remoção.
+
+As leituras de histórico (exportação por período, refazer o fechamento de um dia)
+anexam os arquivos dos meses envolvidos com ATTACH e consultam a tabela viva e os
+arquivos em uma única UNION ALL.
+"""
+
+import os
+import re
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from sqlalchemy import Column, Date, DateTime, Integer, MetaData, String, Table, UniqueConstraint, and_, delete, func, select, union_all
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from src import config
+from src.models.rastreio import db, MercadoriaConferida, RastreioContado, ResumoDiario
+from src.services.dashboard import dias_com_bipagens
+from src.services.indice import indice_rastreios
+
+# Bipagens movidas por transação (o lock de escrita fica preso só durante um lote)
+LOTE_ARQUIVAMENTO = 20_000
+
+# Limite padrão do SQLite para bancos anexados na mesma conexão
+MAX_ARQUIVOS_ANEXADOS = 10
+
+# Colunas de mercadorias_conferidas copiadas para o arquivo
+COLUNAS = ['id', 'codigo_rastreio', 'timestamp', 'transportadora', 'data_bipagem']
+
+PADRAO_ARQUIVO = re.compile(r'^mercadorias_(\d{4}-\d{2})\.db$')
+
+_lock = threading.Lock()  # um arquivamento por vez
+_ultimo_arquivamento = None
+
+
+def tabela_arquivo(esquema):
+    """Tabela de bipagens de um arquivo mensal anexado como `esquema`"""
+    return Table(
+        'mercadorias_conferidas', MetaData(schema=esquema),
+        Column('id_arquivo', Integer, primary_key=True),
+        Column('id', Integer, nullable=False),  # id original em mercadorias_conferidas
+        Column('codigo_rastreio', String(100), nullable=False),
+        Column('timestamp', DateTime),
+        Column('transportadora', String(50)),
+        Column('data_bipagem', Date, index=True),
+        # Repetir a cópia de um lote interrompido não duplica linhas. A chave é a linha de origem,
+        # não código + horário (a bipagem em lote grava o mesmo horário em repetições do código);
+        # o dia entra porque os ids recomeçam quando a tabela viva fica vazia (reset, arquivamento)
+        UniqueConstraint('id', 'data_bipagem', name='uq_arquivo_id_data')
+    )
+
+
+def mes_de(data):
+    return data.strftime('%Y-%m')
+
+
+def caminho_arquivo(mes):
+    return os.path.join(config.ARQUIVO_PASTA, f'mercadorias_{mes}.db')
+
+
+def esquema_arquivo(mes):
+    return 'arquivo_' + mes.replace('-', '_')
+
+
+def meses_do_periodo(de, ate):
+    """Meses (AAAA-MM) que cobrem o período [de, ate]"""
+    meses = []
+    atual = de.replace(day=1)
+    while atual <= ate:
+        meses.append(mes_de(atual))
+        atual = (atual + timedelta(days=32)).replace(day=1)
+    return meses
+
+
+def arquivos_existentes():
+    """Arquivos mensais presentes na pasta de arquivo: [(mes, caminho)] em ordem"""
+    if not os.path.isdir(config.ARQUIVO_PASTA):
+        return []
+    arquivos = []
+    for nome in sorted(os.listdir(config.ARQUIVO_PASTA)):
+        encontrado = PADRAO_ARQUIVO.match(nome)
+        if encontrado:
+            arquivos.append((encontrado.group(1), os.path.join(config.ARQUIVO_PASTA, nome)))
+    return arquivos
+
+
+def _anexar(conexao, mes):
+    conexao.exec_driver_sql(f"ATTACH DATABASE ? AS {esquema_arquivo(mes)}", (caminho_arquivo(mes),))
+
+
+def _desanexar(conexao, esquemas):
+    for esquema in esquemas:
+        try:
+            conexao.exec_driver_sql(f"DETACH DATABASE {esquema}")
+        except Exception as e:
+            # Conexão com arquivo ainda anexado não volta ao pool
+            print(f"Aviso: não foi possível desanexar {esquema} ({e}) - conexão descartada")
+            conexao.invalidate()
+            return
+
+
+@contextmanager
+def bipagens_com_arquivo(de, ate):
+    """
+    Anexa à conexão da sessão os arquivos mensais do período [de, ate] e devolve uma
+    subconsulta com as bipagens do período (tabela viva + arquivos) e as colunas de
+    mercadorias_conferidas. Só para leitura: o SQLite não anexa nem desanexa bancos no
+    meio de uma transação, então escritas ficam para depois do bloco.
+    ValueError se o período abrange mais arquivos do que o SQLite anexa de uma vez.
+    """
+    meses = [mes for mes in meses_do_periodo(de, ate) if os.path.exists(caminho_arquivo(mes))]
+    if len(meses) > MAX_ARQUIVOS_ANEXADOS:
+        raise ValueError(f'O período abrange {len(meses)} meses arquivados; o máximo por consulta é {MAX_ARQUIVOS_ANEXADOS}')
+
+    conexao = db.session.connection()
+    esquemas = []
+    try:
+        for mes in meses:
+            _anexar(conexao, mes)
+            esquemas.append(esquema_arquivo(mes))
+
+        partes = [
+            select(*[tabela.c[nome] for nome in COLUNAS])
+            .where(tabela.c.data_bipagem >= de, tabela.c.data_bipagem <= ate)
+            for tabela in [MercadoriaConferida.__table__] + [tabela_arquivo(esquema) for esquema in esquemas]
+        ]
+        yield (union_all(*partes) if len(partes) > 1 else partes[0]).subquery('bipagens')
+    finally:
+        _desanexar(conexao, esquemas)
+
+
+def _arquivar_mes(conexao, mes, dias):
+    """Move as bipagens dos `dias` (todos do mesmo mês) para o arquivo mensal - retorna a quantidade"""
+    esquema = esquema_arquivo(mes)
+    _anexar(conexao, mes)
+    try:
+        destino = tabela_arquivo(esquema)
+        destino.create(conexao, checkfirst=True)
+        conexao.commit()
+
+        origem = MercadoriaConferida.__table__
+        movidas = 0
+        for dia in dias:
+            ultimo_id = 0
+            while True:
+                lote = conexao.execute(
+                    select(origem.c.id, origem.c.codigo_rastreio)
+                    .where(origem.c.data_bipagem == dia, origem.c.id > ultimo_id)
+                    .order_by(origem.c.id)
+                    .limit(LOTE_ARQUIVAMENTO)
+                ).all()
+                if not lote:
+                    break
+                filtro = (origem.c.data_bipagem == dia, origem.c.id >= lote[0].id, origem.c.id <= lote[-1].id)
+
+                # Cópia no arquivo primeiro; a remoção da tabela viva só depois do commit da cópia
+                conexao.execute(
+                    sqlite_insert(destino)
+                    .from_select(COLUNAS, select(*[origem.c[nome] for nome in COLUNAS]).where(*filtro))
+                    .on_conflict_do_nothing(index_elements=['id', 'data_bipagem'])
+                )
+                conexao.commit()
+
+                # Só apaga o lote se cada linha tem a sua cópia no arquivo (mesmo id, dia e código):
+                # bipagem que a cópia não levou continua na tabela viva
+                copiadas = conexao.execute(
+                    select(func.count()).select_from(origem.join(destino, and_(
+                        destino.c.id == origem.c.id,
+                        destino.c.data_bipagem == origem.c.data_bipagem,
+                        destino.c.codigo_rastreio == origem.c.codigo_rastreio
+                    ))).where(*filtro)
+                ).scalar()
+                if copiadas != len(lote):
+                    raise RuntimeError(
+                        f'Arquivo {mes} tem {copiadas} de {len(lote)} bipagens do lote de {dia.isoformat()} '
+                        f'(ids {lote[0].id} a {lote[-1].id}) - lote mantido na tabela viva'
+                    )
+                conexao.execute(delete(origem).where(*filtro))
+                conexao.commit()
+
+                indice_rastreios.aplicar([('exclusao_bipagens', [linha.codigo_rastreio for linha in lote])])
+                movidas += len(lote)
+                ultimo_id = lote[-1].id
+        return movidas
+    finally:
+        _desanexar(conexao, [esquema])
+
+
+def arquivar_bipagens(hoje=None, retencao_dias=None):
+    """
+    Move para os arquivos mensais as bipagens anteriores à retenção (requer contexto do app).
+    Dias ainda sem resumo diário ficam na tabela viva. Retorna o resumo da execução.
+    """
+    global _ultimo_arquivamento
+    retencao = config.RETENCAO_DIAS if retencao_dias is None else retencao_dias
+    resultado = {'corte': None, 'linhas': 0, 'meses': {}, 'sem_resumo': []}
+    if retencao <= 0:
+        return resultado
+
+    hoje = hoje or datetime.now().date()
+    corte = hoje - timedelta(days=retencao - 1)
+    resultado['corte'] = corte.isoformat()
+
+    with _lock:
+        inicio = datetime.now()
+        dias = dias_com_bipagens(corte)
+        fechados = set(db.session.execute(
+            select(ResumoDiario.data).where(ResumoDiario.data < corte).distinct()
+        ).scalars())
+        resultado['sem_resumo'] = [dia.isoformat() for dia in dias if dia not in fechados]
+
+        por_mes = {}
+        for dia in dias:
+            if dia in fechados:
+                por_mes.setdefault(mes_de(dia), []).append(dia)
+        if not por_mes:
+            return resultado
+
+        os.makedirs(config.ARQUIVO_PASTA, exist_ok=True)
+        with db.engine.connect() as conexao:
+            for mes, dias_mes in por_mes.items():
+                resultado['meses'][mes] = _arquivar_mes(conexao, mes, dias_mes)
+                resultado['linhas'] += resultado['meses'][mes]
+
+            # O conjunto de contados de um dia só serve ao dashboard daquele dia
+            arquivados = [dia for dias_mes in por_mes.values() for dia in dias_mes]
+            conexao.execute(delete(RastreioContado.__table__).where(RastreioContado.data.in_(arquivados)))
+            conexao.commit()
+
+        resultado['duracao_ms'] = round((datetime.now() - inicio).total_seconds() * 1000, 1)
+        _ultimo_arquivamento = dict(resultado, executado_em=datetime.now().isoformat())
+        print(f"Arquivamento: {resultado['linhas']} bipagens anteriores a {corte.isoformat()} movidas para "
+              f"{len(por_mes)} arquivo(s) mensal(is) em {resultado['duracao_ms']} ms")
+    return resultado
+
+
+def situacao_arquivo():
+    """Retenção configurada, tamanho da tabela viva, arquivos mensais e o último arquivamento"""
+    return {
+        'retencao_dias': config.RETENCAO_DIAS,
+        'pasta': config.ARQUIVO_PASTA,
+        'linhas_tabela_viva': db.session.execute(select(func.count()).select_from(MercadoriaConferida)).scalar(),
+        'arquivos': [
+            {'mes': mes, 'arquivo': caminho, 'mb': round(os.path.getsize(caminho) / 1024 / 1024, 2)}
+            for mes, caminho in arquivos_existentes()
+        ],
+        'ultimo_arquivamento': _ultimo_arquivamento
+    }
@@ -0,0 +1,233 @@
+"""
+Funções auxiliares do cache do dashboard
+"""
+
+from datetime import date, datetime
+from sqlalchemy import case, delete, func, literal, select, text, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from src.models.rastreio import db, RastreioEsperado, MercadoriaConferida, RastreioContado, DashboardCache
+from src.services.importacao import TAMANHO_LOTE, dividir_em_lotes
+
+# Transportadoras exibidas no dashboard (ordem dos cards na tela)
+TRANSPORTADORAS = [
+    'J&T', 'JADLOG', 'DIALOGO', 'CORREIOS', 'CORREIOS PA',
+    'LOGAN', 'FAVELA LOG', 'SAC SERVICE', 'DISSUDES'
+]
+
+
+# Contador do cache correspondente a cada categoria de status
+CONTADOR_CATEGORIA = {
+    'coleta': 'coleta_hoje',
+    'insucesso': 'insucesso_hoje',
+    'sem_status': 'sem_status_hoje'
+}
+
+
+def transportadoras_zeradas():
+    """Retorna o dicionário de contadores por transportadora zerado"""
+    return {nome: 0 for nome in TRANSPORTADORAS}
+
+
+def categoria_status(coluna_status):
+    """Expressão SQL que agrupa o status da base em coleta / insucesso / sem_status"""
+    return case(
+        (coluna_status == 'coleta', 'coleta'),
+        (coluna_status == 'insucesso', 'insucesso'),
+        else_='sem_status'
+    )
+
+
+def categoria_de(status):
+    """Mesma regra de categoria_status para um valor em Python (None = fora da base)"""
+    return status if status in ['coleta', 'insucesso'] else 'sem_status'
+
+
+def calcular_contadores(data):
+    """
+    Contadores do dashboard da data em uma única consulta agrupada por
+    transportadora x categoria de status (LEFT JOIN com a base: fora da base = sem status)
+    """
+    transportadora = func.trim(MercadoriaConferida.transportadora)
+    categoria = categoria_status(RastreioEsperado.status)
+    linhas = db.session.execute(
+        select(transportadora, categoria, func.count())
+        .select_from(MercadoriaConferida)
+        .outerjoin(RastreioEsperado, MercadoriaConferida.codigo_rastreio == RastreioEsperado.codigo_rastreio)
+        .where(MercadoriaConferida.data_bipagem == data)
+        .group_by(transportadora, categoria)
+    ).all()
+
+    contadores = {
+        'transportadoras': transportadoras_zeradas(),
+        'total_hoje': 0,
+        'coleta_hoje': 0,
+        'insucesso_hoje': 0,
+        'sem_status_hoje': 0
+    }
+    for nome, categoria_linha, quantidade in linhas:
+        contadores['total_hoje'] += quantidade
+        contadores[CONTADOR_CATEGORIA[categoria_linha]] += quantidade
+        if nome in contadores['transportadoras']:
+            contadores['transportadoras'][nome] += quantidade
+    return contadores
+
+
+# Datas distintas de bipagem anteriores a :antes_de, saltando pelo índice de data_bipagem
+# (uma busca por dia em vez de percorrer todas as bipagens)
+SQL_DIAS_COM_BIPAGENS = text("""
+    WITH RECURSIVE dias(data) AS (
+        SELECT MIN(data_bipagem) FROM mercadorias_conferidas
+        UNION ALL
+        SELECT (SELECT MIN(data_bipagem) FROM mercadorias_conferidas WHERE data_bipagem > dias.data)
+        FROM dias WHERE dias.data < :antes_de
+    )
+    SELECT data FROM dias WHERE data IS NOT NULL AND data < :antes_de
+""")
+
+
+def dias_com_bipagens(antes_de):
+    """Datas (crescentes) com bipagens em mercadorias_conferidas anteriores a `antes_de`"""
+    return [
+        date.fromisoformat(str(valor)) for valor in
+        db.session.execute(SQL_DIAS_COM_BIPAGENS, {'antes_de': antes_de.isoformat()}).scalars()
+    ]
+
+
+def aplicar_delta_dashboard(data, total=0, categorias=None, transportadoras=None):
+    """
+    Soma deltas aos contadores do cache da data com um único UPDATE atômico
+    (nenhum contador fica negativo). `categorias` e `transportadoras` são dicts nome -> delta.
+    Retorna False se não existe cache para a data.
+    """
+    tabela = DashboardCache.__table__
+    valores = {'ultima_atualizacao': datetime.now()}
+
+    deltas = {'total_hoje': total}
+    for categoria, delta in (categorias or {}).items():
+        coluna = CONTADOR_CATEGORIA[categoria]
+        deltas[coluna] = deltas.get(coluna, 0) + delta
+    for coluna, delta in deltas.items():
+        if delta:
+            valores[coluna] = func.max(tabela.c[coluna] + delta, 0)
+
+    # Contadores por transportadora dentro do JSON, atualizados no próprio SQLite
+    json_transportadoras = tabela.c.transportadoras
+    for nome, delta in (transportadoras or {}).items():
+        nome = (nome or '').strip()
+        if delta and nome in TRANSPORTADORAS:
+            caminho = '$."' + nome + '"'
+            json_transportadoras = func.json_set(
+                json_transportadoras,
+                caminho,
+                func.max(func.coalesce(func.json_extract(tabela.c.transportadoras, caminho), 0) + delta, 0)
+            )
+    if json_transportadoras is not tabela.c.transportadoras:
+        valores['transportadoras'] = json_transportadoras
+
+    resultado = db.session.execute(update(tabela).where(tabela.c.data == data).values(**valores))
+    return resultado.rowcount > 0
+
+
+def obter_ou_criar_cache(data):
+    """Retorna o cache do dashboard da data, criando um zerado (sem commit) se não existir"""
+    cache = DashboardCache.query.filter_by(data=data).first()
+    if not cache:
+        cache = DashboardCache(
+            data=data,
+            transportadoras=transportadoras_zeradas(),
+            total_hoje=0,
+            coleta_hoje=0,
+            insucesso_hoje=0,
+            sem_status_hoje=0,
+            ultima_atualizacao=datetime.now()
+        )
+        db.session.add(cache)
+    return cache
+
+
+def dados_dashboard(cache):
+    """Contadores do cache no formato de /api/dashboard (sem cache_info)"""
+    return {
+        'transportadoras': cache.transportadoras,
+        'total_hoje': cache.total_hoje,
+        'coleta_hoje': cache.coleta_hoje,
+        'insucesso_hoje': cache.insucesso_hoje,
+        'sem_status_hoje': cache.sem_status_hoje
+    }
+
+
+def marcar_rastreio_contado(data, codigo):
+    """Registra o rastreio como contado no dashboard do dia - retorna False se já estava contado"""
+    tabela = RastreioContado.__table__
+    resultado = db.session.execute(
+        sqlite_insert(tabela)
+        .values(data=data, codigo_rastreio=codigo)
+        .on_conflict_do_nothing(index_elements=['data', 'codigo_rastreio'])
+    )
+    return resultado.rowcount == 1
+
+
+def marcar_rastreios_contados(data, codigos):
+    """Registra vários rastreios como contados no dia - retorna o conjunto dos que ainda não estavam contados"""
+    tabela = RastreioContado.__table__
+    codigos = list(dict.fromkeys(codigos))
+    if not codigos:
+        return set()
+
+    ja_contados = set()
+    for lote in dividir_em_lotes(codigos, TAMANHO_LOTE):
+        ja_contados.update(db.session.execute(
+            select(tabela.c.codigo_rastreio).where(
+                tabela.c.data == data,
+                tabela.c.codigo_rastreio.in_(lote)
+            )
+        ).scalars())
+
+    novos = [codigo for codigo in codigos if codigo not in ja_contados]
+    if novos:
+        db.session.execute(
+            sqlite_insert(tabela).on_conflict_do_nothing(index_elements=['data', 'codigo_rastreio']),
+            [{'data': data, 'codigo_rastreio': codigo} for codigo in novos]
+        )
+    return set(novos)
+
+
+def desmarcar_rastreio_contado(data, codigo):
+    """Remove o rastreio do conjunto de contados do dia - retorna True se estava contado"""
+    tabela = RastreioContado.__table__
+    resultado = db.session.execute(
+        delete(tabela).where(tabela.c.data == data, tabela.c.codigo_rastreio == codigo)
+    )
+    return resultado.rowcount > 0
+
+
+def limpar_rastreios_contados(data):
+    """Esvazia o conjunto de rastreios contados do dia"""
+    tabela = RastreioContado.__table__
+    db.session.execute(delete(tabela).where(tabela.c.data == data))
+
+
+def redefinir_rastreios_contados(data):
+    """
+    Iguala o conjunto de contados do dia às mercadorias bipadas na data: insere os que
+    faltam e remove os que não estão mais bipados, sem reescrever o conjunto inteiro
+    """
+    tabela = RastreioContado.__table__
+    bipados_na_data = (
+        select(MercadoriaConferida.codigo_rastreio)
+        .where(MercadoriaConferida.data_bipagem == data)
+    )
+    db.session.execute(
+        delete(tabela).where(
+            tabela.c.data == data,
+            tabela.c.codigo_rastreio.not_in(bipados_na_data)
+        )
+    )
+    db.session.execute(
+        sqlite_insert(tabela).from_select(
+            ['data', 'codigo_rastreio'],
+            select(literal(data, db.Date), MercadoriaConferida.codigo_rastreio)
+            .where(MercadoriaConferida.data_bipagem == data)
+            .distinct()
+        ).on_conflict_do_nothing(index_elements=['data', 'codigo_rastreio'])
+    )
@@ -0,0 +1,151 @@
+"""
+Arquivos estáticos da interface servidos da memória, com gzip pré-comprimido e ETag
+
+Na criação do app cada arquivo de src/static é lido uma vez, recebe um hash do conteúdo
+e, quando comprime bem, uma variante gzip. O index.html é reescrito para apontar para
+os nomes com hash (styles.<hash>.css, script.<hash>.js): esses nomes mudam junto com o
+conteúdo e vão com cache de um ano, enquanto o index.html e os nomes originais vão com
+`no-cache` e são revalidados pelo ETag (304 sem corpo quando nada mudou).
+
+Nenhuma requisição toca o disco. No servidor de desenvolvimento (debug) os arquivos são
+relidos quando algum deles muda.
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+from flask import current_app, request
+
+INDEX = 'index.html'
+
+# Hash do conteúdo nos nomes versionados (hex)
+TAMANHO_HASH = 12
+
+# Variante gzip só quando economiza ao menos 10%
+FATOR_COMPRESSAO_MINIMO = 0.9
+
+CACHE_VERSIONADO = 'public, max-age=31536000, immutable'
+CACHE_REVALIDAR = 'no-cache'
+
+
+class Arquivo:
+    def __init__(self, nome, conteudo, mimetype, cache_control, hash_conteudo):
+        self.nome = nome
+        self.conteudo = conteudo
+        self.mimetype = mimetype
+        self.cache_control = cache_control
+        # ETag forte por representação: a variante gzip tem a sua
+        self.etag = hash_conteudo
+        comprimido = gzip.compress(conteudo, compresslevel=9, mtime=0)
+        self.gzip = comprimido if len(comprimido) < len(conteudo) * FATOR_COMPRESSAO_MINIMO else None
+
+
+def _versionado(nome, hash_conteudo):
+    base, extensao = os.path.splitext(nome)
+    return f'{base}.{hash_conteudo[:TAMANHO_HASH]}{extensao}'
+
+
+def aceita_gzip(cabecalho):
+    """Accept-Encoding do cliente aceita gzip (q diferente de 0)"""
+    for item in cabecalho.split(','):
+        codificacao, _, parametros = item.strip().partition(';')
+        if codificacao.strip().lower() in ('gzip', '*'):
+            return parametros.replace(' ', '').lower() not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000')
+    return False
+
+
+def _etag_confere(cabecalho, etag):
+    """If-None-Match contém o ETag (comparação fraca, como a RFC 9110 pede para este cabeçalho)"""
+    if cabecalho.strip() == '*':
+        return True
+    return any(item.strip().removeprefix('W/') == f'"{etag}"' for item in cabecalho.split(','))
+
+
+class ArquivosEstaticos:
+    def __init__(self, pasta):
+        self.pasta = pasta
+        self._lock = threading.Lock()
+        self._arquivos = {}   # caminho pedido -> Arquivo
+        self._mtimes = {}
+        self.carregar()
+
+    def _listar(self):
+        caminhos = {}
+        for raiz, _, nomes in os.walk(self.pasta):
+            for nome in nomes:
+                completo = os.path.join(raiz, nome)
+                caminhos[os.path.relpath(completo, self.pasta).replace(os.sep, '/')] = completo
+        return caminhos
+
+    def carregar(self):
+        """Lê a pasta inteira e monta os nomes versionados e o index.html reescrito"""
+        caminhos = self._listar()
+        mtimes = {nome: os.path.getmtime(completo) for nome, completo in caminhos.items()}
+        conteudos = {}
+        for nome, completo in caminhos.items():
+            with open(completo, 'rb') as arquivo:
+                conteudos[nome] = arquivo.read()
+
+        arquivos = {}
+        versoes = {}
+        for nome, conteudo in conteudos.items():
+            if nome == INDEX:
+                continue
+            hash_conteudo = hashlib.sha256(conteudo).hexdigest()
+            mimetype = mimetypes.guess_type(nome)[0] or 'application/octet-stream'
+            versionado = _versionado(nome, hash_conteudo)
+            versoes[nome] = versionado
+            arquivos[versionado] = Arquivo(versionado, conteudo, mimetype, CACHE_VERSIONADO, hash_conteudo)
+            arquivos[nome] = Arquivo(nome, conteudo, mimetype, CACHE_REVALIDAR, hash_conteudo)
+
+        if INDEX in conteudos:
+            html = conteudos[INDEX].decode('utf-8')
+            for nome, versionado in versoes.items():
+                html = re.sub(
+                    r'((?:href|src)=["\'])(?:\./|/)?' + re.escape(nome) + r'(["\'])',
+                    lambda encontrado: encontrado.group(1) + versionado + encontrado.group(2),
+                    html
+                )
+            conteudo = html.encode('utf-8')
+            arquivos[INDEX] = Arquivo(INDEX, conteudo, 'text/html', CACHE_REVALIDAR, hashlib.sha256(conteudo).hexdigest())
+
+        with self._lock:
+            self._arquivos = arquivos
+            self._mtimes = mtimes
+
+    def _recarregar_se_alterado(self):
+        try:
+            caminhos = self._listar()
+            mtimes = {nome: os.path.getmtime(completo) for nome, completo in caminhos.items()}
+        except OSError:
+            return
+        if mtimes != self._mtimes:
+            self.carregar()
+
+    def responder(self, caminho):
+        """Resposta para o caminho pedido - caminhos desconhecidos recebem o index.html; None sem index.html"""
+        if current_app.debug:
+            self._recarregar_se_alterado()
+
+        arquivo = self._arquivos.get(caminho) or self._arquivos.get(INDEX)
+        if arquivo is None:
+            return None
+
+        usar_gzip = arquivo.gzip is not None and aceita_gzip(request.headers.get('Accept-Encoding', ''))
+        etag = f'{arquivo.etag}-gzip' if usar_gzip else arquivo.etag
+
+        if _etag_confere(request.headers.get('If-None-Match', ''), etag):
+            resposta = current_app.response_class(status=304)
+        else:
+            resposta = current_app.response_class(arquivo.gzip if usar_gzip else arquivo.conteudo, mimetype=arquivo.mimetype)
+            if usar_gzip:
+                resposta.headers['Content-Encoding'] = 'gzip'
+
+        resposta.headers['ETag'] = f'"{etag}"'
+        resposta.headers['Cache-Control'] = arquivo.cache_control
+        if arquivo.gzip is not None:
+            resposta.headers['Vary'] = 'Accept-Encoding'
+        return resposta
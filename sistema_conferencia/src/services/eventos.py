@@ -0,0 +1,130 @@
+"""
+Canal de eventos (Server-Sent Events) para as telas abertas
+
+As rotas de escrita publicam eventos pequenos com o que mudou (bipagem, status,
+transportadora, exclusão, contadores do dashboard) depois do commit; cada conexão
+em /api/eventos recebe os eventos por uma fila própria. Assim as telas não precisam
+consultar estatísticas e dashboard periodicamente.
+
+O canal vive na memória do processo: com vários processos de servidor cada um
+tem o seu, e as telas conectadas a um processo só recebem os eventos dele.
+
+Cada conexão aberta prende uma thread do servidor. O servidor de produção limita as
+conexões simultâneas (limitar_assinantes) abaixo do número de threads para que sempre
+sobrem threads para as bipagens; acima do limite /api/eventos responde 503 e a tela
+passa à atualização periódica.
+"""
+
+import json
+import queue
+import threading
+from collections import deque
+from datetime import datetime
+
+# Eventos guardados para reenviar a quem reconectar (cabeçalho Last-Event-ID)
+EVENTOS_GUARDADOS = 1000
+
+# Eventos pendentes por conexão - uma tela que não consome é desconectada e ressincroniza ao voltar
+MAX_EVENTOS_PENDENTES = 500
+
+# Intervalo do comentário de keep-alive enviado em conexões ociosas (segundos)
+INTERVALO_KEEPALIVE = 15
+
+_lock = threading.Lock()
+_assinantes = set()
+_max_assinantes = None  # None = sem limite (servidor de desenvolvimento, uma thread por requisição)
+_recentes = deque(maxlen=EVENTOS_GUARDADOS)
+_ultimo_id = 0
+
+
+class _Assinatura:
+    def __init__(self):
+        self.fila = queue.Queue(maxsize=MAX_EVENTOS_PENDENTES)
+        self.descartada = False
+
+
+def publicar(tipo, dados):
+    """Publica um evento para todas as conexões abertas - chamar depois do commit"""
+    global _ultimo_id
+    with _lock:
+        _ultimo_id += 1
+        evento = {'id': _ultimo_id, 'tipo': tipo, 'dados': dados, 'momento': datetime.now().isoformat()}
+        _recentes.append(evento)
+        for assinatura in list(_assinantes):
+            try:
+                assinatura.fila.put_nowait(evento)
+            except queue.Full:
+                assinatura.descartada = True
+                _assinantes.discard(assinatura)
+    return evento
+
+
+def limitar_assinantes(maximo):
+    """Define o máximo de conexões simultâneas do canal (None = sem limite)"""
+    global _max_assinantes
+    with _lock:
+        _max_assinantes = maximo
+
+
+def assinar(ultimo_id_recebido=None):
+    """
+    Abre uma assinatura. Retorna (assinatura, eventos_perdidos): eventos_perdidos é a
+    lista de eventos posteriores a `ultimo_id_recebido` ou None se não é possível
+    reenviá-los (já saíram do histórico) e a tela deve recarregar tudo.
+    Com o limite de conexões atingido retorna (None, None).
+    """
+    assinatura = _Assinatura()
+    with _lock:
+        if _max_assinantes is not None and len(_assinantes) >= _max_assinantes:
+            return None, None
+        perdidos = []
+        if ultimo_id_recebido is not None:
+            if ultimo_id_recebido > _ultimo_id:
+                # Servidor reiniciado: numeração recomeçou
+                perdidos = None
+            elif ultimo_id_recebido < _ultimo_id:
+                if not _recentes or _recentes[0]['id'] > ultimo_id_recebido + 1:
+                    perdidos = None
+                else:
+                    perdidos = [evento for evento in _recentes if evento['id'] > ultimo_id_recebido]
+        _assinantes.add(assinatura)
+    return assinatura, perdidos
+
+
+def cancelar(assinatura):
+    with _lock:
+        _assinantes.discard(assinatura)
+
+
+def total_assinantes():
+    with _lock:
+        return len(_assinantes)
+
+
+def formatar_evento(evento):
+    """Formata o evento no protocolo text/event-stream"""
+    dados = json.dumps(evento['dados'], ensure_ascii=False, separators=(',', ':'))
+    return f"id: {evento['id']}\nevent: {evento['tipo']}\ndata: {dados}\n\n"
+
+
+def fluxo_eventos(assinatura, perdidos):
+    """Gerador do corpo da resposta SSE de uma assinatura aberta por assinar()"""
+    try:
+        # Cliente reconecta sozinho após 3s se a conexão cair
+        yield "retry: 3000\n\n"
+        if perdidos is None:
+            yield formatar_evento({'id': _ultimo_id, 'tipo': 'recarregar', 'dados': {'motivo': 'reconexao'}})
+        else:
+            for evento in perdidos:
+                yield formatar_evento(evento)
+
+        while not assinatura.descartada:
+            try:
+                evento = assinatura.fila.get(timeout=INTERVALO_KEEPALIVE)
+            except queue.Empty:
+                # Comentário SSE: mantém proxies e o navegador com a conexão aberta
+                yield ": keep-alive\n\n"
+                continue
+            yield formatar_evento(evento)
+    finally:
+        cancelar(assinatura)
@@ -0,0 +1,271 @@
+"""
+Motor de importação em massa de códigos de rastreio
+"""
+
+import csv
+import io
+import itertools
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from datetime import datetime
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from src.models.rastreio import db, RastreioEsperado, MercadoriaConferida
+from src.services.eventos import publicar
+from src.services.indice import indice_rastreios
+
+# Quantidade de códigos por instrução (abaixo do limite antigo de 999 parâmetros do SQLite)
+TAMANHO_LOTE = 900
+
+# Quantas importações concluídas ficam disponíveis para consulta de progresso
+MAX_IMPORTACOES_GUARDADAS = 20
+
+# Progresso das importações por arquivo (id -> dict), compartilhado entre threads
+_importacoes = {}
+_importacoes_lock = threading.Lock()
+
+
+def normalizar_codigo(codigo):
+    """Normaliza um código de rastreio - retorna None se for inválido"""
+    if not codigo or not isinstance(codigo, str):
+        return None
+
+    codigo = codigo.strip().upper()
+    return codigo or None
+
+
+def dividir_em_lotes(itens, tamanho):
+    """Agrupa um iterável em listas de até `tamanho` itens, sem materializar tudo"""
+    lote = []
+    for item in itens:
+        lote.append(item)
+        if len(lote) >= tamanho:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def importar_codigos(codigos, tamanho_lote=TAMANHO_LOTE, commit_por_lote=False, ao_concluir_lote=None):
+    """
+    Importa códigos de rastreio com instruções set-based por lote.
+
+    Cada lote é deduplicado em memória, os já existentes são buscados com um único
+    SELECT ... IN e os novos são gravados com INSERT OR IGNORE (conflito no
+    codigo_rastreio único). Repetições entre lotes diferentes são detectadas pelo
+    SELECT do lote seguinte, então não é preciso guardar o arquivo inteiro em memória.
+
+    Retorna uma tupla (novos, duplicados). Entradas vazias ou inválidas são ignoradas,
+    como na importação original.
+    """
+    tabela = RastreioEsperado.__table__
+    inserir_ignorando = sqlite_insert(tabela).on_conflict_do_nothing(index_elements=['codigo_rastreio'])
+    agora = datetime.now()
+
+    novos = 0
+    duplicados = 0
+
+    for lote in dividir_em_lotes(codigos, tamanho_lote):
+        validos = [c for c in (normalizar_codigo(codigo) for codigo in lote) if c]
+        unicos = list(dict.fromkeys(validos))
+        duplicados += len(validos) - len(unicos)
+
+        if not unicos:
+            continue
+
+        existentes = set(db.session.execute(
+            select(tabela.c.codigo_rastreio).where(tabela.c.codigo_rastreio.in_(unicos))
+        ).scalars())
+        duplicados += len(existentes)
+
+        a_inserir = [
+            {'codigo_rastreio': codigo, 'status': 'pendente', 'timestamp': agora}
+            for codigo in unicos if codigo not in existentes
+        ]
+        if a_inserir:
+            resultado = db.session.execute(inserir_ignorando, a_inserir)
+            # Outro processo pode ter inserido o mesmo código entre o SELECT e o INSERT
+            inseridos = resultado.rowcount if resultado.rowcount >= 0 else len(a_inserir)
+            novos += inseridos
+            duplicados += len(a_inserir) - inseridos
+            # Ignorados por conflito também existem na base: o índice recebe todos
+            indice_rastreios.registrar_importados(r['codigo_rastreio'] for r in a_inserir)
+
+        if commit_por_lote:
+            db.session.commit()
+
+        if ao_concluir_lote:
+            ao_concluir_lote(len(lote), novos, duplicados)
+
+    return novos, duplicados
+
+
+def ler_codigos_arquivo(texto, coluna=None, cabecalho=False):
+    """
+    Gera os códigos de um arquivo texto, uma linha por vez.
+
+    Sem `coluna`, cada linha é um código (TXT). Com `coluna`, o arquivo é lido como CSV
+    (separador ';', ',' ou tabulação, detectado na primeira linha): um nome busca a coluna
+    no cabeçalho e um número seleciona a coluna pela posição (1 = primeira).
+    """
+    if coluna is None:
+        for linha in texto:
+            yield linha
+        return
+
+    primeira_linha = texto.readline()
+    if not primeira_linha:
+        return
+    delimitador = max([';', ',', '\t'], key=primeira_linha.count)
+
+    if str(coluna).isdigit():
+        indice = int(coluna) - 1
+        if indice < 0:
+            raise ValueError('A posição da coluna começa em 1')
+        origem = texto if cabecalho else itertools.chain([primeira_linha], texto)
+        linhas = csv.reader(origem, delimiter=delimitador)
+    else:
+        nomes = [nome.strip().lower() for nome in next(csv.reader([primeira_linha], delimiter=delimitador))]
+        if coluna.strip().lower() not in nomes:
+            raise ValueError(f'Coluna "{coluna}" não encontrada no cabeçalho do arquivo')
+        indice = nomes.index(coluna.strip().lower())
+        linhas = csv.reader(texto, delimiter=delimitador)
+
+    for campos in linhas:
+        if indice < len(campos):
+            yield campos[indice]
+
+
+def iniciar_importacao_arquivo(app, arquivo, nome_arquivo, coluna=None, cabecalho=False, limpar_base=False):
+    """
+    Copia o upload para um arquivo temporário em blocos e processa em segundo plano.
+
+    Retorna o estado inicial da importação; o progresso pode ser consultado depois com
+    obter_importacao(id).
+    """
+    temporario = tempfile.NamedTemporaryFile(prefix='importacao_', suffix='.txt', delete=False)
+    try:
+        shutil.copyfileobj(arquivo, temporario, 1024 * 1024)
+    finally:
+        temporario.close()
+
+    importacao_id = uuid.uuid4().hex
+    importacao = {
+        'id': importacao_id,
+        'arquivo': nome_arquivo,
+        'status': 'processando',
+        'bytes_total': os.path.getsize(temporario.name),
+        'bytes_lidos': 0,
+        'percentual': 0.0,
+        'linhas': 0,
+        'novos': 0,
+        'duplicados': 0,
+        'erro': None,
+        'iniciado_em': datetime.now().isoformat(),
+        'concluido_em': None
+    }
+
+    with _importacoes_lock:
+        _importacoes[importacao_id] = importacao
+        _descartar_importacoes_antigas()
+
+    thread = threading.Thread(
+        target=_processar_arquivo,
+        args=(app, importacao_id, temporario.name, coluna, cabecalho, limpar_base),
+        name=f'importacao-{importacao_id[:8]}',
+        daemon=True
+    )
+    thread.start()
+
+    return obter_importacao(importacao_id)
+
+
+def obter_importacao(importacao_id):
+    """Retorna uma cópia do progresso de uma importação (ou None se não existir)"""
+    with _importacoes_lock:
+        importacao = _importacoes.get(importacao_id)
+        return dict(importacao) if importacao else None
+
+
+def _atualizar_importacao(importacao_id, **campos):
+    with _importacoes_lock:
+        _importacoes[importacao_id].update(campos)
+
+
+def _descartar_importacoes_antigas():
+    finalizadas = [i for i in _importacoes.values() if i['status'] != 'processando']
+    excesso = len(_importacoes) - MAX_IMPORTACOES_GUARDADAS
+    for importacao in sorted(finalizadas, key=lambda i: i['iniciado_em'])[:max(excesso, 0)]:
+        del _importacoes[importacao['id']]
+
+
+def _processar_arquivo(app, importacao_id, caminho, coluna, cabecalho, limpar_base):
+    """Lê o arquivo linha a linha e importa com commit a cada lote"""
+    with app.app_context():
+        try:
+            with open(caminho, 'rb') as bruto:
+                texto = io.TextIOWrapper(bruto, encoding='utf-8-sig', errors='replace', newline='')
+                bytes_total = os.fstat(bruto.fileno()).st_size
+                linhas = 0
+
+                def ao_concluir_lote(quantidade, novos, duplicados):
+                    nonlocal linhas
+                    linhas += quantidade
+                    bytes_lidos = min(bruto.tell(), bytes_total)
+                    _atualizar_importacao(
+                        importacao_id,
+                        linhas=linhas,
+                        novos=novos,
+                        duplicados=duplicados,
+                        bytes_lidos=bytes_lidos,
+                        percentual=round(bytes_lidos / bytes_total * 100, 2) if bytes_total else 100.0
+                    )
+
+                # A limpeza é confirmada junto com o primeiro lote
+                if limpar_base:
+                    # Import local: resumo importa o journal, que importa este módulo
+                    from src.services.resumo import congelar_bipagens_apagadas
+                    congelar_bipagens_apagadas()
+                    db.session.query(RastreioEsperado).delete()
+                    db.session.query(MercadoriaConferida).delete()
+                    indice_rastreios.registrar_limpeza()
+
+                novos, duplicados = importar_codigos(
+                    ler_codigos_arquivo(texto, coluna, cabecalho),
+                    commit_por_lote=True,
+                    ao_concluir_lote=ao_concluir_lote
+                )
+                db.session.commit()
+
+            _atualizar_importacao(
+                importacao_id,
+                status='concluido',
+                novos=novos,
+                duplicados=duplicados,
+                bytes_lidos=bytes_total,
+                percentual=100.0,
+                concluido_em=datetime.now().isoformat()
+            )
+            print(f"Importação {importacao_id} concluída: {novos} novos, {duplicados} duplicados")
+
+        except Exception as e:
+            db.session.rollback()
+            _atualizar_importacao(
+                importacao_id,
+                status='erro',
+                erro=str(e),
+                concluido_em=datetime.now().isoformat()
+            )
+            print(f"Erro na importação {importacao_id}: {e}")
+
+        finally:
+            db.session.remove()
+            # Lotes já confirmados ficam na base mesmo em caso de erro: as telas recarregam nos dois casos
+            publicar('recarregar', {'motivo': 'importacao'})
+            try:
+                os.remove(caminho)
+            except OSError:
+                pass
@@ -0,0 +1,314 @@
+"""
+Índice em memória dos rastreios esperados (código -> status) e dos códigos já bipados
+
+A bipagem decide encontrado / não encontrado / já conferida consultando só este índice;
+o SQLite recebe apenas as escritas. As rotas registram as mudanças com os métodos
+registrar_* durante a transação e elas só chegam ao índice quando a sessão faz commit
+(um rollback as descarta), então o índice nunca mostra o que não foi gravado.
+
+O índice vive na memória do processo. Com vários processos escrevendo no mesmo banco
+ele fica desatualizado: nesse caso desative com CONFERENCIA_INDICE_MEMORIA=0 e as
+consultas voltam a ir ao banco.
+
+Na inicialização do servidor a carga pode correr em segundo plano
+(CONFERENCIA_INDICE_SEGUNDO_PLANO): enquanto ela não termina as consultas vão ao banco
+e os commits desse intervalo entram no diário reaplicado no fim da carga.
+"""
+
+import sys
+import threading
+from datetime import datetime
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+from src import config
+from src.models.rastreio import db, RastreioEsperado, MercadoriaConferida
+
+# Chave em session.info com as mudanças aguardando o commit
+CHAVE_PENDENTES = 'indice_rastreios_pendentes'
+
+# Linhas lidas por bloco na carga do índice
+TAMANHO_BLOCO_CARGA = 50_000
+
+# Exemplos de divergência devolvidos pela verificação de consistência
+MAX_AMOSTRAS_DIVERGENCIA = 20
+
+
+class IndiceRastreios:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._status = {}     # código -> status dos rastreios esperados
+        self._bipagens = {}   # código -> quantidade de mercadorias bipadas (inclui fora da base)
+        self._carregando = False
+        self._segundo_plano = False  # carga inicial em andamento em outra thread
+        self._diario = []     # mudanças confirmadas durante uma carga, reaplicadas no fim
+        self.banco = None     # URL do banco carregado - outro app/banco no mesmo processo força nova carga
+        self.carregado_em = None
+        self.duracao_carga_ms = None
+
+    @property
+    def carregado(self):
+        return self.carregado_em is not None
+
+    @property
+    def carregando_em_segundo_plano(self):
+        return self._segundo_plano
+
+    def carregar_em_segundo_plano(self, app):
+        """Inicia a carga em uma thread - até ela terminar, indice_ativo() responde False"""
+        self._segundo_plano = True
+
+        def carregar():
+            try:
+                with app.app_context():
+                    self.carregar()
+                    print(f"Índice de rastreios carregado em segundo plano: {len(self._status)} rastreios, "
+                          f"{len(self._bipagens)} códigos bipados em {self.duracao_carga_ms} ms")
+            except Exception as e:
+                print(f"Erro ao carregar o índice de rastreios (consultas continuam no banco): {e}")
+            finally:
+                self._segundo_plano = False
+
+        threading.Thread(target=carregar, name='indice-carga', daemon=True).start()
+
+    def carregar(self):
+        """Lê a base (requer contexto do app) e substitui o conteúdo do índice"""
+        inicio = datetime.now()
+        with self._lock:
+            self._carregando = True
+            self._diario = []
+        try:
+            status, bipagens = _ler_banco()
+            with self._lock:
+                self._status = status
+                self._bipagens = bipagens
+                self.banco = str(db.engine.url)
+                # Commits que aconteceram enquanto a base era lida
+                self._aplicar(self._diario)
+                self.carregado_em = datetime.now()
+                self.duracao_carga_ms = round((self.carregado_em - inicio).total_seconds() * 1000, 1)
+        finally:
+            with self._lock:
+                self._carregando = False
+                self._diario = []
+
+    def consultar(self, codigo):
+        """Retorna (status, ja_bipado) - status None = fora da base"""
+        with self._lock:
+            return self._status.get(codigo), codigo in self._bipagens
+
+    def aplicar(self, operacoes):
+        """Aplica mudanças já confirmadas no banco (chamado após o commit)"""
+        with self._lock:
+            if self._carregando:
+                self._diario.extend(operacoes)
+            if self.carregado:
+                self._aplicar(operacoes)
+
+    def _aplicar(self, operacoes):
+        for operacao, *argumentos in operacoes:
+            if operacao == 'status':
+                codigo, status = argumentos
+                self._status[codigo] = status
+            elif operacao == 'importados':
+                for codigo in argumentos[0]:
+                    self._status.setdefault(codigo, 'pendente')
+            elif operacao == 'remover':
+                self._status.pop(argumentos[0], None)
+            elif operacao == 'bipagem':
+                codigo = argumentos[0]
+                self._bipagens[codigo] = self._bipagens.get(codigo, 0) + 1
+            elif operacao in ('exclusao_bipagem', 'exclusao_bipagens'):
+                # Uma bipagem apagada (exclusão) ou várias (arquivamento) - o código sai quando não resta nenhuma
+                codigos = argumentos[0] if operacao == 'exclusao_bipagens' else argumentos
+                for codigo in codigos:
+                    restantes = self._bipagens.get(codigo, 0) - 1
+                    if restantes > 0:
+                        self._bipagens[codigo] = restantes
+                    else:
+                        self._bipagens.pop(codigo, None)
+            elif operacao == 'reverter_status':
+                # Mudança de status que não chegou a ser gravada - só desfeita se nada a alterou depois
+                codigo, status, anterior = argumentos
+                if self._status.get(codigo) == status:
+                    self._status[codigo] = anterior
+            elif operacao == 'limpar':
+                self._status.clear()
+                self._bipagens.clear()
+
+    # Mudanças da transação atual - aplicadas somente no commit
+
+    def _registrar(self, *operacao):
+        db.session.info.setdefault(CHAVE_PENDENTES, []).append(operacao)
+
+    def registrar_status(self, codigo, status):
+        self._registrar('status', codigo, status)
+
+    def registrar_importados(self, codigos):
+        self._registrar('importados', list(codigos))
+
+    def registrar_remocao(self, codigo):
+        self._registrar('remover', codigo)
+
+    def registrar_bipagem(self, codigo):
+        self._registrar('bipagem', codigo)
+
+    def registrar_exclusao_bipagem(self, codigo):
+        self._registrar('exclusao_bipagem', codigo)
+
+    def registrar_limpeza(self):
+        """Base e bipagens apagadas (reset ou importação com limpar_base)"""
+        self._registrar('limpar')
+
+    def memoria(self):
+        """Tamanho aproximado do índice em bytes (tabelas hash + strings dos códigos)"""
+        with self._lock:
+            tabelas = sys.getsizeof(self._status) + sys.getsizeof(self._bipagens)
+            codigos = sum(sys.getsizeof(codigo) for codigo in self._status)
+            codigos += sum(sys.getsizeof(codigo) for codigo in self._bipagens)
+            rastreios, bipados = len(self._status), len(self._bipagens)
+
+        total = tabelas + codigos
+        return {
+            'rastreios': rastreios,
+            'codigos_bipados': bipados,
+            'bytes_tabelas': tabelas,
+            'bytes_codigos': codigos,
+            'bytes_total': total,
+            'mb_total': round(total / (1024 * 1024), 2),
+            'bytes_por_rastreio': round(total / rastreios, 1) if rastreios else 0
+        }
+
+    def verificar(self):
+        """
+        Compara o índice com o banco (requer contexto do app). Escritas durante a
+        verificação podem aparecer como divergências momentâneas.
+        """
+        status_banco, bipagens_banco = _ler_banco()
+        with self._lock:
+            status_indice = dict(self._status)
+            bipagens_indice = dict(self._bipagens)
+
+        def amostra(codigos):
+            return sorted(codigos)[:MAX_AMOSTRAS_DIVERGENCIA]
+
+        ausentes = status_banco.keys() - status_indice.keys()
+        sobrando = status_indice.keys() - status_banco.keys()
+        status_divergente = {
+            codigo for codigo in status_banco.keys() & status_indice.keys()
+            if status_banco[codigo] != status_indice[codigo]
+        }
+        bipagens_divergentes = {
+            codigo for codigo in bipagens_banco.keys() | bipagens_indice.keys()
+            if bipagens_banco.get(codigo, 0) != bipagens_indice.get(codigo, 0)
+        }
+
+        return {
+            'consistente': not (ausentes or sobrando or status_divergente or bipagens_divergentes),
+            'rastreios_banco': len(status_banco),
+            'rastreios_indice': len(status_indice),
+            'ausentes_no_indice': len(ausentes),
+            'sobrando_no_indice': len(sobrando),
+            'status_divergente': len(status_divergente),
+            'bipagens_divergentes': len(bipagens_divergentes),
+            'exemplos': {
+                'ausentes_no_indice': amostra(ausentes),
+                'sobrando_no_indice': amostra(sobrando),
+                'status_divergente': amostra(status_divergente),
+                'bipagens_divergentes': amostra(bipagens_divergentes)
+            }
+        }
+
+
+def _ler_banco():
+    """Lê código -> status da base e código -> quantidade de bipagens"""
+    with db.engine.connect() as conexao:
+        # As duas leituras no mesmo snapshot: o driver do SQLite não abre transação para
+        # SELECT, e uma bipagem gravada entre elas seria contada também pelo diário da carga
+        if db.engine.dialect.name == 'sqlite':
+            conexao.exec_driver_sql('BEGIN')
+
+        status = {}
+        resultado = conexao.execute(
+            select(RastreioEsperado.codigo_rastreio, RastreioEsperado.status)
+            .execution_options(yield_per=TAMANHO_BLOCO_CARGA)
+        )
+        for bloco in resultado.partitions():
+            status.update(bloco)
+
+        bipagens = dict(conexao.execute(
+            select(MercadoriaConferida.codigo_rastreio, func.count())
+            .group_by(MercadoriaConferida.codigo_rastreio)
+        ).all())
+    return status, bipagens
+
+
+indice_rastreios = IndiceRastreios()
+
+
+def indice_ativo():
+    """
+    Garante o índice carregado - retorna False se ele está desativado na configuração ou
+    ainda carregando em segundo plano (as consultas vão ao banco)
+    """
+    if not config.INDICE_MEMORIA or indice_rastreios.carregando_em_segundo_plano:
+        return False
+    if not indice_rastreios.carregado or indice_rastreios.banco != str(db.engine.url):
+        indice_rastreios.carregar()
+    return True
+
+
+def consultar_rastreio(codigo):
+    """Retorna (status, ja_bipado) do código pelo índice, ou pelo banco se ele estiver desativado"""
+    if indice_ativo():
+        return indice_rastreios.consultar(codigo)
+
+    status = db.session.execute(
+        select(RastreioEsperado.status).where(RastreioEsperado.codigo_rastreio == codigo)
+    ).scalar()
+    ja_bipado = db.session.execute(
+        select(MercadoriaConferida.id).where(MercadoriaConferida.codigo_rastreio == codigo).limit(1)
+    ).first() is not None
+    return status, ja_bipado
+
+
+def consultar_rastreios(codigos):
+    """Versão em lote: retorna (status_por_codigo, codigos_ja_bipados) só com os códigos da base"""
+    if indice_ativo():
+        status_por_codigo = {}
+        bipados = set()
+        for codigo in codigos:
+            status, ja_bipado = indice_rastreios.consultar(codigo)
+            if status is not None:
+                status_por_codigo[codigo] = status
+                if ja_bipado:
+                    bipados.add(codigo)
+        return status_por_codigo, bipados
+
+    # Importação local: o motor de importação depende deste módulo
+    from src.services.importacao import TAMANHO_LOTE, dividir_em_lotes
+
+    status_por_codigo = {}
+    bipados = set()
+    for lote in dividir_em_lotes(list(codigos), TAMANHO_LOTE):
+        status_por_codigo.update(db.session.execute(
+            select(RastreioEsperado.codigo_rastreio, RastreioEsperado.status)
+            .where(RastreioEsperado.codigo_rastreio.in_(lote))
+        ).all())
+        bipados.update(db.session.execute(
+            select(MercadoriaConferida.codigo_rastreio)
+            .where(MercadoriaConferida.codigo_rastreio.in_([c for c in lote if c in status_por_codigo]))
+            .distinct()
+        ).scalars())
+    return status_por_codigo, bipados
+
+
+@event.listens_for(Session, 'after_commit')
+def _aplicar_pendentes(session):
+    operacoes = session.info.pop(CHAVE_PENDENTES, None)
+    if operacoes:
+        indice_rastreios.aplicar(operacoes)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _descartar_pendentes(session):
+    session.info.pop(CHAVE_PENDENTES, None)
@@ -0,0 +1,410 @@
+"""
+Journal de bipagens (write-behind): confirmação da bipagem sem esperar o SQLite
+
+Com CONFERENCIA_JOURNAL_BIPAGEM=1 a bipagem individual é validada no índice em memória,
+anexada a um arquivo append-only (uma linha JSON por bipagem) e confirmada assim que o
+fsync em grupo - feito a cada CONFERENCIA_JOURNAL_FSYNC_MS - garante a linha em disco.
+Uma thread grava as entradas confirmadas em mercadorias_conferidas, no status dos
+rastreios e no DashboardCache em transações grandes.
+
+Cada entrada tem um número de sequência; a mesma transação que grava um lote atualiza
+journal_bipagens_aplicado.ultimo_seq. Na inicialização as entradas do arquivo com
+sequência maior que a registrada são regravadas (replay idempotente) e o arquivo é
+esvaziado. Uma linha incompleta no fim do arquivo (queda durante a escrita) nunca foi
+confirmada à estação e é descartada.
+
+O modo depende do índice em memória (a bipagem ainda não gravada só existe nele) e,
+como ele, de um único processo de servidor.
+"""
+
+import itertools
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import update
+from src import config
+from src.models.rastreio import db, RastreioEsperado, MercadoriaConferida, DashboardCache, JournalAplicado
+from src.services.dashboard import categoria_de, marcar_rastreios_contados, obter_ou_criar_cache, aplicar_delta_dashboard, dados_dashboard
+from src.services.eventos import publicar
+from src.services.importacao import TAMANHO_LOTE, dividir_em_lotes
+from src.services.indice import indice_rastreios
+
+# Entradas gravadas no banco por transação
+LOTE_MAXIMO = 5000
+
+# Tempo máximo que uma bipagem espera pelo fsync antes de falhar (segundos)
+TIMEOUT_CONFIRMACAO = 5
+
+
+class JournalBipagens:
+    def __init__(self):
+        self._lock = threading.Condition()
+        self._io_lock = threading.Lock()    # arquivo: escrita/fsync x esvaziamento
+        self._gravacao_lock = threading.Lock()  # um lote gravado no banco por vez
+        self._parar = threading.Event()
+        self._threads = []
+        self._arquivo = None
+        self._app = None
+        self.caminho = None
+        self.iniciado = False
+
+        self._proximo_seq = 1
+        self._buffer = []             # linhas ainda não escritas no arquivo
+        self._ultimo_escrito = 0      # maior sequência no buffer
+        self._seq_duravel = 0         # maior sequência com fsync concluído
+        self._seq_no_arquivo = 0      # maior sequência entregue ao arquivo (fsync concluído ou em andamento)
+        self._descartadas = set()     # sequências cujo fsync falhou (nunca confirmadas)
+        self._seq_aplicado = 0        # maior sequência gravada no banco
+        self._aguardando_fsync = []   # entradas escritas mas ainda sem fsync
+        self._pendentes = []          # entradas confirmadas aguardando a gravação no banco
+        self._pendentes_por_codigo = {}  # código -> horário da bipagem ainda não gravada
+        self.falhas_gravacao = 0
+
+    # Inicialização e replay
+
+    def iniciar(self, app, caminho=None):
+        """Regrava o que ficou no journal, esvazia o arquivo e inicia as threads de fsync e gravação"""
+        if self.iniciado:
+            return
+        if not config.INDICE_MEMORIA:
+            print("Aviso: journal de bipagens requer o índice em memória (CONFERENCIA_INDICE_MEMORIA=1) - desativado")
+            return
+
+        self._app = app
+        self.caminho = caminho or config.JOURNAL_CAMINHO
+        self._parar.clear()
+
+        with app.app_context():
+            ultimo_seq = self._replay()
+
+        self._proximo_seq = ultimo_seq + 1
+        self._seq_duravel = self._seq_aplicado = self._ultimo_escrito = self._seq_no_arquivo = ultimo_seq
+        # Sem buffer do Python: uma falha de escrita não deixa bytes para um flush posterior
+        self._arquivo = open(self.caminho, 'ab', buffering=0)
+        self._threads = [
+            threading.Thread(target=self._laco_fsync, name='journal-fsync', daemon=True),
+            threading.Thread(target=self._laco_gravacao, name='journal-gravacao', daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        self.iniciado = True
+
+    def _replay(self):
+        """Aplica as entradas ainda não gravadas no banco - retorna a última sequência conhecida"""
+        controle = db.session.get(JournalAplicado, 1)
+        ultimo_aplicado = controle.ultimo_seq if controle else 0
+        ultimo_seq = ultimo_aplicado
+
+        entradas = []
+        if os.path.exists(self.caminho):
+            with open(self.caminho, 'rb') as arquivo:
+                for linha in arquivo:
+                    try:
+                        entrada = json.loads(linha)
+                    except ValueError:
+                        # Linha cortada por uma queda no meio da escrita: nunca foi confirmada
+                        continue
+                    ultimo_seq = max(ultimo_seq, entrada['seq'])
+                    if entrada['seq'] > ultimo_aplicado:
+                        entradas.append(entrada)
+
+        for lote in dividir_em_lotes(entradas, LOTE_MAXIMO):
+            gravar_entradas(lote, registrar_no_indice=True)
+        if entradas:
+            print(f"Journal de bipagens: {len(entradas)} bipagens regravadas no banco")
+
+        # Tudo está no banco: o arquivo pode recomeçar vazio
+        with open(self.caminho, 'wb') as arquivo:
+            os.fsync(arquivo.fileno())
+        return ultimo_seq
+
+    def parar(self):
+        """Para as threads depois de gravar no banco tudo o que foi confirmado"""
+        if not self.iniciado:
+            return
+        self._parar.set()
+        with self._lock:
+            self._lock.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._sincronizar()
+        with self._app.app_context():
+            while self._gravar_pendentes():
+                pass
+        self._arquivo.close()
+        self._arquivo = None
+        self.iniciado = False
+
+    # Bipagem
+
+    def registrar(self, codigo, agora, status_anterior, status, transportadora=None):
+        """
+        Anexa a bipagem ao journal e bloqueia até o fsync do grupo. `status_anterior` None = fora da base.
+
+        A bipagem entra no índice em memória já ao ser anexada, para que uma leitura
+        repetida do mesmo código durante o fsync seja vista como já conferida. Se ela não
+        for confirmada (tempo esgotado, journal parado ou falha do fsync), sai do índice e
+        do journal antes do erro: a nova tentativa da estação é tratada como primeira bipagem.
+        """
+        with self._lock:
+            seq = self._proximo_seq
+            self._proximo_seq += 1
+            entrada = {
+                'seq': seq,
+                'codigo': codigo,
+                'timestamp': agora.isoformat(),
+                'status_anterior': status_anterior,
+                'status': status,
+                'transportadora': transportadora
+            }
+            self._buffer.append(json.dumps(entrada, separators=(',', ':')).encode('utf-8') + b'\n')
+            self._aguardando_fsync.append(entrada)
+            self._pendentes_por_codigo[codigo] = entrada['timestamp']
+            self._ultimo_escrito = seq
+            operacoes = [('bipagem', codigo)]
+            if status != status_anterior:
+                operacoes.append(('status', codigo, status))
+            indice_rastreios.aplicar(operacoes)
+            self._lock.notify_all()
+
+            resolvida = lambda: self._seq_duravel >= seq or seq in self._descartadas
+            if not self._lock.wait_for(lambda: resolvida() or not self.iniciado, TIMEOUT_CONFIRMACAO) or not resolvida():
+                if self._retirar(entrada):
+                    raise TimeoutError('Journal de bipagens não confirmou a gravação em disco')
+                # Já entregue ao arquivo: o fsync em andamento decide se a bipagem vale
+                self._lock.wait_for(resolvida)
+            if seq in self._descartadas:
+                self._descartadas.discard(seq)
+                raise RuntimeError('Falha ao gravar o journal de bipagens em disco')
+        return seq
+
+    def _retirar(self, entrada):
+        """Tira do journal uma entrada que ainda não foi entregue ao arquivo - False se já foi (com o lock)"""
+        for posicao, aguardando in enumerate(self._aguardando_fsync):
+            if aguardando is entrada:
+                # _buffer e _aguardando_fsync andam juntos: a linha está na mesma posição
+                del self._aguardando_fsync[posicao]
+                del self._buffer[posicao]
+                self._ultimo_escrito = self._aguardando_fsync[-1]['seq'] if self._aguardando_fsync else self._seq_no_arquivo
+                self._desfazer([entrada])
+                return True
+        return False
+
+    def _desfazer(self, entradas):
+        """Retira do índice e das pendências bipagens que não chegaram ao disco (com o lock)"""
+        operacoes = []
+        for entrada in entradas:
+            codigo = entrada['codigo']
+            operacoes.append(('exclusao_bipagem', codigo))
+            if entrada['status'] != entrada['status_anterior']:
+                operacoes.append(('reverter_status', codigo, entrada['status'], entrada['status_anterior']))
+            if self._pendentes_por_codigo.get(codigo) == entrada['timestamp']:
+                # Outra bipagem do mesmo código ainda pendente (fora da base) continua valendo
+                restantes = [e['timestamp'] for e in itertools.chain(self._pendentes, self._aguardando_fsync) if e['codigo'] == codigo]
+                if restantes:
+                    self._pendentes_por_codigo[codigo] = restantes[-1]
+                else:
+                    del self._pendentes_por_codigo[codigo]
+        indice_rastreios.aplicar(operacoes)
+
+    def drenar(self):
+        """
+        Grava no banco agora tudo o que já foi confirmado (requer contexto do app) - usado
+        antes de operações que apagam ou recalculam a partir de mercadorias_conferidas
+        """
+        if not self.iniciado:
+            return
+        self._sincronizar()
+        while self._gravar_pendentes():
+            pass
+
+    def timestamp_pendente(self, codigo):
+        """Horário da bipagem do código que ainda não foi gravada no banco (ou None)"""
+        with self._lock:
+            return self._pendentes_por_codigo.get(codigo)
+
+    def situacao(self):
+        with self._lock:
+            return {
+                'ativo': self.iniciado,
+                'arquivo': self.caminho,
+                'ultimo_seq': self._proximo_seq - 1,
+                'seq_duravel': self._seq_duravel,
+                'seq_aplicado': self._seq_aplicado,
+                'pendentes': len(self._pendentes) + len(self._aguardando_fsync),
+                'falhas_gravacao': self.falhas_gravacao
+            }
+
+    # Threads
+
+    def _sincronizar(self):
+        """Escreve o buffer no arquivo, faz o fsync e confirma as bipagens do grupo"""
+        # O lock do arquivo cobre da retirada do buffer à confirmação: os grupos saem em ordem
+        with self._io_lock:
+            with self._lock:
+                linhas, self._buffer = self._buffer, []
+                confirmadas, self._aguardando_fsync = self._aguardando_fsync, []
+                if linhas:
+                    self._seq_no_arquivo = confirmadas[-1]['seq']
+            if not linhas:
+                return
+
+            descritor = self._arquivo.fileno()
+            tamanho = os.fstat(descritor).st_size
+            try:
+                dados = memoryview(b''.join(linhas))
+                while dados:
+                    dados = dados[self._arquivo.write(dados):]
+                os.fsync(descritor)
+            except OSError as e:
+                # Nenhuma bipagem do grupo foi confirmada: o arquivo volta ao tamanho anterior
+                # (o replay não pode regravá-las) e elas saem do índice
+                try:
+                    os.ftruncate(descritor, tamanho)
+                except OSError:
+                    pass
+                with self._lock:
+                    self._seq_no_arquivo = self._seq_duravel
+                    if not self._aguardando_fsync:
+                        self._ultimo_escrito = self._seq_duravel
+                    self._descartadas.update(entrada['seq'] for entrada in confirmadas)
+                    self._desfazer(confirmadas)
+                    self._lock.notify_all()
+                print(f"Erro ao gravar o journal de bipagens em disco ({len(confirmadas)} bipagens recusadas): {e}")
+                return
+
+            with self._lock:
+                self._seq_duravel = confirmadas[-1]['seq']
+                self._pendentes.extend(confirmadas)
+                self._lock.notify_all()
+
+    def _laco_fsync(self):
+        intervalo = max(config.JOURNAL_FSYNC_MS, 0) / 1000
+        while not self._parar.is_set():
+            with self._lock:
+                self._lock.wait_for(lambda: self._buffer or self._parar.is_set())
+            if self._parar.is_set():
+                break
+            # Espera o intervalo para juntar as bipagens que chegarem no mesmo fsync
+            if intervalo:
+                time.sleep(intervalo)
+            self._sincronizar()
+
+    def _laco_gravacao(self):
+        intervalo = max(config.JOURNAL_INTERVALO_GRAVACAO_MS, 1) / 1000
+        while not self._parar.wait(intervalo):
+            with self._app.app_context():
+                while self._gravar_pendentes():
+                    pass
+
+    def _gravar_pendentes(self):
+        """Grava um lote de entradas confirmadas - retorna True se ainda sobrou trabalho"""
+        with self._gravacao_lock:
+            with self._lock:
+                lote = self._pendentes[:LOTE_MAXIMO]
+            if not lote:
+                return False
+
+            try:
+                gravar_entradas(lote)
+            except Exception as e:
+                db.session.rollback()
+                self.falhas_gravacao += 1
+                print(f"Erro ao gravar bipagens do journal (nova tentativa no próximo ciclo): {e}")
+                return False
+
+            self._confirmar_gravacao(lote)
+
+        with self._lock:
+            vazio = not self._pendentes and not self._buffer and not self._aguardando_fsync
+        if vazio:
+            self._esvaziar_arquivo()
+        return len(lote) == LOTE_MAXIMO
+
+    def _confirmar_gravacao(self, lote):
+        with self._lock:
+            del self._pendentes[:len(lote)]
+            for entrada in lote:
+                if self._pendentes_por_codigo.get(entrada['codigo']) == entrada['timestamp']:
+                    del self._pendentes_por_codigo[entrada['codigo']]
+            self._seq_aplicado = lote[-1]['seq']
+
+    def _esvaziar_arquivo(self):
+        """Trunca o journal quando tudo o que está nele já foi gravado no banco"""
+        with self._io_lock:
+            with self._lock:
+                if self._seq_aplicado != self._ultimo_escrito or self._buffer:
+                    return
+            self._arquivo.truncate(0)
+
+
+def gravar_entradas(entradas, registrar_no_indice=False):
+    """
+    Grava um lote de entradas do journal em uma transação: mercadorias bipadas, status
+    pendente -> conferido, contadores do dashboard e a sequência aplicada (requer contexto do app)
+    """
+    novas_mercadorias = []
+    conferidos = []
+    for entrada in entradas:
+        timestamp = datetime.fromisoformat(entrada['timestamp'])
+        novas_mercadorias.append({
+            'codigo_rastreio': entrada['codigo'],
+            'timestamp': timestamp,
+            'data_bipagem': timestamp.date(),
+            # Entradas gravadas antes da detecção automática não têm o campo
+            'transportadora': entrada.get('transportadora')
+        })
+        if entrada['status_anterior'] == 'pendente':
+            conferidos.append(entrada['codigo'])
+        if registrar_no_indice:
+            indice_rastreios.registrar_bipagem(entrada['codigo'])
+            if entrada['status'] != entrada['status_anterior']:
+                indice_rastreios.registrar_status(entrada['codigo'], entrada['status'])
+
+    db.session.execute(MercadoriaConferida.__table__.insert(), novas_mercadorias)
+    for lote in dividir_em_lotes(conferidos, TAMANHO_LOTE):
+        db.session.execute(
+            update(RastreioEsperado)
+            .where(RastreioEsperado.codigo_rastreio.in_(lote), RastreioEsperado.status == 'pendente')
+            .values(status='conferido')
+        )
+
+    # Dashboard: cada rastreio conta uma vez por dia, na categoria do status no momento da bipagem
+    status_por_data = {}
+    transportadora_por_codigo = {}
+    for entrada, mercadoria in zip(entradas, novas_mercadorias):
+        status_por_data.setdefault(mercadoria['data_bipagem'], {})[entrada['codigo']] = entrada['status']
+        transportadora_por_codigo.setdefault(entrada['codigo'], mercadoria['transportadora'])
+    datas_alteradas = []
+    for data, status_por_codigo in status_por_data.items():
+        contados = marcar_rastreios_contados(data, list(status_por_codigo))
+        if not contados:
+            continue
+        categorias = {}
+        transportadoras = {}
+        for codigo in contados:
+            categoria = categoria_de(status_por_codigo[codigo])
+            categorias[categoria] = categorias.get(categoria, 0) + 1
+            transportadora = transportadora_por_codigo[codigo]
+            transportadoras[transportadora] = transportadoras.get(transportadora, 0) + 1
+        obter_ou_criar_cache(data)
+        db.session.flush()
+        aplicar_delta_dashboard(data, total=len(contados), categorias=categorias, transportadoras=transportadoras)
+        datas_alteradas.append(data)
+
+    controle = db.session.get(JournalAplicado, 1)
+    if controle is None:
+        controle = JournalAplicado(id=1, ultimo_seq=0)
+        db.session.add(controle)
+    controle.ultimo_seq = max(controle.ultimo_seq, entradas[-1]['seq'])
+    controle.atualizado_em = datetime.now()
+    db.session.commit()
+
+    hoje = datetime.now().date()
+    if hoje in datas_alteradas:
+        publicar('dashboard', dados_dashboard(DashboardCache.query.filter_by(data=hoje).first()))
+
+
+journal_bipagens = JournalBipagens()
@@ -0,0 +1,198 @@
+"""
+Métricas por endpoint: latência, instruções SQL e tempo de banco de cada requisição
+
+Listeners do engine contam as instruções e somam o tempo gasto no SQLite durante a
+requisição; hooks do Flask medem a latência e registram tudo por endpoint (regra da
+URL, não a URL concreta) em histogramas expostos em /api/metrics no formato texto do
+Prometheus. Cada resposta também recebe os cabeçalhos Server-Timing e X-Query-Count,
+visíveis nas ferramentas de desenvolvedor do navegador.
+
+Como o canal de eventos, os contadores vivem na memória do processo.
+"""
+
+import threading
+import time
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from src import config
+from src.models.rastreio import db
+
+# Limites dos histogramas (segundos e quantidade de instruções)
+LIMITES_DURACAO = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+LIMITES_CONSULTAS = [1, 2, 3, 5, 10, 20, 50, 100, 500, 1000]
+
+# Endpoint atribuído às instruções executadas fora de requisições (importação em segundo plano etc.)
+ENDPOINT_SEGUNDO_PLANO = '(segundo plano)'
+
+
+class Histograma:
+    def __init__(self, limites):
+        self.limites = limites
+        self.contagens = [0] * len(limites)
+        self.soma = 0
+        self.total = 0
+
+    def observar(self, valor):
+        for posicao, limite in enumerate(self.limites):
+            if valor <= limite:
+                self.contagens[posicao] += 1
+                break
+        self.soma += valor
+        self.total += 1
+
+
+_lock = threading.Lock()
+_requisicoes = {}        # (endpoint, método, status) -> quantidade
+_duracoes = {}           # (endpoint, método) -> Histograma da latência
+_consultas = {}          # (endpoint, método) -> Histograma de instruções SQL por requisição
+_tempo_banco = {}        # (endpoint, método) -> segundos no banco
+_segundo_plano = {'consultas': 0, 'segundos': 0.0}
+
+
+class _Medicao:
+    """Acumulado da requisição atual, guardado em flask.g"""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.consultas = 0
+        self.tempo_banco = 0.0
+        self.status = None
+        self.registrar = True
+
+
+def registrar_requisicao(endpoint, metodo, status, duracao, consultas, tempo_banco):
+    chave = (endpoint, metodo)
+    with _lock:
+        _requisicoes[(endpoint, metodo, status)] = _requisicoes.get((endpoint, metodo, status), 0) + 1
+        _duracoes.setdefault(chave, Histograma(LIMITES_DURACAO)).observar(duracao)
+        _consultas.setdefault(chave, Histograma(LIMITES_CONSULTAS)).observar(consultas)
+        _tempo_banco[chave] = _tempo_banco.get(chave, 0.0) + tempo_banco
+
+
+def _antes_da_instrucao(conn, cursor, statement, parameters, context, executemany):
+    conn.info['inicio_instrucao'] = time.perf_counter()
+
+
+def _depois_da_instrucao(conn, cursor, statement, parameters, context, executemany):
+    inicio = conn.info.pop('inicio_instrucao', None)
+    duracao = time.perf_counter() - inicio if inicio is not None else 0.0
+
+    medicao = g.get('medicao') if has_request_context() else None
+    if medicao is not None:
+        medicao.consultas += 1
+        medicao.tempo_banco += duracao
+    else:
+        with _lock:
+            _segundo_plano['consultas'] += 1
+            _segundo_plano['segundos'] += duracao
+
+
+def _iniciar_medicao():
+    g.medicao = _Medicao()
+
+
+def _adicionar_cabecalhos(response):
+    medicao = g.get('medicao')
+    if medicao is None:
+        return response
+
+    medicao.status = response.status_code
+    # Conexões SSE ficam abertas indefinidamente - não entram nos histogramas
+    if response.mimetype == 'text/event-stream':
+        medicao.registrar = False
+
+    # Em respostas em streaming (exportação) os valores cobrem só o que rodou até aqui
+    total_ms = (time.perf_counter() - medicao.inicio) * 1000
+    response.headers['X-Query-Count'] = str(medicao.consultas)
+    response.headers['Server-Timing'] = (
+        f'db;dur={medicao.tempo_banco * 1000:.2f};desc="{medicao.consultas} consultas SQL", '
+        f'total;dur={total_ms:.2f}'
+    )
+    return response
+
+
+def _finalizar_medicao(exception=None):
+    # Roda quando o contexto da requisição termina: depois do fim do streaming, se houver
+    medicao = g.pop('medicao', None)
+    if medicao is None or not medicao.registrar:
+        return
+
+    endpoint = request.url_rule.rule if request.url_rule else '(sem rota)'
+    status = medicao.status if medicao.status is not None else 500
+    registrar_requisicao(
+        endpoint, request.method, status,
+        time.perf_counter() - medicao.inicio, medicao.consultas, medicao.tempo_banco
+    )
+
+
+def configurar_metricas(app):
+    """Registra os hooks de requisição e os listeners do engine do app (se as métricas estão ativas)"""
+    if not config.METRICAS:
+        return
+
+    app.before_request(_iniciar_medicao)
+    app.after_request(_adicionar_cabecalhos)
+    app.teardown_request(_finalizar_medicao)
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', _antes_da_instrucao)
+        event.listen(db.engine, 'after_cursor_execute', _depois_da_instrucao)
+
+
+def _rotulos(**valores):
+    def escapar(valor):
+        return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{nome}="{escapar(valor)}"' for nome, valor in valores.items()) + '}'
+
+
+def _linhas_histograma(nome, histogramas):
+    linhas = []
+    for (endpoint, metodo), histograma in sorted(histogramas.items()):
+        acumulado = 0
+        for limite, contagem in zip(histograma.limites, histograma.contagens):
+            acumulado += contagem
+            linhas.append(f"{nome}_bucket{_rotulos(endpoint=endpoint, metodo=metodo, le=limite)} {acumulado}")
+        linhas.append(f"{nome}_bucket{_rotulos(endpoint=endpoint, metodo=metodo, le='+Inf')} {histograma.total}")
+        linhas.append(f"{nome}_sum{_rotulos(endpoint=endpoint, metodo=metodo)} {histograma.soma}")
+        linhas.append(f"{nome}_count{_rotulos(endpoint=endpoint, metodo=metodo)} {histograma.total}")
+    return linhas
+
+
+def texto_prometheus():
+    """Métricas no formato de exposição texto do Prometheus (versão 0.0.4)"""
+    with _lock:
+        linhas = [
+            '# HELP conferencia_http_requisicoes_total Requisições atendidas por endpoint, método e status.',
+            '# TYPE conferencia_http_requisicoes_total counter',
+        ]
+        for (endpoint, metodo, status), quantidade in sorted(_requisicoes.items()):
+            linhas.append(f"conferencia_http_requisicoes_total{_rotulos(endpoint=endpoint, metodo=metodo, status=status)} {quantidade}")
+
+        linhas += [
+            '# HELP conferencia_http_duracao_segundos Latência das requisições por endpoint.',
+            '# TYPE conferencia_http_duracao_segundos histogram',
+        ]
+        linhas += _linhas_histograma('conferencia_http_duracao_segundos', _duracoes)
+
+        linhas += [
+            '# HELP conferencia_sql_instrucoes_por_requisicao Instruções SQL executadas por requisição.',
+            '# TYPE conferencia_sql_instrucoes_por_requisicao histogram',
+        ]
+        linhas += _linhas_histograma('conferencia_sql_instrucoes_por_requisicao', _consultas)
+
+        linhas += [
+            '# HELP conferencia_sql_duracao_segundos_total Tempo gasto no banco por endpoint.',
+            '# TYPE conferencia_sql_duracao_segundos_total counter',
+        ]
+        for (endpoint, metodo), segundos in sorted(_tempo_banco.items()):
+            linhas.append(f"conferencia_sql_duracao_segundos_total{_rotulos(endpoint=endpoint, metodo=metodo)} {segundos}")
+        linhas.append(f"conferencia_sql_duracao_segundos_total{_rotulos(endpoint=ENDPOINT_SEGUNDO_PLANO, metodo='')} "
+                      f"{_segundo_plano['segundos']}")
+
+        linhas += [
+            '# HELP conferencia_sql_instrucoes_segundo_plano_total Instruções SQL executadas fora de requisições.',
+            '# TYPE conferencia_sql_instrucoes_segundo_plano_total counter',
+            f"conferencia_sql_instrucoes_segundo_plano_total {_segundo_plano['consultas']}",
+        ]
+
+    return '\n'.join(linhas) + '\n'
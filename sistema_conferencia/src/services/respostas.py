@@ -0,0 +1,117 @@
+"""
+Camada de resposta da API: codificador JSON plugável e gzip acima de um tamanho mínimo
+
+O app troca o provedor JSON do Flask por ProvedorJson, então todo jsonify serializa com
+o codificador de CONFERENCIA_JSON_CODIFICADOR: 'orjson' (padrão, dependência opcional:
+pip install orjson) ou 'stdlib' (json da biblioteca padrão, usado também quando o orjson
+não está instalado). Os dois produzem o mesmo JSON - compacto, UTF-8 sem escapes, chaves
+na ordem de inserção e datas/horários em ISO 8601 - então as rotas podem devolver date
+e datetime direto, sem isoformat() por linha.
+
+Respostas JSON (e texto) a partir de CONFERENCIA_GZIP_MINIMO_BYTES vão com gzip quando o
+cliente envia Accept-Encoding: gzip. Respostas em streaming (exportação, eventos) e as
+que já têm Content-Encoding (arquivos estáticos) passam intactas.
+"""
+
+import gzip
+import json
+from datetime import date, datetime, time
+from flask import request
+from flask.json.provider import DefaultJSONProvider, _default as padrao_flask
+from src import config
+from src.services.estaticos import aceita_gzip
+
+try:
+    import orjson
+except ImportError:  # opcional: sem ele as respostas usam o json da biblioteca padrão
+    orjson = None
+
+TIPOS_COMPRIMIVEIS = {'application/json', 'text/plain', 'text/csv'}
+
+
+def _padrao(objeto):
+    """Tipos fora do JSON: datas em ISO 8601 (como o orjson), o resto como o Flask"""
+    if isinstance(objeto, (date, datetime, time)):
+        return objeto.isoformat()
+    return padrao_flask(objeto)
+
+
+def codificar_stdlib(objeto, indentar=False):
+    if indentar:
+        texto = json.dumps(objeto, default=_padrao, ensure_ascii=False, indent=2)
+    else:
+        texto = json.dumps(objeto, default=_padrao, ensure_ascii=False, separators=(',', ':'))
+    return texto.encode('utf-8')
+
+
+def codificar_orjson(objeto, indentar=False):
+    opcoes = orjson.OPT_NON_STR_KEYS
+    if indentar:
+        opcoes |= orjson.OPT_INDENT_2
+    return orjson.dumps(objeto, default=_padrao, option=opcoes)
+
+
+# Codificadores disponíveis: nome -> função (objeto, indentar) -> bytes UTF-8
+CODIFICADORES = {'stdlib': codificar_stdlib}
+if orjson is not None:
+    CODIFICADORES['orjson'] = codificar_orjson
+
+
+def registrar_codificador(nome, funcao):
+    """Disponibiliza outro codificador para CONFERENCIA_JSON_CODIFICADOR"""
+    CODIFICADORES[nome] = funcao
+
+
+def escolher_codificador(nome):
+    if nome in CODIFICADORES:
+        return CODIFICADORES[nome]
+    print(f"Aviso: codificador JSON '{nome}' indisponível (instalados: {', '.join(CODIFICADORES)}) - usando stdlib")
+    return codificar_stdlib
+
+
+class ProvedorJson(DefaultJSONProvider):
+    """Provedor JSON do Flask que serializa as respostas com o codificador configurado"""
+
+    ensure_ascii = False
+    sort_keys = False
+
+    def __init__(self, app, codificador=codificar_stdlib):
+        super().__init__(app)
+        self.codificador = codificador
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            kwargs.setdefault('default', _padrao)
+            return super().dumps(obj, **kwargs)
+        return self.codificador(obj).decode('utf-8')
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indentar = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(self.codificador(obj, indentar) + b'\n', mimetype=self.mimetype)
+
+
+def comprimir_resposta(resposta):
+    """after_request: gzip nas respostas comprimíveis a partir do tamanho mínimo"""
+    if (resposta.direct_passthrough or resposta.is_streamed or resposta.status_code in (204, 304)
+            or 'Content-Encoding' in resposta.headers or resposta.mimetype not in TIPOS_COMPRIMIVEIS):
+        return resposta
+
+    corpo = resposta.get_data()
+    if len(corpo) < config.GZIP_MINIMO_BYTES:
+        return resposta
+
+    resposta.vary.add('Accept-Encoding')
+    if not aceita_gzip(request.headers.get('Accept-Encoding', '')):
+        return resposta
+
+    resposta.set_data(gzip.compress(corpo, compresslevel=config.GZIP_NIVEL, mtime=0))
+    resposta.headers['Content-Encoding'] = 'gzip'
+    return resposta
+
+
+def configurar_respostas(app):
+    """Instala o provedor JSON e, se ativado, a compressão gzip das respostas"""
+    app.json = ProvedorJson(app, escolher_codificador(config.JSON_CODIFICADOR))
+    if config.GZIP_MINIMO_BYTES > 0:
+        app.after_request(comprimir_resposta)
@@ -0,0 +1,249 @@
+"""
+Fechamento diário do dashboard: contadores de cada dia congelados em um resumo
+
+Depois da meia-noite os contadores do dia anterior (transportadora x status) são
+gravados em dashboard_resumo_diario a partir de uma única consulta agrupada. O
+histórico de /api/dashboard/historico lê só esse resumo - algumas dezenas de linhas
+por dia - e nunca varre mercadorias_conferidas, então semanas ou meses de relatório
+custam o mesmo com qualquer volume de bipagens.
+
+O status gravado é o da base no momento do fechamento: trocar a base ou resetar o
+sistema depois não altera os dias já fechados. Por isso as rotas que apagam bipagens
+ou rastreios esperados fecham antes os dias pendentes e guardam os contadores das
+bipagens que vão apagar em dashboard_resumo_parcial (congelar_bipagens_apagadas). O
+fechamento de um dia soma esses contadores às bipagens que restaram, então um dia com
+reset mantém o total que o dashboard mostrou - mesmo sem nenhuma bipagem depois dele.
+"""
+
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import delete, func, select
+from src.models.rastreio import db, RastreioEsperado, MercadoriaConferida, DashboardCache, ResumoDiario, ResumoParcial
+from src.services.dashboard import CONTADOR_CATEGORIA, categoria_de, dias_com_bipagens, transportadoras_zeradas
+from src.services.arquivo import arquivar_bipagens
+from src.services.journal import journal_bipagens
+
+# Status gravado para as bipagens que não constam na base
+STATUS_FORA_DA_BASE = 'fora_da_base'
+
+# Folga depois da meia-noite antes de fechar o dia anterior (segundos)
+MARGEM_FECHAMENTO = 60
+
+def _agrupar_bipagens(bipagens, *colunas):
+    """SELECT das bipagens agrupadas por `colunas` + transportadora + status, com a quantidade"""
+    transportadora = func.coalesce(func.trim(bipagens.c.transportadora), '')
+    status = func.coalesce(RastreioEsperado.status, STATUS_FORA_DA_BASE)
+    return (
+        select(*colunas, transportadora, status, func.count())
+        .select_from(bipagens)
+        .outerjoin(RastreioEsperado, bipagens.c.codigo_rastreio == RastreioEsperado.codigo_rastreio)
+        .group_by(*colunas, transportadora, status)
+    )
+
+
+def contadores_do_dia(data, bipagens=None):
+    """
+    Bipagens da data agrupadas em (transportadora, status, quantidade). `bipagens` troca
+    a origem das linhas (ex.: mercadorias_conferidas + arquivos mensais anexados).
+    """
+    bipagens = MercadoriaConferida.__table__ if bipagens is None else bipagens
+    return db.session.execute(_agrupar_bipagens(bipagens).where(bipagens.c.data_bipagem == data)).all()
+
+
+def parciais_do_dia(data):
+    """Contadores das bipagens da data já apagadas por reset ou limpeza da base"""
+    return db.session.execute(
+        select(ResumoParcial.transportadora, ResumoParcial.status, func.sum(ResumoParcial.quantidade))
+        .where(ResumoParcial.data == data)
+        .group_by(ResumoParcial.transportadora, ResumoParcial.status)
+    ).all()
+
+
+def congelar_bipagens_apagadas():
+    """
+    Guarda em dashboard_resumo_parcial os contadores de cada dia de mercadorias_conferidas -
+    chamar antes de apagar todas as bipagens (reset, importação com limpeza da base), na
+    mesma transação. Não faz commit. Retorna o total de bipagens congeladas.
+    """
+    bipagens = MercadoriaConferida.__table__
+    linhas = db.session.execute(
+        _agrupar_bipagens(bipagens, bipagens.c.data_bipagem).where(bipagens.c.data_bipagem.is_not(None))
+    ).all()
+    if linhas:
+        agora = datetime.now()
+        db.session.execute(ResumoParcial.__table__.insert(), [
+            {'data': data, 'transportadora': transportadora, 'status': status,
+             'quantidade': quantidade, 'congelado_em': agora}
+            for data, transportadora, status, quantidade in linhas
+        ])
+    return sum(linha[-1] for linha in linhas)
+
+
+def fechar_dia(data, contadores=None):
+    """
+    Congela os contadores da data (padrão: contadores_do_dia) somados aos das bipagens já
+    apagadas (parciais_do_dia) em dashboard_resumo_diario, substituindo um fechamento
+    anterior da mesma data. Não faz commit. Retorna o total.
+    """
+    contadores = contadores_do_dia(data) if contadores is None else contadores
+    somados = {}
+    for transportadora, status, quantidade in list(contadores) + parciais_do_dia(data):
+        somados[(transportadora, status)] = somados.get((transportadora, status), 0) + quantidade
+    tabela = ResumoDiario.__table__
+    agora = datetime.now()
+
+    db.session.execute(delete(tabela).where(tabela.c.data == data))
+    if somados:
+        db.session.execute(tabela.insert(), [
+            {'data': data, 'transportadora': transportadora, 'status': status,
+             'quantidade': quantidade, 'fechado_em': agora}
+            for (transportadora, status), quantidade in somados.items()
+        ])
+    return sum(somados.values())
+
+
+def dias_pendentes(hoje=None):
+    """Dias anteriores a hoje com bipagens (ou bipagens apagadas por um reset) e ainda sem fechamento"""
+    hoje = hoje or datetime.now().date()
+    bipados = set(dias_com_bipagens(hoje)) | set(db.session.execute(
+        select(ResumoParcial.data).where(ResumoParcial.data < hoje).distinct()
+    ).scalars())
+    if not bipados:
+        return []
+    fechados = set(db.session.execute(
+        select(ResumoDiario.data).where(ResumoDiario.data < hoje).distinct()
+    ).scalars())
+    return sorted(bipados - fechados)
+
+
+def fechar_dias_pendentes(hoje=None):
+    """Fecha (com commit) todos os dias anteriores a hoje ainda sem resumo - retorna as datas fechadas"""
+    dias = dias_pendentes(hoje)
+    for data in dias:
+        fechar_dia(data)
+    if dias:
+        db.session.commit()
+    return dias
+
+
+def _contadores_vazios():
+    return {
+        'transportadoras': transportadoras_zeradas(),
+        'total': 0,
+        'coleta': 0,
+        'insucesso': 0,
+        'sem_status': 0
+    }
+
+
+def _somar(destino, origem):
+    for chave in ['total', 'coleta', 'insucesso', 'sem_status']:
+        destino[chave] += origem[chave]
+    for nome, quantidade in origem['transportadoras'].items():
+        destino['transportadoras'][nome] = destino['transportadoras'].get(nome, 0) + quantidade
+
+
+def historico(de, ate, hoje=None):
+    """
+    Série diária do período [de, ate] montada só com o resumo diário - o dia atual,
+    ainda aberto, vem dos contadores do DashboardCache (fechado = False)
+    """
+    hoje = hoje or datetime.now().date()
+    linhas = db.session.execute(
+        select(ResumoDiario.data, ResumoDiario.transportadora, ResumoDiario.status, ResumoDiario.quantidade)
+        .where(ResumoDiario.data >= de, ResumoDiario.data <= ate)
+        .order_by(ResumoDiario.data)
+    ).all()
+
+    dias = {}
+    for data, transportadora, status, quantidade in linhas:
+        dia = dias.get(data)
+        if dia is None:
+            dia = dias[data] = dict(_contadores_vazios(), data=data.isoformat(), fechado=True, por_status={})
+        dia['total'] += quantidade
+        dia[categoria_de(status)] += quantidade
+        dia['por_status'][status] = dia['por_status'].get(status, 0) + quantidade
+        if transportadora in dia['transportadoras']:
+            dia['transportadoras'][transportadora] += quantidade
+
+    if de <= hoje <= ate and hoje not in dias:
+        cache = DashboardCache.query.filter_by(data=hoje).first()
+        if cache:
+            dia = dict(_contadores_vazios(), data=hoje.isoformat(), fechado=False, por_status=None)
+            dia['total'] = cache.total_hoje
+            for categoria, coluna in CONTADOR_CATEGORIA.items():
+                dia[categoria] = getattr(cache, coluna)
+            dia['transportadoras'].update(cache.transportadoras or {})
+            dias[hoje] = dia
+
+    totais = _contadores_vazios()
+    for dia in dias.values():
+        _somar(totais, dia)
+
+    return {
+        'de': de.isoformat(),
+        'ate': ate.isoformat(),
+        'dias': [dias[data] for data in sorted(dias)],
+        'totais': totais
+    }
+
+
+class FechamentoDiario:
+    """
+    Thread que fecha os dias pendentes (e arquiva as bipagens fora da retenção, ver
+    src/services/arquivo.py) na inicialização e logo depois de cada meia-noite
+    """
+
+    def __init__(self):
+        self._app = None
+        self._parar = threading.Event()
+        self._thread = None
+        self.ultimo_fechamento = None
+        self.falhas = 0
+
+    def iniciar(self, app):
+        if self._thread is not None:
+            return
+        self._app = app
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._laco, name='fechamento-diario', daemon=True)
+        self._thread.start()
+
+    def parar(self):
+        if self._thread is None:
+            return
+        self._parar.set()
+        self._thread.join()
+        self._thread = None
+
+    def fechar_agora(self):
+        """
+        Fecha os dias pendentes (bipagens ainda no journal entram antes) e arquiva as
+        bipagens fora da retenção - retorna as datas fechadas e o resumo do arquivamento
+        """
+        journal_bipagens.drenar()
+        dias = fechar_dias_pendentes()
+        self.ultimo_fechamento = datetime.now()
+        if dias:
+            print(f"Fechamento diário: {len(dias)} dia(s) congelado(s) no resumo ({dias[0]} a {dias[-1]})")
+        return {'dias_fechados': dias, 'arquivamento': arquivar_bipagens()}
+
+    def _laco(self):
+        espera = 0
+        while not self._parar.wait(espera):
+            with self._app.app_context():
+                try:
+                    self.fechar_agora()
+                except Exception as e:
+                    db.session.rollback()
+                    self.falhas += 1
+                    print(f"Erro no fechamento diário (nova tentativa na próxima execução): {e}")
+                finally:
+                    db.session.remove()
+
+            agora = datetime.now()
+            proxima = datetime.combine(agora.date() + timedelta(days=1), datetime.min.time())
+            espera = (proxima - agora).total_seconds() + MARGEM_FECHAMENTO
+
+
+fechamento_diario = FechamentoDiario()
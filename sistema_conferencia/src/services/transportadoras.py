@@ -0,0 +1,89 @@
+"""
+Detecção da transportadora pelo formato do código de rastreio
+
+Cada regra associa uma transportadora a um prefixo ou a uma expressão regular que
+precisa casar com o código inteiro. Todas as regras são compiladas em uma única
+expressão com um grupo nomeado por regra: uma chamada a fullmatch classifica o código
+e o grupo que casou (lastgroup) diz a transportadora. A ordem das regras é a prioridade.
+
+As regras padrão seguem os formatos usados pelas transportadoras do dashboard (os mesmos
+do gerador dos benchmarks). CONFERENCIA_TRANSPORTADORAS_REGRAS aponta um arquivo JSON que
+as substitui, no formato:
+
+    [
+        {"transportadora": "CORREIOS", "regex": "[A-Z]{2}[0-9]{9}BR"},
+        {"transportadora": "LOGAN", "prefixo": "LGN"}
+    ]
+
+Códigos que não casam com nenhuma regra ficam sem transportadora, como antes, e podem
+ser preenchidos por /api/transportadora/atualizar-lote.
+"""
+
+import json
+import re
+from src import config
+
+REGRAS_PADRAO = [
+    # S10 (UPU) nacional: 2 letras de serviço, 8 dígitos + dígito verificador, origem BR.
+    # Os códigos da CORREIOS PA têm o mesmo formato e entram como CORREIOS
+    {'transportadora': 'CORREIOS', 'regex': r'[A-Z]{2}[0-9]{9}BR'},
+    {'transportadora': 'J&T', 'regex': r'JT[0-9]{13}'},
+    {'transportadora': 'JADLOG', 'regex': r'10[0-9]{12}'},
+    {'transportadora': 'LOGAN', 'regex': r'LGN[0-9]{10}'},
+]
+
+
+class ClassificadorTransportadoras:
+    """Casa códigos de rastreio com as regras compiladas em uma única expressão"""
+
+    def __init__(self, regras):
+        self.regras = []
+        alternativas = []
+        for posicao, regra in enumerate(regras):
+            transportadora = (regra.get('transportadora') or '').strip()
+            if not transportadora or ('prefixo' in regra) == ('regex' in regra):
+                raise ValueError(f"Regra {posicao + 1}: informe a transportadora e um prefixo ou uma regex")
+            if 'prefixo' in regra:
+                padrao = re.escape(regra['prefixo'].strip().upper()) + '.*'
+            else:
+                padrao = regra['regex']
+                re.compile(padrao)  # erro de sintaxe apontado na regra, não na expressão combinada
+            self.regras.append({**regra, 'transportadora': transportadora})
+            alternativas.append(f'(?P<r{posicao}>{padrao})')
+
+        self._transportadora_do_grupo = {f'r{posicao}': regra['transportadora'] for posicao, regra in enumerate(self.regras)}
+        self._expressao = re.compile('|'.join(alternativas), re.DOTALL) if alternativas else None
+
+    def classificar(self, codigo):
+        """Transportadora do código (já normalizado) ou None se nenhuma regra casar"""
+        if self._expressao is None or not codigo:
+            return None
+        encontrado = self._expressao.fullmatch(codigo)
+        return self._transportadora_do_grupo[encontrado.lastgroup] if encontrado else None
+
+
+def carregar_regras(caminho):
+    """Regras do arquivo JSON (lista de regras) - sem caminho, as regras padrão"""
+    if not caminho:
+        return REGRAS_PADRAO
+    with open(caminho, encoding='utf-8') as arquivo:
+        regras = json.load(arquivo)
+    if not isinstance(regras, list):
+        raise ValueError('o arquivo deve conter uma lista de regras')
+    return regras
+
+
+def criar_classificador(caminho=None):
+    try:
+        return ClassificadorTransportadoras(carregar_regras(caminho))
+    except (OSError, ValueError, re.error) as e:
+        print(f"Aviso: regras de transportadora inválidas em {caminho} ({e}) - usando as regras padrão")
+        return ClassificadorTransportadoras(REGRAS_PADRAO)
+
+
+classificador_transportadoras = criar_classificador(config.TRANSPORTADORAS_REGRAS)
+
+
+def detectar_transportadora(codigo):
+    """Transportadora do código pelas regras configuradas (None se nenhuma casar)"""
+    return classificador_transportadoras.classificar(codigo)
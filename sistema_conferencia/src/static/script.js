@@ -2,12 +2,20 @@ class SistemaConferencia {
     constructor() {
         this.baseURL = '/api';
         this.statusAtual = null; // Status fixo atual
+        this.limiteListagem = 500; // Itens mais recentes exibidos nas listas (os totais vêm do servidor)
+        this.estatisticas = null; // Últimas estatísticas, ajustadas pelos eventos do servidor
+        this.eventos = null; // Conexão SSE com /api/eventos
+        this.atualizacaoPeriodica = null; // Timers da atualização periódica (sem o canal de eventos)
+        this.faltantesBusca = ''; // Prefixo buscado na lista de faltantes
+        this.faltantesCursor = null; // Cursor da próxima página de faltantes (null = última página)
+        this.faltantesTimerBusca = null;
         this.init();
     }
 
     init() {
         this.bindEvents();
         this.loadData();
+        this.conectarEventos();
         
         // Focar no campo de código ao carregar a página
         document.getElementById('codigo-input').focus();
@@ -17,6 +25,8 @@ class SistemaConferencia {
         // Importar rastreios
         document.getElementById('importar-btn').addEventListener('click', () => this.importarRastreios());
         
+        document.getElementById('importar-arquivo-btn').addEventListener('click', () => this.importarArquivo());
+        
         // Bipar mercadoria
         document.getElementById('bipar-btn').addEventListener('click', () => this.biparMercadoria());
         document.getElementById('codigo-input').addEventListener('keypress', (e) => {
@@ -53,18 +63,95 @@ class SistemaConferencia {
         // Excluir faltantes em lote
         document.getElementById('excluir-faltantes-btn').addEventListener('click', () => this.excluirFaltantesSelecionados());
         
+        // Faltantes: busca por prefixo (aguarda a digitação parar) e próxima página
+        document.getElementById('faltantes-busca').addEventListener('input', (e) => {
+            clearTimeout(this.faltantesTimerBusca);
+            this.faltantesTimerBusca = setTimeout(() => {
+                this.faltantesBusca = e.target.value.trim().toUpperCase();
+                this.loadFaltantes();
+            }, 300);
+        });
+        document.getElementById('faltantes-mais-btn').addEventListener('click', () => this.carregarMaisFaltantes());
+        
         // Fechar modal ao clicar fora
         document.getElementById('export-modal').addEventListener('click', (e) => {
             if (e.target.id === 'export-modal') {
                 this.hideExportModal();
             }
         });
+    }
+
+    conectarEventos() {
+        if (!window.EventSource) {
+            // Navegador sem Server-Sent Events: manter a atualização periódica
+            this.iniciarAtualizacaoPeriodica();
+            return;
+        }
         
-        // Auto-refresh das estatísticas a cada 30 segundos
-        setInterval(() => this.loadEstatisticas(), 30000);
+        // O navegador reconecta sozinho e reenvia o último id; o servidor repete o que foi perdido
+        this.eventos = new EventSource(`${this.baseURL}/eventos`);
         
-        // Auto-refresh do dashboard a cada 60 segundos
-        setInterval(() => this.loadDashboard(), 60000);
+        this.eventos.addEventListener('open', () => {
+            // De volta ao canal depois da atualização periódica: as listas podem estar atrasadas
+            if (this.atualizacaoPeriodica) {
+                this.pararAtualizacaoPeriodica();
+                this.loadData();
+            }
+        });
+        this.eventos.addEventListener('error', () => {
+            // Resposta de erro (503 = servidor sem vaga para mais telas): o navegador não reconecta
+            // sozinho, então a tela passa à atualização periódica e tenta o canal de novo depois
+            if (this.eventos.readyState === EventSource.CLOSED) {
+                this.iniciarAtualizacaoPeriodica();
+                setTimeout(() => this.conectarEventos(), 60000);
+            }
+        });
+        
+        const ouvir = (tipo, tratar) => {
+            this.eventos.addEventListener(tipo, (e) => {
+                try {
+                    tratar(JSON.parse(e.data));
+                } catch (error) {
+                    console.error(`Erro ao aplicar evento ${tipo}:`, error);
+                }
+            });
+        };
+        
+        ouvir('bipagem', (dados) => this.aplicarBipagem(dados));
+        ouvir('bipagem_lote', (dados) => dados.itens.forEach(item => this.aplicarBipagem(item)));
+        ouvir('status', (dados) => this.aplicarStatusEvento(dados));
+        ouvir('status_lote', (dados) => dados.itens.forEach(item => this.aplicarStatusEvento(item)));
+        ouvir('transportadora', (dados) => this.aplicarTransportadora(dados));
+        ouvir('transportadora_lote', () => Promise.all([this.loadConferidas(), this.loadBipadas()]));
+        ouvir('exclusao', (dados) => this.aplicarExclusao(dados));
+        ouvir('dashboard', (dados) => this.renderDashboard(dados));
+        ouvir('recarregar', (dados) => {
+            if (dados.escopo && dados.escopo.length === 1 && dados.escopo[0] === 'dashboard') {
+                this.loadDashboard();
+            } else {
+                this.loadData();
+            }
+        });
+    }
+
+    iniciarAtualizacaoPeriodica() {
+        if (this.atualizacaoPeriodica) {
+            return;
+        }
+        this.atualizacaoPeriodica = [
+            setInterval(() => this.loadEstatisticas(), 30000),
+            setInterval(() => this.loadDashboard(), 60000)
+        ];
+    }
+
+    pararAtualizacaoPeriodica() {
+        this.atualizacaoPeriodica.forEach(timer => clearInterval(timer));
+        this.atualizacaoPeriodica = null;
+    }
+
+    eventosAtivos() {
+        // Com o canal de eventos aberto as telas são atualizadas pelo servidor
+        return this.eventos !== null && this.eventos.readyState === EventSource.OPEN;
     }
 
     async makeRequest(endpoint, options = {}) {
@@ -109,63 +196,52 @@ class SistemaConferencia {
 
     async loadEstatisticas() {
         try {
-            const data = await this.makeRequest('/estatisticas');
-            
-            document.getElementById('total-esperados').textContent = data.total_esperados;
-            document.getElementById('total-conferidos').textContent = data.total_conferidos;
-            document.getElementById('total-pendentes').textContent = data.total_pendentes;
-            document.getElementById('percentual-conferido').textContent = `${data.percentual_conferido}%`;
+            this.estatisticas = await this.makeRequest('/estatisticas');
+            this.renderEstatisticas();
         } catch (error) {
             console.error('Erro ao carregar estatísticas:', error);
         }
     }
 
+    renderEstatisticas() {
+        const data = this.estatisticas;
+        document.getElementById('total-esperados').textContent = data.total_esperados;
+        document.getElementById('total-conferidos').textContent = data.total_conferidos;
+        document.getElementById('total-pendentes').textContent = data.total_pendentes;
+        document.getElementById('percentual-conferido').textContent = `${data.percentual_conferido}%`;
+    }
+
+    ajustarEstatisticas(statusAnterior, statusNovo) {
+        // Status da base antes/depois da mudança; null = rastreio fora da base
+        const data = this.estatisticas;
+        if (!data) {
+            return;
+        }
+        
+        const somar = (status, sinal) => {
+            if (!status) {
+                return;
+            }
+            data.total_esperados += sinal;
+            if (status === 'pendente') {
+                data.total_pendentes += sinal;
+            } else if (['conferido', 'coleta', 'insucesso'].includes(status)) {
+                data.total_conferidos += sinal;
+            }
+        };
+        somar(statusAnterior, -1);
+        somar(statusNovo, 1);
+        
+        data.percentual_conferido = data.total_esperados > 0
+            ? Math.round(data.total_conferidos / data.total_esperados * 10000) / 100
+            : 0;
+        this.renderEstatisticas();
+    }
+
     async loadDashboard() {
         try {
             const data = await this.makeRequest('/dashboard');
-            
-            // Atualizar contadores por transportadora
-            document.getElementById('jt-count').textContent = data.transportadoras['J&T'] || 0;
-            document.getElementById('jadlog-count').textContent = data.transportadoras['JADLOG'] || 0;
-            document.getElementById('dialogo-count').textContent = data.transportadoras['DIALOGO'] || 0;
-            document.getElementById('correios-count').textContent = data.transportadoras['CORREIOS'] || 0;
-            document.getElementById('correios-pa-count').textContent = data.transportadoras['CORREIOS PA'] || 0;
-            document.getElementById('logan-count').textContent = data.transportadoras['LOGAN'] || 0;
-            document.getElementById('favela-log-count').textContent = data.transportadoras['FAVELA LOG'] || 0;
-            document.getElementById('sac-service-count').textContent = data.transportadoras['SAC SERVICE'] || 0;
-            document.getElementById('dissudes-count').textContent = data.transportadoras['DISSUDES'] || 0;
-            
-            // Atualizar resumo do dia
-            document.getElementById('total-hoje').textContent = data.total_hoje || 0;
-            document.getElementById('coleta-hoje').textContent = data.coleta_hoje || 0;
-            document.getElementById('insucesso-hoje').textContent = data.insucesso_hoje || 0;
-            
-            // Atualizar chart de status
-            document.getElementById('coleta-hoje-chart').textContent = data.coleta_hoje || 0;
-            document.getElementById('insucesso-hoje-chart').textContent = data.insucesso_hoje || 0;
-            
-            // Calcular e atualizar percentuais
-            const total = data.total_hoje || 0;
-            if (total > 0) {
-                const coletaPercent = Math.round((data.coleta_hoje || 0) / total * 100);
-                const insucessoPercent = Math.round((data.insucesso_hoje || 0) / total * 100);
-                
-                document.getElementById('coleta-percentage').textContent = `${coletaPercent}%`;
-                document.getElementById('insucesso-percentage').textContent = `${insucessoPercent}%`;
-            } else {
-                document.getElementById('coleta-percentage').textContent = '0%';
-                document.getElementById('insucesso-percentage').textContent = '0%';
-            }
-            
-            // Atualizar barras de progresso das transportadoras
-            this.updateTransportadoraBars(data.transportadoras);
-            
-            // Mostrar informações sobre o cache
-            if (data.cache_info) {
-                console.log(`Dashboard carregado do: ${data.cache_info.fonte}`);
-                console.log(`Última atualização: ${data.cache_info.ultima_atualizacao}`);
-            }
-            
+            this.renderDashboard(data);
         } catch (error) {
             console.error('Erro ao carregar dashboard:', error);
             
@@ -174,6 +250,50 @@ class SistemaConferencia {
         }
     }
 
+    renderDashboard(data) {
+        // Atualizar contadores por transportadora
+        document.getElementById('jt-count').textContent = data.transportadoras['J&T'] || 0;
+        document.getElementById('jadlog-count').textContent = data.transportadoras['JADLOG'] || 0;
+        document.getElementById('dialogo-count').textContent = data.transportadoras['DIALOGO'] || 0;
+        document.getElementById('correios-count').textContent = data.transportadoras['CORREIOS'] || 0;
+        document.getElementById('correios-pa-count').textContent = data.transportadoras['CORREIOS PA'] || 0;
+        document.getElementById('logan-count').textContent = data.transportadoras['LOGAN'] || 0;
+        document.getElementById('favela-log-count').textContent = data.transportadoras['FAVELA LOG'] || 0;
+        document.getElementById('sac-service-count').textContent = data.transportadoras['SAC SERVICE'] || 0;
+        document.getElementById('dissudes-count').textContent = data.transportadoras['DISSUDES'] || 0;
+        
+        // Atualizar resumo do dia
+        document.getElementById('total-hoje').textContent = data.total_hoje || 0;
+        document.getElementById('coleta-hoje').textContent = data.coleta_hoje || 0;
+        document.getElementById('insucesso-hoje').textContent = data.insucesso_hoje || 0;
+        
+        // Atualizar chart de status
+        document.getElementById('coleta-hoje-chart').textContent = data.coleta_hoje || 0;
+        document.getElementById('insucesso-hoje-chart').textContent = data.insucesso_hoje || 0;
+        
+        // Calcular e atualizar percentuais
+        const total = data.total_hoje || 0;
+        if (total > 0) {
+            const coletaPercent = Math.round((data.coleta_hoje || 0) / total * 100);
+            const insucessoPercent = Math.round((data.insucesso_hoje || 0) / total * 100);
+            
+            document.getElementById('coleta-percentage').textContent = `${coletaPercent}%`;
+            document.getElementById('insucesso-percentage').textContent = `${insucessoPercent}%`;
+        } else {
+            document.getElementById('coleta-percentage').textContent = '0%';
+            document.getElementById('insucesso-percentage').textContent = '0%';
+        }
+        
+        // Atualizar barras de progresso das transportadoras
+        this.updateTransportadoraBars(data.transportadoras);
+        
+        // Mostrar informações sobre o cache
+        if (data.cache_info) {
+            console.log(`Dashboard carregado do: ${data.cache_info.fonte}`);
+            console.log(`Última atualização: ${data.cache_info.ultima_atualizacao}`);
+        }
+    }
+
     updateTransportadoraBars(transportadoras) {
         // Calcular o valor máximo para normalizar as barras
         const values = Object.values(transportadoras);
@@ -215,11 +335,10 @@ class SistemaConferencia {
             
             this.showNotification('Dashboard atualizado com sucesso!', 'success');
             
-            // Aguardar um pouco para garantir que o cache foi atualizado
-            setTimeout(async () => {
-                // Recarregar dashboard com dados atualizados
-                await this.loadDashboard();
-            }, 500);
+            // Com o canal de eventos aberto o recálculo chega como evento 'dashboard'
+            if (!this.eventosAtivos()) {
+                this.renderDashboard(data);
+            }
             
         } catch (error) {
             console.error('Erro ao forçar atualização do dashboard:', error);
@@ -262,47 +381,69 @@ class SistemaConferencia {
         });
     }
 
+    urlFaltantes(cursor = null) {
+        const parametros = new URLSearchParams({ limit: this.limiteListagem });
+        if (this.faltantesBusca) {
+            parametros.set('busca', this.faltantesBusca);
+        }
+        if (cursor !== null) {
+            parametros.set('cursor', cursor);
+        }
+        return `/mercadorias/faltantes?${parametros}`;
+    }
+
     async loadFaltantes() {
         try {
-            const data = await this.makeRequest('/mercadorias/faltantes');
+            // Primeira página (em ordem de código); o total vem de um COUNT no servidor
+            const data = await this.makeRequest(this.urlFaltantes());
             
             document.getElementById('faltantes-count').textContent = data.total;
+            this.definirCursorFaltantes(data.proximo_cursor);
             
             const container = document.getElementById('faltantes-list');
             
             if (data.faltantes.length === 0) {
-                container.innerHTML = `
-                    <div class="empty-state">
-                        <i class="fas fa-check-circle"></i>
-                        <p>Todas as mercadorias foram conferidas!</p>
-                    </div>
-                `;
+                container.innerHTML = this.htmlListaVazia('faltantes-list');
                 // Ocultar botão de exclusão
                 document.getElementById('excluir-faltantes-btn').style.display = 'none';
             } else {
-                container.innerHTML = data.faltantes.map(item => `
-                    <div class="item-with-checkbox" data-codigo="${item.codigo}">
-                        <label class="checkbox-container">
-                            <input type="checkbox" class="faltante-checkbox" data-codigo="${item.codigo}">
-                            <span class="checkmark"></span>
-                        </label>
-                        <div class="item-content">
-                            <span class="item-code">${item.codigo}</span>
-                            <span class="item-status status-pendente">PENDENTE</span>
-                        </div>
-                    </div>
-                `).join('');
+                container.innerHTML = data.faltantes.map(item => this.htmlFaltante(item)).join('');
                 
                 // Adicionar event listeners para checkboxes
-                this.setupFaltantesCheckboxes();
+                this.setupFaltantesCheckboxes(container.querySelectorAll('.faltante-checkbox'));
             }
         } catch (error) {
             console.error('Erro ao carregar faltantes:', error);
         }
     }
 
-    setupFaltantesCheckboxes() {
-        const checkboxes = document.querySelectorAll('.faltante-checkbox');
+    async carregarMaisFaltantes() {
+        if (this.faltantesCursor === null) {
+            return;
+        }
+        try {
+            const data = await this.makeRequest(this.urlFaltantes(this.faltantesCursor));
+            this.definirCursorFaltantes(data.proximo_cursor);
+            
+            const container = document.getElementById('faltantes-list');
+            const quantidadeAnterior = container.children.length;
+            container.insertAdjacentHTML('beforeend', data.faltantes.map(item => this.htmlFaltante(item)).join(''));
+            this.setupFaltantesCheckboxes(Array.from(container.children).slice(quantidadeAnterior).map(item => item.querySelector('.faltante-checkbox')));
+        } catch (error) {
+            console.error('Erro ao carregar mais faltantes:', error);
+        }
+    }
+
+    definirCursorFaltantes(cursor) {
+        this.faltantesCursor = cursor;
+        document.getElementById('faltantes-mais-btn').style.display = cursor === null ? 'none' : 'flex';
+    }
+
+    faltanteNaBusca(codigo) {
+        return !this.faltantesBusca || codigo.startsWith(this.faltantesBusca);
+    }
+
+    setupFaltantesCheckboxes(checkboxes) {
         const excluirBtn = document.getElementById('excluir-faltantes-btn');
         
         checkboxes.forEach(checkbox => {
@@ -347,12 +488,15 @@ class SistemaConferencia {
                 }
                 
                 this.showNotification(`${codigos.length} rastreio(s) excluído(s) com sucesso!`, 'success');
+                document.getElementById('excluir-faltantes-btn').style.display = 'none';
                 
-                // Recarregar listas
-                await this.loadFaltantes();
-                await this.loadConferidas();
-                await this.loadBipadas();
-                await this.loadDashboard();
+                // Com o canal de eventos aberto as listas já foram atualizadas pelos eventos de exclusão
+                if (!this.eventosAtivos()) {
+                    await this.loadFaltantes();
+                    await this.loadConferidas();
+                    await this.loadBipadas();
+                    await this.loadDashboard();
+                }
                 
             } catch (error) {
                 console.error('Erro ao excluir rastreios:', error);
@@ -363,57 +507,21 @@ class SistemaConferencia {
 
     async loadConferidas() {
         try {
-            const data = await this.makeRequest('/mercadorias/conferidas');
+            const data = await this.makeRequest(`/mercadorias/conferidas?limit=${this.limiteListagem}`);
             
             document.getElementById('conferidas-count').textContent = data.total;
             
             const container = document.getElementById('conferidas-list');
             
             if (data.conferidas.length === 0) {
-                container.innerHTML = `
-                    <div class="empty-state">
-                        <i class="fas fa-barcode"></i>
-                        <p>Nenhuma mercadoria foi conferida ainda.</p>
-                    </div>
-                `;
+                container.innerHTML = this.htmlListaVazia('conferidas-list');
             } else {
                 // Ordenar por timestamp (mais recente primeiro)
                 const conferidasOrdenadas = data.conferidas.sort((a, b) => {
                     return new Date(b.timestamp) - new Date(a.timestamp);
                 });
                 
-                container.innerHTML = conferidasOrdenadas.map(item => {
-                    const timestamp = new Date(item.timestamp).toLocaleString('pt-BR', {
-                        timeZone: 'America/Sao_Paulo',
-                        year: 'numeric',
-                        month: '2-digit',
-                        day: '2-digit',
-                        hour: '2-digit',
-                        minute: '2-digit',
-                        second: '2-digit'
-                    });
-                    const statusClass = item.status_base === 'na_base' ? 'status-na-base' : 'status-fora-base';
-                    const statusText = item.status_base === 'na_base' ? 'NA BASE' : 'FORA DA BASE';
-                    const transportadora = item.transportadora || 'Não definida';
-                    
-                    return `
-                        <div class="item">
-                            <div class="item-with-delete">
-                                <div class="item-content-main">
-                                    <div>
-                                        <span class="item-code">${item.codigo}</span>
-                                        <div class="item-time">${timestamp}</div>
-                                        <div class="item-transportadora">${transportadora}</div>
-                                    </div>
-                                    <span class="item-status ${statusClass}">${statusText}</span>
-                                </div>
-                                <button class="btn-delete" onclick="sistema.excluirMercadoria('${item.codigo}')" title="Excluir mercadoria - Permite bipar novamente">
-                                    <i class="fas fa-trash"></i>
-                                </button>
-                            </div>
-                        </div>
-                    `;
-                }).join('');
+                container.innerHTML = conferidasOrdenadas.map(item => this.htmlConferida(item)).join('');
             }
         } catch (error) {
             console.error('Erro ao carregar conferidas:', error);
@@ -422,138 +530,275 @@ class SistemaConferencia {
 
     async loadBipadas() {
         try {
-            const data = await this.makeRequest('/mercadorias/bipadas');
+            const data = await this.makeRequest(`/mercadorias/bipadas?limit=${this.limiteListagem}`);
             
             document.getElementById('bipadas-count').textContent = data.total;
             document.getElementById('bipadas-coleta-count').textContent = data.total_coleta;
             document.getElementById('bipadas-insucesso-count').textContent = data.total_insucesso;
             document.getElementById('bipadas-sem-status-count').textContent = data.total_sem_status;
             
-            // Carregar seção Coleta
-            const containerColeta = document.getElementById('bipadas-coleta-list');
-            if (data.bipadas_coleta.length === 0) {
-                containerColeta.innerHTML = `
-                    <div class="empty-state">
-                        <i class="fas fa-truck"></i>
-                        <p>Nenhuma mercadoria com status Coleta.</p>
-                    </div>
-                `;
-            } else {
-                // Ordenar por timestamp (mais recente primeiro)
-                const coletaOrdenadas = data.bipadas_coleta.sort((a, b) => {
-                    return new Date(b.timestamp) - new Date(a.timestamp);
-                });
-                
-                containerColeta.innerHTML = coletaOrdenadas.map(item => {
-                    const timestamp = new Date(item.timestamp).toLocaleString('pt-BR', {
-                        timeZone: 'America/Sao_Paulo',
-                        year: 'numeric',
-                        month: '2-digit',
-                        day: '2-digit',
-                        hour: '2-digit',
-                        minute: '2-digit',
-                        second: '2-digit'
-                    });
-                    const transportadora = item.transportadora || 'Não definida';
-                    return `
-                        <div class="item">
-                            <div class="item-content">
-                                <div>
-                                    <span class="item-code">${item.codigo}</span>
-                                    <div class="item-time">${timestamp}</div>
-                                    <div class="item-transportadora">${transportadora}</div>
-                                </div>
-                                <span class="item-status status-coleta">COLETA</span>
-                            </div>
-                        </div>
-                    `;
-                }).join('');
-            }
+            const secoes = {
+                'coleta': data.bipadas_coleta,
+                'insucesso': data.bipadas_insucesso,
+                'sem_status': data.bipadas_sem_status
+            };
             
-            // Carregar seção Insucesso
-            const containerInsucesso = document.getElementById('bipadas-insucesso-list');
-            if (data.bipadas_insucesso.length === 0) {
-                containerInsucesso.innerHTML = `
-                    <div class="empty-state">
-                        <i class="fas fa-times-circle"></i>
-                        <p>Nenhuma mercadoria com status Insucesso.</p>
-                    </div>
-                `;
-            } else {
-                // Ordenar por timestamp (mais recente primeiro)
-                const insucessoOrdenadas = data.bipadas_insucesso.sort((a, b) => {
-                    return new Date(b.timestamp) - new Date(a.timestamp);
-                });
+            Object.entries(secoes).forEach(([categoria, itens]) => {
+                const listaId = `bipadas-${categoria.replace('_', '-')}-list`;
+                const container = document.getElementById(listaId);
                 
-                containerInsucesso.innerHTML = insucessoOrdenadas.map(item => {
-                    const timestamp = new Date(item.timestamp).toLocaleString('pt-BR', {
-                        timeZone: 'America/Sao_Paulo',
-                        year: 'numeric',
-                        month: '2-digit',
-                        day: '2-digit',
-                        hour: '2-digit',
-                        minute: '2-digit',
-                        second: '2-digit'
+                if (itens.length === 0) {
+                    container.innerHTML = this.htmlListaVazia(listaId);
+                } else {
+                    // Ordenar por timestamp (mais recente primeiro)
+                    const ordenadas = itens.sort((a, b) => {
+                        return new Date(b.timestamp) - new Date(a.timestamp);
                     });
-                    const transportadora = item.transportadora || 'Não definida';
-                    return `
-                        <div class="item">
-                            <div class="item-content">
-                                <div>
-                                    <span class="item-code">${item.codigo}</span>
-                                    <div class="item-time">${timestamp}</div>
-                                    <div class="item-transportadora">${transportadora}</div>
-                                </div>
-                                <span class="item-status status-insucesso">INSUCESSO</span>
-                            </div>
+                    
+                    container.innerHTML = ordenadas.map(item => this.htmlBipada(item, categoria)).join('');
+                }
+            });
+        } catch (error) {
+            console.error('Erro ao carregar bipadas:', error);
+        }
+    }
+
+    formatarHorario(timestamp) {
+        return new Date(timestamp).toLocaleString('pt-BR', {
+            timeZone: 'America/Sao_Paulo',
+            year: 'numeric',
+            month: '2-digit',
+            day: '2-digit',
+            hour: '2-digit',
+            minute: '2-digit',
+            second: '2-digit'
+        });
+    }
+
+    htmlListaVazia(listaId) {
+        const mensagens = {
+            'faltantes-list': ['fa-check-circle', 'Todas as mercadorias foram conferidas!'],
+            'conferidas-list': ['fa-barcode', 'Nenhuma mercadoria foi conferida ainda.'],
+            'bipadas-coleta-list': ['fa-truck', 'Nenhuma mercadoria com status Coleta.'],
+            'bipadas-insucesso-list': ['fa-times-circle', 'Nenhuma mercadoria com status Insucesso.'],
+            'bipadas-sem-status-list': ['fa-question-circle', 'Nenhuma mercadoria sem status definido.']
+        };
+        const [icone, mensagem] = mensagens[listaId];
+        return `
+            <div class="empty-state">
+                <i class="fas ${icone}"></i>
+                <p>${mensagem}</p>
+            </div>
+        `;
+    }
+
+    htmlFaltante(item) {
+        return `
+            <div class="item-with-checkbox" data-codigo="${item.codigo}">
+                <label class="checkbox-container">
+                    <input type="checkbox" class="faltante-checkbox" data-codigo="${item.codigo}">
+                    <span class="checkmark"></span>
+                </label>
+                <div class="item-content">
+                    <span class="item-code">${item.codigo}</span>
+                    <span class="item-status status-pendente">PENDENTE</span>
+                </div>
+            </div>
+        `;
+    }
+
+    htmlConferida(item) {
+        const statusClass = item.status_base === 'na_base' ? 'status-na-base' : 'status-fora-base';
+        const statusText = item.status_base === 'na_base' ? 'NA BASE' : 'FORA DA BASE';
+        const transportadora = item.transportadora || 'Não definida';
+        
+        return `
+            <div class="item" data-codigo="${item.codigo}">
+                <div class="item-with-delete">
+                    <div class="item-content-main">
+                        <div>
+                            <span class="item-code">${item.codigo}</span>
+                            <div class="item-time">${this.formatarHorario(item.timestamp)}</div>
+                            <div class="item-transportadora">${transportadora}</div>
                         </div>
-                    `;
-                }).join('');
-            }
-            
-            // Carregar seção Sem Status
-            const containerSemStatus = document.getElementById('bipadas-sem-status-list');
-            if (data.bipadas_sem_status.length === 0) {
-                containerSemStatus.innerHTML = `
-                    <div class="empty-state">
-                        <i class="fas fa-question-circle"></i>
-                        <p>Nenhuma mercadoria sem status definido.</p>
+                        <span class="item-status ${statusClass}">${statusText}</span>
                     </div>
-                `;
-            } else {
-                // Ordenar por timestamp (mais recente primeiro)
-                const semStatusOrdenadas = data.bipadas_sem_status.sort((a, b) => {
-                    return new Date(b.timestamp) - new Date(a.timestamp);
-                });
-                
-                containerSemStatus.innerHTML = semStatusOrdenadas.map(item => {
-                    const timestamp = new Date(item.timestamp).toLocaleString('pt-BR', {
-                        timeZone: 'America/Sao_Paulo',
-                        year: 'numeric',
-                        month: '2-digit',
-                        day: '2-digit',
-                        hour: '2-digit',
-                        minute: '2-digit',
-                        second: '2-digit'
-                    });
-                    const transportadora = item.transportadora || 'Não definida';
-                    return `
-                        <div class="item">
-                            <div class="item-content">
-                                <div>
-                                    <span class="item-code">${item.codigo}</span>
-                                    <div class="item-time">${timestamp}</div>
-                                    <div class="item-transportadora">${transportadora}</div>
-                                </div>
-                                <span class="item-status status-sem-status">SEM STATUS</span>
-                            </div>
-                        </div>
-                    `;
-                }).join('');
+                    <button class="btn-delete" onclick="sistema.excluirMercadoria('${item.codigo}')" title="Excluir mercadoria - Permite bipar novamente">
+                        <i class="fas fa-trash"></i>
+                    </button>
+                </div>
+            </div>
+        `;
+    }
+
+    htmlBipada(item, categoria) {
+        const rotulos = {
+            'coleta': ['status-coleta', 'COLETA'],
+            'insucesso': ['status-insucesso', 'INSUCESSO'],
+            'sem_status': ['status-sem-status', 'SEM STATUS']
+        };
+        const [statusClass, statusText] = rotulos[categoria];
+        const transportadora = item.transportadora || 'Não definida';
+        
+        return `
+            <div class="item" data-codigo="${item.codigo}" data-timestamp="${item.timestamp}">
+                <div class="item-content">
+                    <div>
+                        <span class="item-code">${item.codigo}</span>
+                        <div class="item-time">${this.formatarHorario(item.timestamp)}</div>
+                        <div class="item-transportadora">${transportadora}</div>
+                    </div>
+                    <span class="item-status ${statusClass}">${statusText}</span>
+                </div>
+            </div>
+        `;
+    }
+
+    // Atualizações incrementais aplicadas a partir dos eventos do servidor (/api/eventos)
+
+    categoriaStatus(status) {
+        // Mesma regra do servidor: pendente, conferido e fora da base contam como sem status
+        return status === 'coleta' || status === 'insucesso' ? status : 'sem_status';
+    }
+
+    listaBipadas(categoria) {
+        return `bipadas-${categoria.replace('_', '-')}-list`;
+    }
+
+    somarContador(elementoId, delta) {
+        const elemento = document.getElementById(elementoId);
+        elemento.textContent = Math.max(0, (parseInt(elemento.textContent, 10) || 0) + delta);
+    }
+
+    inserirNoTopo(listaId, html) {
+        const container = document.getElementById(listaId);
+        container.querySelector('.empty-state')?.remove();
+        container.insertAdjacentHTML('afterbegin', html);
+        
+        // Manter apenas os itens mais recentes, como na carga inicial
+        while (container.children.length > this.limiteListagem) {
+            container.lastElementChild.remove();
+        }
+        return container.firstElementChild;
+    }
+
+    removerDaLista(listaId, codigo) {
+        const container = document.getElementById(listaId);
+        const item = container.querySelector(`[data-codigo="${codigo}"]`);
+        if (item) {
+            item.remove();
+            if (container.children.length === 0) {
+                container.innerHTML = this.htmlListaVazia(listaId);
             }
-        } catch (error) {
-            console.error('Erro ao carregar bipadas:', error);
         }
+        return item;
+    }
+
+    removerFaltante(codigo) {
+        // O contador mostra o total da busca atual
+        if (!this.faltanteNaBusca(codigo)) {
+            return;
+        }
+        this.removerDaLista('faltantes-list', codigo);
+        this.somarContador('faltantes-count', -1);
+    }
+
+    adicionarFaltante(codigo) {
+        if (!this.faltanteNaBusca(codigo)) {
+            return;
+        }
+        this.somarContador('faltantes-count', 1);
+        
+        // Com mais páginas no servidor o código entra na lista quando a página dele for carregada
+        if (this.faltantesCursor !== null && codigo > this.faltantesCursor) {
+            return;
+        }
+        const container = document.getElementById('faltantes-list');
+        container.querySelector('.empty-state')?.remove();
+        
+        // A lista está em ordem de código, como a paginação do servidor
+        const seguinte = Array.from(container.children).find(item => item.dataset.codigo > codigo);
+        if (seguinte) {
+            seguinte.insertAdjacentHTML('beforebegin', this.htmlFaltante({ codigo: codigo }));
+        } else {
+            container.insertAdjacentHTML('beforeend', this.htmlFaltante({ codigo: codigo }));
+        }
+        const inserido = seguinte ? seguinte.previousElementSibling : container.lastElementChild;
+        this.setupFaltantesCheckboxes([inserido.querySelector('.faltante-checkbox')]);
+    }
+
+    aplicarBipagem(dados) {
+        this.ajustarEstatisticas(dados.status_anterior, dados.status);
+        if (dados.status_anterior === 'pendente') {
+            this.removerFaltante(dados.codigo);
+        }
+        
+        const item = {
+            codigo: dados.codigo,
+            timestamp: dados.timestamp,
+            transportadora: dados.transportadora || null,
+            status_base: dados.resultado === 'encontrado' ? 'na_base' : 'fora_da_base'
+        };
+        this.inserirNoTopo('conferidas-list', this.htmlConferida(item));
+        this.somarContador('conferidas-count', 1);
+        
+        const categoria = this.categoriaStatus(dados.status);
+        this.inserirNoTopo(this.listaBipadas(categoria), this.htmlBipada(item, categoria));
+        this.somarContador('bipadas-count', 1);
+        this.somarContador(`bipadas-${categoria.replace('_', '-')}-count`, 1);
+    }
+
+    aplicarStatusEvento(dados) {
+        this.ajustarEstatisticas(dados.status_anterior, dados.status);
+        
+        if (dados.status_anterior === 'pendente' && dados.status !== 'pendente') {
+            this.removerFaltante(dados.codigo);
+        } else if (dados.status === 'pendente' && dados.status_anterior !== 'pendente') {
+            this.adicionarFaltante(dados.codigo);
+        }
+        
+        // Mover a mercadoria bipada para a seção do novo status
+        const anterior = this.categoriaStatus(dados.status_anterior);
+        const nova = this.categoriaStatus(dados.status);
+        if (dados.bipada && anterior !== nova) {
+            const item = this.removerDaLista(this.listaBipadas(anterior), dados.codigo);
+            this.somarContador(`bipadas-${anterior.replace('_', '-')}-count`, -1);
+            this.somarContador(`bipadas-${nova.replace('_', '-')}-count`, 1);
+            if (item) {
+                this.inserirNoTopo(this.listaBipadas(nova), this.htmlBipada({
+                    codigo: dados.codigo,
+                    timestamp: item.dataset.timestamp,
+                    transportadora: item.querySelector('.item-transportadora').textContent
+                }, nova));
+            }
+        }
+    }
+
+    aplicarTransportadora(dados) {
+        document.querySelectorAll(`#conferidas-list [data-codigo="${dados.codigo}"] .item-transportadora, .bipadas-section [data-codigo="${dados.codigo}"] .item-transportadora`)
+            .forEach(elemento => { elemento.textContent = dados.transportadora; });
+    }
+
+    aplicarExclusao(dados) {
+        if (dados.tipo === 'rastreio') {
+            this.ajustarEstatisticas(dados.status, null);
+            if (dados.status === 'pendente') {
+                this.removerFaltante(dados.codigo);
+            }
+            // As bipadas do rastreio passam a ser fora da base
+            if (dados.bipadas > 0) {
+                this.loadConferidas();
+                this.loadBipadas();
+            }
+            return;
+        }
+        
+        const categoria = this.categoriaStatus(dados.status);
+        this.removerDaLista('conferidas-list', dados.codigo);
+        this.removerDaLista(this.listaBipadas(categoria), dados.codigo);
+        this.somarContador('conferidas-count', -1);
+        this.somarContador('bipadas-count', -1);
+        this.somarContador(`bipadas-${categoria.replace('_', '-')}-count`, -1);
     }
 
     async importarRastreios() {
@@ -588,14 +833,96 @@ class SistemaConferencia {
             textarea.value = '';
             document.getElementById('limpar-base').checked = false;
             
-            // Recarregar dados
-            await this.loadData();
+            // Recarregar dados (com o canal de eventos aberto o servidor avisa todas as telas)
+            if (!this.eventosAtivos()) {
+                await this.loadData();
+            }
             
         } catch (error) {
             console.error('Erro ao importar rastreios:', error);
         }
     }
 
+    async importarArquivo() {
+        const arquivoInput = document.getElementById('arquivo-input');
+        const arquivo = arquivoInput.files[0];
+        
+        if (!arquivo) {
+            this.showNotification('Selecione um arquivo CSV ou TXT para importar', 'warning');
+            return;
+        }
+        
+        const formData = new FormData();
+        formData.append('arquivo', arquivo);
+        formData.append('coluna', document.getElementById('coluna-input').value.trim());
+        formData.append('limpar_base', document.getElementById('limpar-base').checked ? 'true' : 'false');
+        
+        try {
+            // Sem Content-Type manual: o navegador define o boundary do multipart
+            const response = await fetch(`${this.baseURL}/rastreios/importar-arquivo`, {
+                method: 'POST',
+                body: formData
+            });
+            const data = await response.json();
+            
+            if (!response.ok) {
+                throw new Error(data.erro || 'Erro ao enviar arquivo');
+            }
+            
+            this.showNotification(`Arquivo ${data.arquivo} recebido. Importando...`, 'info');
+            arquivoInput.value = '';
+            document.getElementById('limpar-base').checked = false;
+            this.acompanharImportacao(data.id);
+            
+        } catch (error) {
+            console.error('Erro ao importar arquivo:', error);
+            this.showNotification(error.message, 'error');
+        }
+    }
+
+    acompanharImportacao(importacaoId) {
+        const progresso = document.getElementById('import-progress');
+        const barra = document.getElementById('import-progress-fill');
+        const texto = document.getElementById('import-progress-text');
+        progresso.style.display = 'flex';
+        
+        const consultar = async () => {
+            try {
+                const response = await fetch(`${this.baseURL}/rastreios/importar-arquivo/${importacaoId}`);
+                const data = await response.json();
+                
+                if (!response.ok) {
+                    throw new Error(data.erro || 'Erro ao consultar importação');
+                }
+                
+                barra.style.width = `${data.percentual}%`;
+                texto.textContent = `${data.percentual}% - ${data.novos} novos, ${data.duplicados} duplicados`;
+                
+                if (data.status === 'processando') {
+                    setTimeout(consultar, 1000);
+                    return;
+                }
+                
+                if (data.status === 'concluido') {
+                    this.showNotification(`Importação concluída. ${data.novos} novos rastreios adicionados.`, 'success');
+                } else {
+                    this.showNotification(`Erro na importação: ${data.erro}`, 'error');
+                }
+                
+                setTimeout(() => { progresso.style.display = 'none'; }, 5000);
+                if (!this.eventosAtivos()) {
+                    await this.loadData();
+                }
+                
+            } catch (error) {
+                console.error('Erro ao acompanhar importação:', error);
+                progresso.style.display = 'none';
+            }
+        };
+        
+        consultar();
+    }
+
     async biparMercadoria() {
         const input = document.getElementById('codigo-input');
         const codigo = input.value.trim().toUpperCase();
@@ -650,8 +977,10 @@ class SistemaConferencia {
             input.value = '';
             input.focus();
             
-            // Recarregar dados
-            await this.loadData();
+            // Com o canal de eventos aberto listas e contadores são atualizados pelo evento da bipagem
+            if (!this.eventosAtivos()) {
+                await this.loadData();
+            }
             
             // Esconder resultado após 5 segundos
             setTimeout(() => {
@@ -684,12 +1013,14 @@ class SistemaConferencia {
             }
             
             // Recarregar dados (SEM recarregar dashboard - ele será mantido)
-            await Promise.all([
-                this.loadEstatisticas(),
-                this.loadFaltantes(),
-                this.loadConferidas(),
-                this.loadBipadas()
-            ]);
+            if (!this.eventosAtivos()) {
+                await Promise.all([
+                    this.loadEstatisticas(),
+                    this.loadFaltantes(),
+                    this.loadConferidas(),
+                    this.loadBipadas()
+                ]);
+            }
             
             // O dashboard não é recarregado para manter os contadores do dia
         } catch (error) {
@@ -711,7 +1042,9 @@ class SistemaConferencia {
             this.showNotification(data.mensagem, 'success');
             
             // Recarregar dados
-            await this.loadDashboard();
+            if (!this.eventosAtivos()) {
+                await this.loadDashboard();
+            }
             
         } catch (error) {
             console.error('Erro ao resetar dashboard:', error);
@@ -913,10 +1246,10 @@ class SistemaConferencia {
             
             console.log(`Status "${status}" aplicado automaticamente ao código ${codigo}`);
             
-            // Atualizar dashboard após mudança de status
-            setTimeout(async () => {
+            // Atualizar dashboard após mudança de status (com o canal de eventos aberto ele chega como evento)
+            if (!this.eventosAtivos()) {
                 await this.loadDashboard();
-            }, 300);
+            }
             
         } catch (error) {
             console.error('Erro ao aplicar status automático:', error);
@@ -1050,16 +1383,19 @@ class SistemaConferencia {
             
             this.showNotification(`Mercadoria ${codigo} excluída com sucesso!`, 'success');
             
-            // Aguardar um pouco para a animação terminar antes de recarregar
-            setTimeout(async () => {
-                // Recarregar todas as listas para atualizar os dados
-                await Promise.all([
-                    this.loadConferidas(),
-                    this.loadBipadas(),
-                    this.loadEstatisticas(),
-                    this.loadDashboard()  // Recarregar dashboard para refletir a exclusão
-                ]);
-            }, 500);
+            // Com o canal de eventos aberto o item sai das listas pelo evento de exclusão
+            if (!this.eventosAtivos()) {
+                // Aguardar um pouco para a animação terminar antes de recarregar
+                setTimeout(async () => {
+                    // Recarregar todas as listas para atualizar os dados
+                    await Promise.all([
+                        this.loadConferidas(),
+                        this.loadBipadas(),
+                        this.loadEstatisticas(),
+                        this.loadDashboard()  // Recarregar dashboard para refletir a exclusão
+                    ]);
+                }, 500);
+            }
             
         } catch (error) {
             console.error(`Erro ao excluir mercadoria ${codigo}:`, error);
@@ -0,0 +1,75 @@
+"""
+Fechamento diário de um dia com reset: o histórico mantém o total que o dashboard mostrou
+
+Uso (na pasta do projeto):
+    python -m pytest tests
+"""
+
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.comum import criar_app
+from src.models.rastreio import db, DashboardCache
+from src.services.resumo import fechar_dias_pendentes, historico
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = criar_app(str(tmp_path / 'teste.db'))
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+def bipar(cliente, codigos):
+    for codigo in codigos:
+        resposta = cliente.post('/api/mercadorias/bipar', json={'codigo_rastreio': codigo})
+        assert resposta.status_code == 200, resposta.get_json()
+
+
+def fechar_e_consultar(app):
+    """Fecha o dia de hoje como se já fosse amanhã e devolve (total no histórico, total do dashboard)"""
+    hoje = datetime.now().date()
+    with app.app_context():
+        assert fechar_dias_pendentes(hoje + timedelta(days=1)) == [hoje]
+        dias = historico(hoje, hoje, hoje + timedelta(days=1))['dias']
+        assert [dia['fechado'] for dia in dias] == [True]
+        return dias[0]['total'], DashboardCache.query.filter_by(data=hoje).one().total_hoje
+
+
+def test_reset_no_meio_do_dia_soma_bipagens_antes_e_depois(app):
+    cliente = app.test_client()
+    cliente.post('/api/rastreios/importar', json={'rastreios': ['AA000000001BR', 'AA000000002BR', 'AA000000003BR']})
+    bipar(cliente, ['AA000000001BR', 'AA000000002BR', 'ZZ1'])
+
+    assert cliente.post('/api/rastreios/resetar').status_code == 200
+    cliente.post('/api/rastreios/importar', json={'rastreios': ['AA000000004BR']})
+    bipar(cliente, ['AA000000004BR', 'ZZ2'])
+
+    assert fechar_e_consultar(app) == (5, 5)
+
+
+def test_dia_sem_bipagens_depois_do_reset_e_fechado(app):
+    cliente = app.test_client()
+    bipar(cliente, ['ZZ1', 'ZZ2'])
+    assert cliente.post('/api/rastreios/resetar').status_code == 200
+
+    assert fechar_e_consultar(app) == (2, 2)
+
+
+def test_limpeza_da_base_na_importacao_mantem_o_dia(app):
+    cliente = app.test_client()
+    cliente.post('/api/rastreios/importar', json={'rastreios': ['AA000000001BR']})
+    bipar(cliente, ['AA000000001BR', 'ZZ1'])
+
+    resposta = cliente.post('/api/rastreios/importar', json={'rastreios': ['AA000000002BR'], 'limpar_base': True})
+    assert resposta.status_code == 200
+    bipar(cliente, ['AA000000002BR'])
+
+    assert fechar_e_consultar(app) == (3, 3)